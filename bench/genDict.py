@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# generate a synthetic mots.csv for benchmarking
+# words, POS, meanings, phrases etc. are random but shaped like the real thing:
+# mostly nouns, some multi-POS words with {...}; {...} meanings, phrases containing the word,
+# feminine/plural variations, related words and registers
+# usage: python bench/genDict.py OUTPUT.csv NROWS [SEED]
+
+import csv
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from french import CSV_COLS, LEGAL_NOUN_POS
+
+SYLLABLES = ("ba", "be", "bou", "ca", "ché", "co", "da", "dé", "fa", "fi", "ga", "gi", "la", "lè", "li",
+	"ma", "mé", "mo", "na", "né", "pa", "pê", "po", "ra", "ré", "ri", "sa", "sé", "ta", "té", "tô",
+	"va", "vi", "ço", "an", "on", "eu", "ou", "ai", "oi", "è", "ê", "î", "û")
+ENDINGS = ("", "", "", "e", "s", "eur", "ion", "age", "ment", "ité", "ette", "eau", "ier", "ière")
+ENGLISH = ("house", "bright", "blue", "result", "island", "peach", "fishing", "sin", "pupil", "student",
+	"thing", "time", "water", "light", "red", "quick", "slow", "warm", "cold", "friend", "world",
+	"work", "day", "night", "hand", "head", "voice", "word", "heart", "door", "road", "city", "sea")
+# (POS string, number of meanings); weights roughly as in a real frequency list
+POS_CHOICES = [(pos, 1) for pos in LEGAL_NOUN_POS] * 6 + [
+	("adj", 1), ("adj", 1), ("adj", 1), ("adv", 1), ("v", 1), ("vt", 1), ("vi", 1), ("vi-reflex", 1),
+	("prep", 1), ("conj", 1), ("det", 1), ("adj; nm", 2), ("adj; nm/nf", 2), ("adj; nf", 2),
+	("intj; nm", 2), ("intj; nm; nf", 3), ("nm; nf", 2), ("adv; adj", 2), ("vt; nm", 2)]
+REGISTERS = ("formal", "informal", "literary", "slang", "old-fashioned")
+ARTICLES = {"m": "le", "f": "la"}
+
+
+# a random word; unique words are made unique by the caller
+def randomWord(rng):
+	return "".join([rng.choice(SYLLABLES) for i in range(rng.randint(1, 4))]) + rng.choice(ENDINGS)
+
+
+# a random meaning: 1 to 4 English words separated by "; "
+def randomMeaning(rng):
+	return "; ".join(rng.sample(ENGLISH, rng.randint(1, 4)))
+
+
+# generate rows (lists of strings in the order of CSV_COLS)
+def genRows(nRows, seed=0):
+
+	rng = random.Random(seed)
+	seen = set()
+	for i in range(nRows):
+		word = randomWord(rng)
+		while word in seen:
+			word = randomWord(rng) + randomWord(rng)
+		seen.add(word)
+
+		pos, nMeanings = rng.choice(POS_CHOICES)
+		if nMeanings==1:
+			meaning = randomMeaning(rng)
+		else:
+			meaning = "; ".join(["{" + randomMeaning(rng) + "}" for j in range(nMeanings)])
+
+		freq = str(i+1) if rng.random() < 0.8 else ""
+		article = ""
+		if pos.startswith("n") and "/" not in pos:
+			article = ARTICLES.get(pos[1:2], "")
+		variation = word + "e" if rng.random() < 0.15 else ""
+		phrases = "{0} {1}".format(rng.choice(("un", "une", "le", "la", "très")), word) if rng.random() < 0.3 else ""
+		related = "{0} #{1}".format(randomWord(rng), rng.randint(1, nRows)) if rng.random() < 0.1 else ""
+		register = rng.choice(REGISTERS) if rng.random() < 0.05 else ""
+
+		yield [freq, article, word, pos, variation, meaning, phrases, related, register]
+
+
+# write a synthetic csv with nRows rows to csvname
+def genDict(csvname, nRows, seed=0):
+
+	with open(csvname, "w", newline="") as f:
+		writer = csv.writer(f)
+		writer.writerow(CSV_COLS)
+		writer.writerows(genRows(nRows, seed))
+
+
+if __name__ == "__main__":
+	if len(sys.argv) < 3:
+		sys.exit("Usage: genDict.py OUTPUT.csv NROWS [SEED]")
+	genDict(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# benchmark suite
+# times loading, sampling, lookups, parsing and rendering (single cards and bulk) over synthetic dictionaries (see genDict.py)
+# of the given sizes, audio extraction over the stored HTML fixtures (fixtures/*.html),
+# watch mode updates, and cold start (fresh interpreter) of imports and of a quiz (over csv and over SQLite, see store)
+# results (best of --repeats runs, in seconds) are written to a JSON file; with --compare,
+# each result is checked against a previous JSON file and the run fails on regressions
+# usage: python bench/runBench.py [--sizes 10000 100000] [--out bench_results.json] [--compare OLD.json]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+import french
+import store
+import watch
+from genDict import genDict
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+MOTS_CLI = os.path.join(BENCH_DIR, "..", "mots.py")
+DEFAULT_SIZES = (10000, 100000)
+# number of decks drawn / pages scanned per timed run
+N_DECKS = 1000
+N_PAGE_SCANS = 200
+# at most this many cards are rendered per timed run
+N_CARDS = 10000
+# number of misspelled words looked up per timed run
+N_SUGGESTIONS = 200
+# number of reverse (meaning) lookups per timed run
+N_LOOKUPS = 200
+# a result slower than REGRESSION_RATIO times the previous one is a regression
+REGRESSION_RATIO = 1.25
+
+
+# best (smallest) wall time of fn() over repeats runs, in seconds
+def timeIt(fn, repeats):
+
+	best = None
+	for i in range(repeats):
+		start = time.perf_counter()
+		fn()
+		elapsed = time.perf_counter() - start
+		if best is None or elapsed < best:
+			best = elapsed
+
+	return best
+
+
+# benchmarks over a synthetic csv; returns a dict of name -> seconds
+def benchDict(csvname, repeats):
+
+	results = {}
+
+	results["getWordInfofromCSV (no cache)"] = timeIt(lambda: french.getWordInfofromCSV(csvname, useCache=False), repeats)
+	# first call (re)builds the cache; time the calls served from it
+	french.loadDict(csvname)
+	results["getWordInfofromCSV (cached)"] = timeIt(lambda: french.getWordInfofromCSV(csvname), repeats)
+	results["initializeDict (nouns)"] = timeIt(lambda: french.initializeDict(csvname, nounGenderQuiz=True), repeats)
+
+	wordDict = french.loadDict(csvname)
+	nounDict = french.initializeDict(csvname, nounGenderQuiz=True)
+	results["sampleDict uniform x{0}".format(N_DECKS)] = timeIt(lambda: [french.sampleDict(nounDict, french.QUIZ_SIZE) for i in range(N_DECKS)], repeats)
+	nounDict.getIndex("alias:zipf")
+	results["sampleDict zipf x{0}".format(N_DECKS)] = timeIt(lambda: [french.sampleDict(nounDict, french.QUIZ_SIZE, "zipf") for i in range(N_DECKS)], repeats)
+
+	results["typo index build"] = timeIt(lambda: french.buildTypoIndex(wordDict.rows), repeats)
+	typos = [row.word[:2] + "x" + row.word[3:] for row in wordDict.rows[:N_SUGGESTIONS]]
+	wordDict.getIndex("typo")
+	results["findSimilarWords x{0}".format(len(typos))] = timeIt(lambda: [french.findSimilarWords(wordDict, typo) for typo in typos], repeats)
+
+	results["prefix index build"] = timeIt(lambda: french.buildPrefixIndex(wordDict.rows), repeats)
+	prefixes = [row.word[:3] for row in wordDict.rows[:N_SUGGESTIONS]]
+	wordDict.getIndex("prefix")
+	results["completeWord x{0}".format(len(prefixes))] = timeIt(lambda: [french.completeWord(wordDict, prefix) for prefix in prefixes], repeats)
+
+	results["meaning index build"] = timeIt(lambda: french.buildMeaningIndex(wordDict.rows), repeats)
+	# first word of a meaning, exact and as a 3-letter prefix, and first 2 words of a meaning
+	queries = [" ".join(french.RE_TOKEN.findall(row.meaning_list[0])[:2]) for row in wordDict.rows[:N_LOOKUPS]]
+	wordDict.getIndex("meaning")
+	results["lookupMeaning x{0}".format(len(queries))] = timeIt(lambda: [french.lookupMeaning(wordDict, query.split(" ")[0]) for query in queries], repeats)
+	results["lookupMeaning prefix x{0}".format(len(queries))] = timeIt(lambda: [french.lookupMeaning(wordDict, query[:3], prefix=True) for query in queries], repeats)
+	results["lookupMeaning 2 words x{0}".format(len(queries))] = timeIt(lambda: [french.lookupMeaning(wordDict, query) for query in queries], repeats)
+
+	meanings = [row.meaning for row in wordDict]
+	results["parseMeaning (all rows)"] = timeIt(lambda: [french.parseMeaning(meaning) for meaning in meanings], repeats)
+
+	rows = wordDict.rows[:N_CARDS]
+	def render():
+		with contextlib.redirect_stdout(io.StringIO()):
+			for row in rows:
+				french.displayWord(row, maskGender=True, maskWordInPhrase=False, word=True, freq=True, phrases=True, related=True, register=True, dontQuiz=False)
+	results["displayWord x{0}".format(len(rows))] = timeIt(render, repeats)
+	results["renderAllCards"] = timeIt(lambda: french.renderAllCards(csvname, os.devnull), repeats)
+
+	# watch mode: a poll after one row of a copy of csv is edited (after a first change, see watch.DictWatcher)
+	watchname = csvname + ".watch.csv"
+	shutil.copyfile(csvname, watchname)
+	watcher = watch.DictWatcher(french.loadDict(watchname, useCache=False))
+	with open(watchname, newline="") as f:
+		lines = f.readlines()
+	def editRow():
+		# register (last column) of 1st word grows by a letter
+		lines[1] = lines[1].rstrip("\r\n") + "x\n"
+		with open(watchname, "w", newline="") as f:
+			f.writelines(lines)
+		with contextlib.redirect_stdout(io.StringIO()):
+			watcher.poll()
+	editRow()
+	results["watch: poll after 1 row edited"] = timeIt(editRow, repeats)
+	# a whole quiz run from a fresh interpreter (cache already built)
+	results["cold start: mots.py gender --dont-quiz --size 5"] = timeIt(lambda: runPython([MOTS_CLI, "gender", "--csv", csvname, "--dont-quiz", "--size", "5"]), repeats)
+
+	# same over a SQLite database imported from csv
+	dbname = store.getDBPath(csvname)
+	results["store.importCSV"] = timeIt(lambda: store.importCSV(csvname, dbname), repeats)
+	results["cold start: mots.py gender --dont-quiz --size 5 (SQLite)"] = timeIt(lambda: runPython([MOTS_CLI, "gender", "--csv", dbname, "--dont-quiz", "--size", "5"]), repeats)
+
+	return results
+
+
+# benchmarks over HTML fixtures; returns a dict of name -> seconds
+# skipped (empty dict) if the scraper's dependencies aren't installed
+def benchScraper(repeats):
+
+	try:
+		import scrapeAudio
+	except ImportError as e:
+		print("Skipping scraper benchmarks ({0}).".format(e))
+		return {}
+
+	pages = []
+	for filename in sorted(os.listdir(FIXTURES_DIR)):
+		if filename.endswith(".html"):
+			with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+				pages.append(f.read().split("\n"))
+
+	results = {}
+	def scanAll():
+		for i in range(N_PAGE_SCANS):
+			for lines in pages:
+				[scrapeAudio.getUrlFilename(line) for line in scrapeAudio.getHTMLwithMP3(lines)]
+	results["isFrMP3+getUrlFilename full pages x{0}".format(N_PAGE_SCANS)] = timeIt(scanAll, repeats)
+
+	def scanEarlyExit():
+		for i in range(N_PAGE_SCANS):
+			for lines in pages:
+				scrapeAudio.findMP3sInLines(iter(lines))
+	results["findMP3sInLines x{0}".format(N_PAGE_SCANS)] = timeIt(scanEarlyExit, repeats)
+
+	return results
+
+
+# run a fresh interpreter with arguments cmd, in the repo directory, output discarded
+def runPython(cmd):
+	subprocess.run([sys.executable] + cmd, check=True, stdout=subprocess.DEVNULL, cwd=os.path.join(BENCH_DIR, ".."))
+
+
+# cold start benchmarks: a fresh interpreter importing each module
+# returns a dict of name -> seconds
+def benchColdStart(repeats):
+
+	results = {}
+	for module in ("french", "scrapeAudio", "mots"):
+		results["cold start: import {0}".format(module)] = timeIt(lambda: runPython(["-c", "import " + module]), repeats)
+
+	return results
+
+
+# compare results with a previous run
+# prints a table; returns names of results slower than ratio times their previous value
+def compareResults(results, previous, ratio):
+
+	regressions = []
+	for name, seconds in results.items():
+		if name not in previous:
+			continue
+		change = seconds / previous[name] if previous[name] > 0 else 1.0
+		flag = ""
+		if change > ratio:
+			regressions.append(name)
+			flag = "  <-- REGRESSION"
+		print("{0:<55} {1:>10.4f} {2:>10.4f} {3:>7.2f}x{4}".format(name, previous[name], seconds, change, flag))
+
+	return regressions
+
+
+def main(argv=None):
+
+	parser = argparse.ArgumentParser(description="Benchmark loading, sampling, rendering and audio extraction.")
+	parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of rows of synthetic dictionaries")
+	parser.add_argument("--repeats", type=int, default=3, help="runs per benchmark (best is kept)")
+	parser.add_argument("--workdir", help="directory for synthetic csvs (kept between runs); default: a temp directory, removed at the end")
+	parser.add_argument("--out", default="bench_results.json", help="JSON file to write results to")
+	parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+	parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO, help="slowdown counted as regression")
+	args = parser.parse_args(argv)
+
+	# a temp directory (with its csvs, caches and databases) is removed once done
+	workdir = args.workdir or tempfile.mkdtemp(prefix="mots_bench_")
+	os.makedirs(workdir, exist_ok=True)
+
+	results = {}
+	try:
+		for size in args.sizes:
+			csvname = os.path.join(workdir, "mots_{0}.csv".format(size))
+			if not os.path.isfile(csvname):
+				genDict(csvname, size)
+			for name, seconds in benchDict(csvname, args.repeats).items():
+				results["{0} [{1}]".format(name, size)] = seconds
+	finally:
+		if args.workdir is None:
+			shutil.rmtree(workdir, ignore_errors=True)
+	results.update(benchScraper(args.repeats))
+	results.update(benchColdStart(args.repeats))
+
+	for name, seconds in results.items():
+		print("{0:<55} {1:>10.4f}".format(name, seconds))
+
+	with open(args.out, "w") as f:
+		json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+			"platform": platform.platform(), "sizes": list(args.sizes), "results": results}, f, indent=1)
+	print("\nResults: {0}".format(args.out))
+
+	if args.compare:
+		with open(args.compare) as f:
+			previous = json.load(f)["results"]
+		print("\n{0:<55} {1:>10} {2:>10} {3:>8}".format("", "previous", "now", "change"))
+		regressions = compareResults(results, previous, args.ratio)
+		if len(regressions) > 0:
+			sys.exit("{0} regression(s). Exited.".format(len(regressions)))
+
+
+if __name__ == "__main__":
+	main()
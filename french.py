@@ -1,14 +1,94 @@
 #!/usr/bin/env python3
 
+import contextlib
 import csv
+import functools
+import gc
+import hashlib
+import heapq
+import marshal
+import os
 import re
 import sys
-from random import sample
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+from random import Random, random, randrange, sample
+import instrument
+# imported where needed, to keep startup of a quiz minimal (see mots.py):
+# json, concurrent.futures (validateDict), srs and so sqlite3 (genderQuizMain with review),
+# store (loadDict of a SQLite database), watch (quizzes in watch mode)
 
 # meta parameters
 QUIZ_SIZE = 5
 CSV_PATH = "/Users/jkewz/Dropbox (Personal)/french/fr/"
 CSV_FILENAME = "mots.csv"
+# a dictionary may also be a directory of csv shards (see loadShards)
+CSV_SUFFIX = ".csv"
+
+# compiled cache of csv, written next to it (e.g. mots.csv.cache), and of each of its
+# indexes in CACHED_INDEXES, once used (e.g. mots.csv.filter.cache)
+# bump CACHE_VERSION whenever the layout of cached rows or indexes changes
+CACHE_SUFFIX = ".cache"
+CACHE_VERSION = 8
+
+# validation (see validateDict)
+# report and state (hashes of rows that passed) are written next to csv
+# bump VALIDATION_VERSION whenever the checks in validateRow change
+VALIDATION_REPORT_SUFFIX = ".validation.json"
+VALIDATION_STATE_SUFFIX = ".validated"
+VALIDATION_VERSION = 1
+VALIDATION_CHUNK_SIZE = 2000
+
+# first bytes of a SQLite database file; a dictionary may be one (see store)
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# review state and history for spaced repetition (see srs), kept next to csv
+REVIEW_DB_SUFFIX = ".reviews.sqlite"
+
+# stages (load, filter, sample, render, validate) are timed by instrument
+# if enabled, e.g. by running with MOTS_PROFILE=1
+
+# rendered cards (see renderCard)
+# at most CARD_CACHE_SIZE cards are memoized, so that cards shown again (in later
+# decks, review sessions, or by the server) aren't formatted again
+CARD_CACHE_SIZE = 1024
+# printed before each card in a quiz, and between cards in bulk mode (see renderAllCards)
+CARD_SEPARATOR = "\n* * * * * * * * * * * * * * * * * *\n\n"
+# write buffer of bulk mode
+EXPORT_BUFFER_SIZE = 1024*1024
+# display options of cards (arguments of buildCard after wordInfo) in each quiz
+# gender quiz: everything but noun genders; meaning to word quiz: no word, nor anything
+# giving it away (variation, related words; it's masked in phrases)
+GENDER_CARD_OPTIONS = (True, False, True, True, True, True, True, True)
+M2W_CARD_OPTIONS = (False, True, False, False, True, False, True, False)
+
+# max number of trials per word in a quiz
+QUIZ_TRIALS = 3
+
+# typo tolerance of meaning to word quiz (see getMaxTypos)
+# words of at least TYPO_MIN_LEN_1 (TYPO_MIN_LEN_2) letters may be typed 1 (2) edits off
+TYPO_MIN_LEN_1 = 4
+TYPO_MIN_LEN_2 = 8
+# max number of "did you mean" suggestions (see findSimilarWords)
+SUGGEST_LIMIT = 3
+# max number of completions of a prefix (see completeWord); completions typed with the
+# prefix's accents are moved first among the first COMPLETE_LIMIT*COMPLETE_SCAN_FACTOR
+COMPLETE_LIMIT = 10
+COMPLETE_SCAN_FACTOR = 4
+
+# inverted index over meanings, phrases and related words (see buildMeaningIndex)
+# tokens are runs of letters and digits, casefolded (accents are kept)
+RE_TOKEN = re.compile(r"\w+")
+MEANING_GROUP_BITS = 4
+MEANING_GROUP_PHRASES = 14
+MEANING_GROUP_RELATED = 15
+# postings are intersected by bisect if one list is this many times longer than the other
+INTERSECT_BISECT_RATIO = 16
+
+# frequency-weighted sampling (see sampleDict)
+# default exponent of zipf curve: weight = 1/rank^ZIPF_EXPONENT
+ZIPF_EXPONENT = 1.0
 
 CSV_COL_FREQ = "frequency_rank"
 CSV_COL_NA   = "noun_article"
@@ -30,11 +110,28 @@ CSV_COL_N_PHR  = 6
 CSV_COL_N_REL  = 7
 CSV_COL_N_REG  = 8
 
+# columns in the order of CSV_COL_N_*
+CSV_COLS = (CSV_COL_FREQ, CSV_COL_NA, CSV_COL_WORD, CSV_COL_POS, CSV_COL_VAR, CSV_COL_MEAN, CSV_COL_PHR, CSV_COL_REL, CSV_COL_REG)
+
+# fields parsed from csv columns at load time, following the csv columns in WordRow
+# pos_list:     tuple of POS (see parsePos), e.g. ("adj", "nm/nf")
+# gender_truth: tuple of genders of noun POS (see getNounGenders), e.g. ("mf",); () if not a noun
+# meaning_list: tuple of meanings, one per POS (see parseMeaning)
+# is_noun:      True if word is or can be a noun
+PARSED_COLS = ("pos_list", "gender_truth", "meaning_list", "is_noun")
+
+# a row from csv, i.e. a word
+# first fields are named after the csv columns and ordered as CSV_COL_N_*, so that
+# both wordInfo.word and wordInfo[CSV_COL_N_WORD] work; parsed fields follow
+# frequency_rank is an int, or None if blank; other csv fields are strings
+WordRow = namedtuple("WordRow", CSV_COLS + PARSED_COLS)
+
 #* TO BE MONITORED; UPDATE AS NECESSARY
 LEGAL_NOUN_POS =      ("nm", "nf", "nm/nf", "nmpl", "nfpl", "nm(pl)", "nf(pl)", "nmi", "n")
 LEGAL_GENDER_INPUTS = ("m",  "f",  "mf",    "mpl",  "fpl",  "m(pl)",  "f(pl)",  "mi",  "n")
 
 LEGAL_POS = ("adj", "adj(f)", "adj(pl)", "adji", "adv", "conj", "det", "intj", "prep", "v", "vi", "vi-reflex", "vt") + LEGAL_NOUN_POS
+LEGAL_POS_SET = frozenset(LEGAL_POS)
 
 # print info about expected input
 def printInputInfo():
@@ -75,10 +172,77 @@ def printInputInfo():
 
 # capture input gender & process into a list
 def getGenderFromKeyboard():
+	return readGenderAnswer(keyboardAnswer, None)[0]
+
+
+# answer sources: functions of the row (a WordRow) being quizzed, returning an answer as typed
+# (a string); they raise EOFError when there are no more answers
+# keyboardAnswer: from keyboard
+# see also fileAnswers, SimulatedLearner
+def keyboardAnswer(wordInfo):
+	return input()
+
+
+# answer source reading one answer per line from f (an open file, e.g. sys.stdin)
+def fileAnswers(f):
+
+	def readAnswer(wordInfo):
+		line = f.readline()
+		if len(line)==0:
+			raise EOFError
+		return line.rstrip("\r\n")
+
+	return readAnswer
+
+
+# answer source simulating a learner, for scripted sessions (see scriptedSession)
+# each answer is wrong with probability errorRate (the right genders in the wrong order, or
+# other genders), and malformed (to be asked again) with probability invalidRate
+# seed: seed of its own random generator, so that a session can be replayed
+class SimulatedLearner:
+
+	def __init__(self, errorRate=0.2, invalidRate=0.05, seed=None):
+		self.errorRate = errorRate
+		self.invalidRate = invalidRate
+		self.rng = Random(seed)
+
+	def __call__(self, wordInfo):
+		truth = list(wordInfo.gender_truth)
+		if self.rng.random() < self.invalidRate:
+			return self.rng.choice(("", "x", "m f", "m;", "masculin"))
+		if self.rng.random() >= self.errorRate:
+			return formatAnswer(truth)
+		if len(truth)>1 and len(set(truth))>1 and self.rng.random() < 0.5:
+			wrong = list(reversed(truth))
+		else:
+			wrong = [self.rng.choice(LEGAL_GENDER_INPUTS) for gender in truth]
+			while wrong==truth:
+				wrong = [self.rng.choice(LEGAL_GENDER_INPUTS) for gender in truth]
+		return formatAnswer(wrong)
+
+
+# get one well-formed answer from readAnswer (an answer source) for wordInfo
+# malformed answers are asked again, for as long as it takes
+# out: stream to write prompts to (default: stdout)
+# returns the answer as a list of genders, and number of malformed answers before it
+def readGenderAnswer(readAnswer, wordInfo, out=None):
+
+	nInvalid = 0
+	while True:
+		print("Your input:", file=out)
+		allGendersList = parseGenderInput(readAnswer(wordInfo))
+		if allGendersList is not None:
+			return allGendersList, nInvalid
+
+		print("Incorrect input format.", file=out)
+		#printInputInfo()
+		nInvalid += 1
+
+
+# parse an answer as typed (a string), e.g. "m;f"
+# returns a list of genders, or None if answer is malformed
+def parseGenderInput(allGendersStr):
 
-	print("Your input:")
-	allGendersStr = input()
-	
 	allGendersStr = allGendersStr.lower()
 	allGendersList = allGendersStr.split(sep=";")
 
@@ -86,14 +250,13 @@ def getGenderFromKeyboard():
 
 	if sum(isLegal)==len(allGendersList):
 		return allGendersList
-	else:
-		print("Incorrect input format.")
-		#printInputInfo()
-		return getGenderFromKeyboard()
+	return None
 
 
-# assess input gender (list) by comparing with truth (list)
-def assessGenderInput(genderInput, genderTruth):
+# grade input gender (list) by comparing with truth (list)
+# returns (correct, hint): correct is a boolean; hint is a string telling what's wrong,
+# or None if correct
+def gradeGenderInput(genderInput, genderTruth):
 
 	# DO NOT USE IN-PLACE SORT HERE
 	genderInputSorted = sorted(genderInput)
@@ -105,23 +268,32 @@ def assessGenderInput(genderInput, genderTruth):
 	# ORDER MATTERS
 	# correct if correct in both content and order of genders
 	if genderInput == genderTruth:
-		return True
+		return True, None
 	# give hint if content is correct but order is wrong
 	elif genderInputSorted == genderTruthSorted:
-		print("Is the order correct? Check again.")
-		return False
+		return False, "Is the order correct? Check again."
 	else:
 		if lenInput > lenTruth:
-			print("Too many! Expecting {0}; received {1}.".format(lenTruth, lenInput))
+			return False, "Too many! Expecting {0}; received {1}.".format(lenTruth, lenInput)
 		else:
 			counter = 0
 			for g in genderInput:
 				if g in genderTruth:
 					counter += 1
-			print("{0} out of {1} correct.".format(counter, lenTruth))
-		return False
+			return False, "{0} out of {1} correct.".format(counter, lenTruth)
+
+
+# assess input gender (list) by comparing with truth (list)
+# prints a hint if wrong (see gradeGenderInput); returns True if correct
+def assessGenderInput(genderInput, genderTruth, out=None):
+
+	correct, hint = gradeGenderInput(genderInput, genderTruth)
+	if hint is not None:
+		print(hint, file=out)
 
-# format parsed true gender (list from parseNounGender)
+	return correct
+
+# format parsed true gender (list from getNounGenders)
 # for printing as correct answer
 def formatAnswer(genderTruth):
 
@@ -153,47 +325,47 @@ def parsePos(posStr):
 	return posList
 
 
+# given a list of POS (from parsePos), produce a list of gender(s) of its noun POS
+# list is empty if there is no noun POS; noun POS are assumed to be legal
+def getNounGenders(posList):
+
+	genderList = []
+	for item in posList:
+		# keep only pos starting with "n" (thereby excluding "conj" & "intj")
+		# "n" (e.g. Londres), for which gender info is unavail., is included
+		if not item.startswith("n"):
+			continue
+		if item=="nm/nf":
+			genderList.append("mf")
+		elif len(item)==1: # e.g. "n"
+			genderList.append(item)
+		else:
+			genderList.append(item[1:])
+
+	return genderList
+
+
 # parse through parts of speech of a noun to produce a list of gender(s)
+# posStr: a string of POS(s), or a WordRow (its pos_list, parsed at load time, is then used)
 # if input contains irregular format, sys.exit() will be triggered along with a message
 def parseNounGender(posStr):
 
-	posList = parsePos(posStr)
+	posList = posStr.pos_list if isinstance(posStr, WordRow) else parsePos(posStr)
 
-    # keep only pos starting with "n" (thereby excluding "conj" & "intj") and of length >1
-    # "n" (e.g. Londres), for which gender info is unavail., is included
-	posList = [item for item in posList if item[0]=="n"]
+	# keep only noun POS (see getNounGenders)
+	posList = [item for item in posList if item.startswith("n")]
 
 	# check that posList is not empty 
-	# will be empty for non-nouns or nouns without gender info (e.g. Londres, n)
+	# will be empty for non-nouns
 	if len(posList)==0:
 		sys.exit("WARNING: No noun POS with gender. Exited.")
 
 	# check legality of posList against LEGAL_NOUN_POS
 	for item in posList:
 		if item not in LEGAL_NOUN_POS:
-			sys.exit("WARNING: Noun POS contains illegal item ({0}). Exited.".format(item))			
-
-	# parse
-	# nm       -> m
-	# nf       -> f
-	# nm/nf    -> mf
-	# nmpl     -> mpl
-	# nfpl     -> fpl
-	# nm/nf pl -> mfpl
-	genderList = []
-	for item in posList:
-		if len(item)==1: # e.g. "n"
-			genderList.extend(item)
-		else:
-			if item=="nm/nf":
-				genderList.extend(["mf"])
-			#elif item=="nm/nf pl":
-				#genderList.extend(["mfpl"])
-			else:
-				genderList.extend([item[1:]])
+			sys.exit("WARNING: Noun POS contains illegal item ({0}). Exited.".format(item))
 
-	#print(genderList)
-	return genderList
+	return getNounGenders(posList)
 
 
 # parse through a string containing the word meaning for each of its POS
@@ -206,17 +378,17 @@ def parseNounGender(posStr):
 
 # toParse: a string that may or may not contain pair(s) of {}
 # returns a list; no. of entries in list depends on no. of pairs of {} (1 entry if no {})
+# +: to match 1 or more repetitions of the preceding RE
+# \w: matches Unicode word characters; this includes most characters that can be part 
+#     of a word in any language, as well as numbers and the underscore
+# group 1 is the content within {}
+RE_MEANING_CURLY = re.compile(r"{([\w\s,;\/\(\)-]+)}")
+
 def parseMeaning(toParse):
     
     if "{" in toParse:
-        # separate {}'s by semi-colon
-        # +: to match 1 or more repetitions of the preceding RE
-        # \w: matches Unicode word characters; this includes most characters that can be part 
-        #     of a word in any language, as well as numbers and the underscore
-        parsedWithCurly = re.findall("{[\w\s,;\/\(\)-]+}", toParse)
-        
-        # within each {}, remove {}
-        parsedWithoutCurly = [re.search("[\w\s,;\/\(\)-]+", item)[0] for item in parsedWithCurly]
+        # separate {}'s by semi-colon; within each {}, remove {}
+        parsedWithoutCurly = RE_MEANING_CURLY.findall(toParse)
         
         return parsedWithoutCurly
     else:
@@ -232,45 +404,42 @@ def printOrNot(content, dontPrint):
 	else:
 		return
 
-# wordInfo: a list representing a row corresponding to a word in CSV
+# wordInfo: a WordRow representing a row corresponding to a word in CSV
 # maskGender: boolean value; if True, mask gender of nouns
-# no return; prints formatted/aligned/padded POS + meaning
-def formatPOSnMean(wordInfo, maskGender, dontQuiz):
-	word = wordInfo[CSV_COL_N_WORD]
-	# posStr: a string of POS(s); like "nm", "adj; nm/nf"
-	posStr = wordInfo[CSV_COL_N_POS]
-	# meanStr: a string of meaning(s); like "blue", "bright; shiny", "{bright}; {blue}"
-	meanStr = wordInfo[CSV_COL_N_MEAN]
-
-	posList = parsePos(posStr)
-	meanList = parseMeaning(meanStr)
-	nPos = len(posList)
-
-	# sanity check
-	if not len(posList)==len(meanList):
-		sys.exit("{0}: lengths of POS and meanings do not match. Check CSV. Exited.".format(word))
+# returns a string: formatted/aligned/padded POS + meaning, one line each
+def renderPOSnMean(wordInfo, maskGender):
+	# posList: POS(s) parsed at load time; like ["nm"], ["adj", "nm/nf"]
+	posList = wordInfo.pos_list
+	# meanList: meaning(s) parsed at load time; like ["blue"], ["bright; shiny"], ["bright", "blue"]
+	meanList = wordInfo.meaning_list
+	checkPOSnMean(wordInfo)
+
+	# if maskGender is True, mask noun POS
+	if maskGender:
+		posList = ["NOUN" if pos.startswith("n") else pos for pos in posList]
+
+	# pad POS to the longest one, and add meaning(s)
+	maxLen = max([len(item) for item in posList])
+	return "".join([pos.rjust(maxLen) + " :" + mean + "\n" for pos, mean in zip(posList, meanList)])
 
-	# find POS that are nouns
-	nounIdx = [idx for idx in range(nPos) if posList[idx][0]=="n"]
 
-	# if noun POS exist(s), and if maskGender is True
-	if len(nounIdx)>0 and maskGender:
-	    for j in nounIdx:
-	    	posList[j] = "NOUN"
+# sanity check: one meaning per POS
+def checkPOSnMean(wordInfo):
+	if not len(wordInfo.pos_list)==len(wordInfo.meaning_list):
+		sys.exit("{0}: lengths of POS and meanings do not match. Check CSV. Exited.".format(wordInfo.word))
 
-	# find max len of POS
-	maxLen = max([len(item) for item in posList])
-	# calculate number of white spaces for padding
-	nPad = [maxLen-len(item) for item in posList]
-	# apply padding(s)
-	posListPadded = [" "*nPad[i] + posList[i] for i in range(nPos)]
 
-	# print with meaning(s)
-	for i in range(nPos):
-		printOrNot(posListPadded[i] + " :" + meanList[i], dontPrint=dontQuiz)
+# wordInfo: a WordRow representing a row corresponding to a word in CSV
+# maskGender: boolean value; if True, mask gender of nouns
+# no return; prints formatted/aligned/padded POS + meaning (unless dontQuiz; see renderPOSnMean)
+def formatPOSnMean(wordInfo, maskGender, dontQuiz):
+	if dontQuiz:
+		checkPOSnMean(wordInfo)
+		return
+	sys.stdout.write(renderPOSnMean(wordInfo, maskGender))
 
 
-# display a word, given its row from csv (as a list)
+# display a word, given its row from csv (as a WordRow)
 # binary combinatorial options of displaying individual components
 
 # format; [] indicates optional
@@ -292,113 +461,182 @@ def formatPOSnMean(wordInfo, maskGender, dontQuiz):
 # nm/nf: malcontent
 # -> le mécontentement #4823
 
-# wordInfo: a list
+# wordInfo: a WordRow
 # maskGender: if True, mask gender of nouns
 # maskWordInPhrase: if True, mask the word itself in $phrase and show "?" instead
-# word, freq, phrases, related, register: boolean values
+# word, freq, phrases, related, register, variation: boolean values
 # freq only makes a difference if word is True
 # maskWordInPhrase only makes a difference if phrases if True
-def displayWord(wordInfo, maskGender, maskWordInPhrase, word, freq, phrases, related, register, dontQuiz):
+# returns the card as a string; see renderCard for a memoized version
+def buildCard(wordInfo, maskGender, maskWordInPhrase, word, freq, phrases, related, register, variation=True):
 
-	if dontQuiz:
-		print(wordInfo[CSV_COL_N_WORD])
+	card = []
 
 	# word [freq]
 	if word:
-		if freq and len(wordInfo[CSV_COL_N_FREQ])>0:
-			printOrNot(wordInfo[CSV_COL_N_WORD] + " #" + wordInfo[CSV_COL_N_FREQ] + "\n", dontPrint=dontQuiz)
+		if freq and wordInfo.frequency_rank is not None:
+			card.append(wordInfo.word + " #" + str(wordInfo.frequency_rank) + "\n\n")
 		else:
-			printOrNot(wordInfo[CSV_COL_N_WORD] + "\n", dontPrint=dontQuiz)
+			card.append(wordInfo.word + "\n\n")
 
 	# variation
 	# only print if not "" (otherwise it'd look like there's a blank line)
-	if len(wordInfo[CSV_COL_N_VAR])>0:
-		printOrNot(wordInfo[CSV_COL_N_VAR], dontPrint=dontQuiz)
+	if variation and len(wordInfo.variation)>0:
+		card.append(wordInfo.variation + "\n")
 
 	# align/format POS and meaning
-	formatPOSnMean(wordInfo, maskGender, dontQuiz)
+	card.append(renderPOSnMean(wordInfo, maskGender))
 
 	# phrases
-	if phrases and len(wordInfo[CSV_COL_N_PHR])>0:
+	if phrases and len(wordInfo.phrases)>0:
 		if maskWordInPhrase:
-		    # mask word in $phrases with ?
-		    maskedPhrase = re.sub(wordInfo[CSV_COL_N_WORD], "?", wordInfo[CSV_COL_N_PHR])
-		    printOrNot(maskedPhrase, dontPrint=dontQuiz)
+			# mask word (and its variation, which often contains it) in $phrases with ?
+			maskedPhrase = wordInfo.phrases
+			if len(wordInfo.variation)>0:
+				maskedPhrase = maskedPhrase.replace(wordInfo.variation, "?")
+			card.append(maskedPhrase.replace(wordInfo.word, "?") + "\n")
 		else:
-			printOrNot(wordInfo[CSV_COL_N_PHR], dontPrint=dontQuiz)
+			card.append(wordInfo.phrases + "\n")
 
 	# related
-	if related and len(wordInfo[CSV_COL_N_REL])>0:
-		printOrNot("-> " + " " + wordInfo[CSV_COL_N_REL], dontPrint=dontQuiz)
+	if related and len(wordInfo.related)>0:
+		card.append("-> " + " " + wordInfo.related + "\n")
 
 	# register
-	if register and len(wordInfo[CSV_COL_N_REG])>0:
-		printOrNot(wordInfo[CSV_COL_N_REG], dontPrint=dontQuiz)
+	if register and len(wordInfo.register)>0:
+		card.append(wordInfo.register + "\n")
+
+	return "".join(card)
+
+
+# buildCard, memoized per (row, display options)
+# at most CARD_CACHE_SIZE cards are kept, least recently shown evicted first
+renderCard = functools.lru_cache(maxsize=CARD_CACHE_SIZE)(buildCard)
+
+
+# display a word (see buildCard), written to stdout in one go
+# dontQuiz: if True, only print the word itself; the card isn't formatted at all,
+#           though POS and meanings are still checked
+def displayWord(wordInfo, maskGender, maskWordInPhrase, word, freq, phrases, related, register, dontQuiz):
+
+	if dontQuiz:
+		print(wordInfo.word)
+		checkPOSnMean(wordInfo)
+		return
+
+	sys.stdout.write(renderCard(wordInfo, maskGender, maskWordInPhrase, word, freq, phrases, related, register))
+
+
+# bulk mode: write the cards of all words in csv to outname (or of words matching filters,
+# see initializeDict), separated by CARD_SEPARATOR
+# cards are unmasked (gender, word in phrases) and complete, unless specified otherwise;
+# they are not memoized, as each is only rendered once
+# returns number of cards written
+def renderAllCards(csvname, outname, maskGender=False, maskWordInPhrase=False, filters=None):
 
+	dictRows = initializeDict(csvname, nounGenderQuiz=False, filters=filters)
+
+	with instrument.stage("render all"):
+		with open(outname, "w", encoding="utf-8", buffering=EXPORT_BUFFER_SIZE) as f:
+			f.writelines(CARD_SEPARATOR + buildCard(row, maskGender, maskWordInPhrase, True, True, True, True, True) for row in dictRows)
+	instrument.count("cards rendered", len(dictRows))
+
+	return len(dictRows)
 
 
 # given noun and its true gender(s) in a list
 # solicit and assess user input of gender(s)
 # dontQuiz: boolean; if True, don't quiz user; just run thru in background (for testing purpose)
-def genderQuizSingleWord(wordInfo, dontQuiz):
-
-	quizWord = wordInfo[CSV_COL_N_WORD]
-	posFull = wordInfo[CSV_COL_N_POS]
-	genderTruth = parseNounGender(posFull)
-	meaning = parseMeaning(wordInfo[CSV_COL_N_MEAN])
+# readAnswer: answer source (see keyboardAnswer); default: keyboard
+# out: stream to write card, prompts and feedback to (default: stdout)
+# returns a dict: word, correct (boolean), trials (number of trials used), answers (inputs,
+# each formatted as by formatAnswer), hints (one per wrong answer), invalid (number of
+# malformed inputs), truth (formatted as by formatAnswer); None if dontQuiz
+# raises EOFError if readAnswer runs out of answers
+def genderQuizSingleWord(wordInfo, dontQuiz, readAnswer=keyboardAnswer, out=None):
+
+	quizWord = wordInfo.word
+	# as a list, to be compared with input (a list)
+	genderTruth = list(wordInfo.gender_truth)
+	if len(genderTruth)==0:
+		sys.exit("WARNING: No noun POS with gender ({0}). Exited.".format(quizWord))
 
 	# set max number of failures allowed
-	remainingTrials = 3
+	remainingTrials = QUIZ_TRIALS
 
 	# display word
-	printOrNot("\n* * * * * * * * * * * * * * * * * *\n", dontQuiz)
-	displayWord(wordInfo, maskGender=True, maskWordInPhrase=False, word=True, freq=True, phrases=True, related=True, register=True, dontQuiz=dontQuiz)
-	printOrNot(" ", dontQuiz)
+	with instrument.stage("render"):
+		if dontQuiz:
+			displayWord(wordInfo, maskGender=True, maskWordInPhrase=False, word=True, freq=True, phrases=True, related=True, register=True, dontQuiz=dontQuiz)
+		else:
+			(out or sys.stdout).write(CARD_SEPARATOR + renderCard(wordInfo, *GENDER_CARD_OPTIONS) + " \n")
+	instrument.count("cards rendered")
 
 
 	# TODO: play pronuncation of the word (optional? indicated by keyboard input?)
-	if not dontQuiz:
-		while remainingTrials > 0:
-			remainingTrials -=1
-			# solicit input
-			currentInput = getGenderFromKeyboard()
-			# assess input
-			currentAssess = assessGenderInput(currentInput, genderTruth)
-			if currentAssess:
-				print("Très bien!")
-				return
+	if dontQuiz:
+		return None
+
+	result = {"word": quizWord, "correct": False, "trials": 0, "answers": [], "hints": [], "invalid": 0,
+		"truth": formatAnswer(genderTruth)}
+	while remainingTrials > 0:
+		remainingTrials -=1
+		# solicit input
+		currentInput, nInvalid = readGenderAnswer(readAnswer, wordInfo, out)
+		result["trials"] += 1
+		result["invalid"] += nInvalid
+		result["answers"].append(formatAnswer(currentInput))
+		# assess input
+		currentAssess, hint = gradeGenderInput(currentInput, genderTruth)
+		if currentAssess:
+			print("Très bien!", file=out)
+			result["correct"] = True
+			return result
+		else:
+			print(hint, file=out)
+			result["hints"].append(hint)
+			if remainingTrials>0:
+				print("{0} trials left.".format(remainingTrials), file=out)
 			else:
-				if remainingTrials>0:
-					print("{0} trials left.".format(remainingTrials))
-				else:
-				    # reveal correct answer
-				    correctAnswer = formatAnswer(genderTruth)
-				    print("Correct answer: {0}".format(correctAnswer))
+			    # reveal correct answer
+			    print("Correct answer: {0}".format(result["truth"]), file=out)
+
+	return result
 
 
 # given a list of words and their corresponding POS
 # each word is a string; each POS is a string too
 # run gender quiz for nouns for which gender info is available in their POS
-def genderQuizWordList(wordRows, dontQuiz):
-
-	for i in range(len(wordRows)):
-		genderQuizSingleWord(wordRows[i], dontQuiz)
-
-
-# given a list of POS (specifically, lstPOS from getWordInfofromCSV)
-# e.g. ['intj; nm', 'v', 'nf', 'nm', 'nm', 'nf']
-# parse and get unique set of POS in the database
+# scheduler: optional srs.ReviewScheduler; if given, each result is recorded as soon as it's in
+# watcher: optional watch.DictWatcher; if given, edits to csv are picked up before each word,
+#          and words removed from csv (or no longer nouns) are dropped from the quiz
+# returns a list of results (see genderQuizSingleWord)
+def genderQuizWordList(wordRows, dontQuiz, scheduler=None, watcher=None):
+
+	results = []
+	i = 0
+	while i < len(wordRows):
+		# edits to csv are picked up before each word (see watch.DictWatcher)
+		if watcher is not None and watcher.poll():
+			wordRows = wordRows[:i] + watcher.refreshRows(wordRows[i:], nounsOnly=True)
+			if i >= len(wordRows):
+				break
+		result = genderQuizSingleWord(wordRows[i], dontQuiz)
+		if scheduler is not None and result is not None:
+			scheduler.record(result["word"], result)
+		results.append(result)
+		i += 1
+
+	return results
+
+
+# given a list of POS (strings, e.g. ['intj; nm', 'v', 'nf']; or WordRow, whose pos_list
+# parsed at load time is then used)
+# get unique set of POS in the database
 # returns a set containing unique POS found in database
 def getUniquePOS(lstPOS):
-	
-	# get a nested list
-	nestedLstParsedPOS = [parsePos(POS) for POS in lstPOS]
-	# flatten lstParsedPOS
-	flatLstParsedPOS = [item for sublist in nestedLstParsedPOS for item in sublist]
-	# get unique POS from flattened list
-	uniquePOS = set(flatLstParsedPOS)
 
-	return uniquePOS
+	return {pos for POS in lstPOS for pos in (POS.pos_list if isinstance(POS, WordRow) else parsePos(POS))}
 
 # given a set of unique POS found in database, check against LEGAL_POS
 # returns True if all unique POS are legal; False otherwise
@@ -406,204 +644,1747 @@ def checkUniquePOS(uniqueSetPOS):
 
 	return uniqueSetPOS.issubset(LEGAL_POS)
 
-# given a csv, generate:
-# a nested list
-# each nested component is itself a list, representing a column from csv
-# items in nested componenets correspond in terms of index
-# e.g. a list of words; each word is a string (e.g. "courageux")
-# e.g. a list of POS corresponding to the words; each POS is a string (e.g. "adj; nm")
-def getWordInfofromCSV(csvname):
-    
-    with open(csvname, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        wordColsAll = [ [ row[CSV_COL_FREQ], row[CSV_COL_NA], row[CSV_COL_WORD], row[CSV_COL_POS], row[CSV_COL_VAR], row[CSV_COL_MEAN], row[CSV_COL_PHR], row[CSV_COL_REL], row[CSV_COL_REG] ] for row in reader ]
-    
-    # columns    
-    # can't int("")
-    lstFreq = [wordColsCur[CSV_COL_N_FREQ] for wordColsCur in wordColsAll]
-    lstNA   = [wordColsCur[CSV_COL_N_NA] for wordColsCur in wordColsAll]
-    lstWord = [wordColsCur[CSV_COL_N_WORD] for wordColsCur in wordColsAll]
-    lstPOS  = [wordColsCur[CSV_COL_N_POS] for wordColsCur in wordColsAll]
-    lstVar  = [wordColsCur[CSV_COL_N_VAR] for wordColsCur in wordColsAll]
-    lstMean = [wordColsCur[CSV_COL_N_MEAN] for wordColsCur in wordColsAll]
-    lstPhr  = [wordColsCur[CSV_COL_N_PHR] for wordColsCur in wordColsAll]
-    lstRel  = [wordColsCur[CSV_COL_N_REL] for wordColsCur in wordColsAll]
-    lstReg  = [wordColsCur[CSV_COL_N_REG] for wordColsCur in wordColsAll]
-
-    # sanity check
-    uniqSetPOS = getUniquePOS(lstPOS)
-    # exit if there is illegal POS in csv
-    # also notify user which POS is illegal
-    if not checkUniquePOS(uniqSetPOS):
-    	sys.exit("Warning: Illegal POS found in csv: " + str(uniqSetPOS.difference(LEGAL_POS)) + ". Exited.")
-    
-    # rows
-    # nested list; each entry is itself a list corresponding to a word
-    wordRows = [ [lstFreq[idx], lstNA[idx], lstWord[idx], lstPOS[idx], lstVar[idx], lstMean[idx], lstPhr[idx], lstRel[idx], lstReg[idx]] for idx in range(len(lstWord))]
+# positions of CSV_COLS in a csv header (a list of column names); exits if one is missing
+def getCSVColIdx(header):
+
+	try:
+		return [header.index(col) for col in CSV_COLS]
+	except ValueError:
+		sys.exit("Warning: csv must have columns {0}. Exited.".format(", ".join(CSV_COLS)))
+
+# given a csv, read it once from top to bottom
+# yields (line number, list of raw strings in the order of CSV_COLS) per word
+def iterCSVFields(csvname):
+
+	with open(csvname, newline='') as csvfile:
+		reader = csv.reader(csvfile)
+
+		# map columns by header name once
+		colIdx = getCSVColIdx(next(reader, []))
+		nCols = max(colIdx) + 1
+
+		for row in reader:
+			# short rows (trailing empty cells dropped) are padded
+			if len(row) < nCols:
+				row = row + [""]*(nCols-len(row))
+			yield reader.line_num, [row[i] for i in colIdx]
+
+
+# WordRow of a word, given its csv fields (frequency rank already an int, or None)
+# parsed fields are computed from them
+def makeWordRow(freq, na, word, posStr, var, mean, phr, rel, reg):
+
+	posList = parsePos(posStr)
+	genderList = getNounGenders(posList)
+	return WordRow(freq, na, word, posStr, var, mean, phr, rel, reg,
+		tuple(posList), tuple(genderList), tuple(parseMeaning(mean)), len(genderList)>0)
+
+
+# given a csv, read it once from top to bottom and yield one WordRow per word
+# POS is validated inline; if illegal POS (or a non-integer frequency_rank) is
+# found, sys.exit() is triggered once the whole file has been read, listing all offenders
+def iterWordRows(csvname):
+
+	illegalPOS = set()
+	illegalFreq = []
+
+	for lineNum, fields in iterCSVFields(csvname):
+		freq = fields[CSV_COL_N_FREQ]
+
+		# can't int("")
+		if freq:
+			try:
+				freq = int(freq)
+			except ValueError:
+				illegalFreq.append(fields[CSV_COL_N_WORD])
+				freq = None
+		else:
+			freq = None
+
+		wordRow = makeWordRow(freq, *fields[1:])
+		for pos in wordRow.pos_list:
+			if pos not in LEGAL_POS_SET:
+				illegalPOS.add(pos)
+		yield wordRow
+
+	# exit if there is illegal POS in csv
+	# also notify user which POS is illegal
+	if len(illegalPOS)>0:
+		sys.exit("Warning: Illegal POS found in csv: " + str(illegalPOS) + ". Exited.")
+	if len(illegalFreq)>0:
+		sys.exit("Warning: Non-integer frequency_rank found in csv for: " + str(illegalFreq) + ". Exited.")
+
+
+# given a csv, generate a list of rows
+# each row is a WordRow, representing a word (see iterWordRows)
+def parseWordInfoCSV(csvname):
+
+	return list(iterWordRows(csvname))
+
+
+# True if filename is a SQLite database (rather than a csv)
+def isSQLiteFile(filename):
+
+	try:
+		with open(filename, "rb") as f:
+			return f.read(len(SQLITE_HEADER))==SQLITE_HEADER
+	except OSError:
+		return False
+
+
+# pause garbage collection while many objects holding no cycles (e.g. rows) are built:
+# collections triggered by their allocation alone would find nothing to free
+@contextlib.contextmanager
+def pausedGC():
+
+	wasEnabled = gc.isenabled()
+	gc.disable()
+	try:
+		yield
+	finally:
+		if wasEnabled:
+			gc.enable()
+
+
+# path of the compiled cache for a csv, or of one of its indexes (e.g. mots.csv.filter.cache)
+def getCachePath(csvname, indexName=None):
+	if indexName is None:
+		return csvname + CACHE_SUFFIX
+	return "{0}.{1}{2}".format(csvname, indexName, CACHE_SUFFIX)
+
+
+# content hash of a file (sha1 hex digest), read in 1 MB blocks
+def getFileHash(filename):
+
+	h = hashlib.sha1()
+	with open(filename, "rb") as f:
+		for block in iter(lambda: f.read(1 << 20), b""):
+			h.update(block)
+
+	return h.hexdigest()
+
+
+# stamp identifying the current state of a csv
+# returns a dict with cache version, absolute path, size and mtime
+# content hash (sha1) is only computed if withHash is True
+def getCSVStamp(csvname, withHash):
+
+	st = os.stat(csvname)
+	stamp = {"version": CACHE_VERSION, "path": os.path.abspath(csvname), "size": st.st_size, "mtime": st.st_mtime_ns, "sha1": None}
+
+	if withHash:
+		stamp["sha1"] = getFileHash(csvname)
+
+	return stamp
+
+
+# write stamp (header), headwords, then rows, to cache as three consecutive marshal objects
+# (the header, and the headwords, can be read without reading the rest; the rest is read
+# in one go, as marshal.load on a file is much slower than marshal.loads on bytes)
+# headwords: distinct words, in order of rows (see readCachedWords); their size is in the header
+# rows are stored as plain tuples (marshal can't store WordRow)
+# indexes are cached on their own, when first used (see writeIndexCache)
+def writeDictCache(csvname, stamp, wordRows):
+
+	words = marshal.dumps(list(dict.fromkeys([row.word for row in wordRows])))
+	writeCacheFile(getCachePath(csvname), dict(stamp, wordsBytes=len(words)),
+		[words, marshal.dumps([tuple(row) for row in wordRows])])
+
+
+# write header (a marshal object), then parts (bytes), to a cache file
+# write to a temp file first and rename, so that a crash never leaves a half-written cache
+def writeCacheFile(cachename, header, parts):
+
+	tmpname = cachename + ".tmp{0}".format(os.getpid())
+	try:
+		with open(tmpname, "wb") as f:
+			marshal.dump(header, f)
+			for part in parts:
+				f.write(part)
+		os.replace(tmpname, cachename)
+	except (OSError, ValueError) as e:
+		# cache is an optimization only; never fatal
+		print("Warning: could not write cache {0} ({1}).".format(cachename, e))
+		try:
+			os.remove(tmpname)
+		except OSError:
+			pass
+
+
+# read rows from the compiled cache of a csv
+# returns None if there is no usable cache (missing, corrupt, or csv changed since)
+# otherwise returns a list of WordRow and the stamp of the csv they're from (with its hash,
+# which indexes cached later are checked against; see readIndexCache)
+# if only size/mtime differ but content hash matches (e.g. file touched or copied),
+# the cache is reused and its stamp refreshed
+def readDictCache(csvname):
+
+	cachename = getCachePath(csvname)
+	if not os.path.isfile(cachename):
+		return None
+
+	try:
+		with open(cachename, "rb") as f:
+			cached = marshal.load(f)
+			if not isinstance(cached, dict) or cached.get("version")!=CACHE_VERSION:
+				return None
+
+			stamp = getCSVStamp(csvname, withHash=False)
+			if cached["path"]!=stamp["path"]:
+				return None
+
+			isFresh = cached["size"]==stamp["size"] and cached["mtime"]==stamp["mtime"]
+			if not isFresh:
+				# size or mtime changed: fall back to comparing content
+				stamp["sha1"] = getFileHash(csvname)
+				if cached["sha1"]!=stamp["sha1"]:
+					return None
+			stamp["sha1"] = cached["sha1"]
+
+			f.seek(cached["wordsBytes"], os.SEEK_CUR)
+			wordRows = list(map(WordRow._make, marshal.loads(f.read())))
+	except (OSError, EOFError, ValueError, TypeError, KeyError):
+		return None
+
+	if not isFresh:
+		writeDictCache(csvname, stamp, wordRows)
+	return wordRows, stamp
+
+
+# write an index of a csv's rows (see CACHED_INDEXES) to its own cache file
+# stamp: stamp of the csv the rows are from (see readDictCache), with its hash
+def writeIndexCache(csvname, name, stamp, index):
+	writeCacheFile(getCachePath(csvname, name), {"version": CACHE_VERSION, "path": stamp["path"], "sha1": stamp["sha1"]},
+		[marshal.dumps(index)])
+
+
+# read an index of a csv's rows from its cache file
+# returns None if it's missing, corrupt, or not built from the rows of stamp (by content hash)
+def readIndexCache(csvname, name, stamp):
+
+	try:
+		with open(getCachePath(csvname, name), "rb") as f:
+			cached = marshal.load(f)
+			if not isinstance(cached, dict) or cached.get("version")!=CACHE_VERSION or cached["path"]!=stamp["path"] \
+				or cached["sha1"]!=stamp["sha1"]:
+				return None
+			return marshal.loads(f.read())
+	except (OSError, EOFError, ValueError, TypeError, KeyError):
+		return None
+
+
+# read headwords (distinct words, in order of rows) from the compiled cache of a csv,
+# without reading its rows
+# returns None if cache is missing, corrupt, or older than csv (by size or mtime)
+def readCachedWords(csvname):
+
+	try:
+		with open(getCachePath(csvname), "rb") as f:
+			cached = marshal.load(f)
+			stamp = getCSVStamp(csvname, withHash=False)
+			if not isinstance(cached, dict) or cached.get("version")!=CACHE_VERSION or cached["path"]!=stamp["path"] \
+				or cached["size"]!=stamp["size"] or cached["mtime"]!=stamp["mtime"]:
+				return None
+			return marshal.loads(f.read(cached["wordsBytes"]))
+	except (OSError, EOFError, ValueError, TypeError, KeyError):
+		return None
+
+
+# given a csv, get its rows (see parseWordInfoCSV)
+# rows are served from the compiled cache next to the csv if it is up to date (see loadDict)
+# useCache: if False, always parse the csv and leave the cache untouched
+def getWordInfofromCSV(csvname, useCache=True):
+
+	return loadDict(csvname, useCache).rows
+
+# strip diacritics and casefold a word, for accent-insensitive matching
+# e.g. "Élève" -> "eleve"
+def foldWord(word):
+
+	# nothing to strip
+	if word.isascii():
+		return word.casefold()
+	decomposed = unicodedata.normalize("NFD", word)
+	return "".join([c for c in decomposed if not unicodedata.combining(c)]).casefold()
+
+
+# number of typos (edits) tolerated in a word of that many letters (see TYPO_MIN_LEN_1)
+def getMaxTypos(nLetters):
+	if nLetters >= TYPO_MIN_LEN_2:
+		return 2
+	if nLetters >= TYPO_MIN_LEN_1:
+		return 1
+	return 0
+
+
+# edit (Levenshtein) distance between strings a and b, if at most maxDist; otherwise maxDist+1
+# stops as soon as the distance is known to be over maxDist
+def editDistance(a, b, maxDist):
+
+	if abs(len(a)-len(b)) > maxDist:
+		return maxDist+1
+
+	prev = list(range(len(b)+1))
+	for i, ca in enumerate(a, 1):
+		cur = [i]
+		rowMin = i
+		for j, cb in enumerate(b, 1):
+			dist = min(prev[j]+1, cur[j-1]+1, prev[j-1]+(ca!=cb))
+			cur.append(dist)
+			if dist < rowMin:
+				rowMin = dist
+		if rowMin > maxDist:
+			return maxDist+1
+		prev = cur
+
+	return min(prev[-1], maxDist+1)
+
+
+# set of trigrams of a (folded) term, padded so that its first and last letters count as much
+# as the others: a term of n letters has n+2 trigrams (fewer if some repeat)
+def getTrigrams(term):
+	padded = "  " + term + "  "
+	return {padded[i:i+3] for i in range(len(term)+2)}
+
+
+# grade input word (a string) against wordInfo (a WordRow) in meaning to word quiz
+# correct if input is the word or its variation, ignoring case and up to getMaxTypos typos;
+# a hint then gives the exact spelling
+# input that is another word of wordDict (e.g. "mer" for "mère") is wrong, however close
+# ignoreAccents: if True, missing or wrong accents (see foldWord) are forgiven too;
+#                otherwise they make the answer wrong, with a hint to check them
+# wordDict: optional MotsDict of all words; if given, a wrong answer gets a hint about the
+#           word typed, or "did you mean" suggestions of words close to it (see findSimilarWords)
+# returns (correct, hint), as gradeGenderInput
+def gradeWordInput(wordInput, wordInfo, wordDict=None, ignoreAccents=False):
+
+	wordInput = wordInput.strip()
+	targets = [wordInfo.word]
+	if len(wordInfo.variation)>0:
+		targets.append(wordInfo.variation)
+
+	for target in targets:
+		if wordInput.casefold()==target.casefold():
+			return True, None
+
+	# another word, typed as in csv (or in lower case), is never a typo of this one
+	if wordDict is not None:
+		for form in dict.fromkeys([wordInput, wordInput.lower()]):
+			if lookupWord(wordDict, form)==[form]:
+				other = wordDict[wordDict.getIndex("word")[0][form][0]]
+				return False, "Not quite: {0} is {1}.".format(form, "; ".join(other.meaning_list).strip())
+
+	folded = foldWord(wordInput)
+	for target in targets:
+		foldedTarget = foldWord(target)
+		if folded==foldedTarget:
+			if ignoreAccents:
+				return True, "Watch the accents: {0}".format(target)
+			return False, "Not quite: check the accents."
+		# without ignoreAccents, an accent left out counts as a typo
+		maxTypos = getMaxTypos(len(foldedTarget))
+		if ignoreAccents:
+			distance = editDistance(folded, foldedTarget, maxTypos)
+		else:
+			distance = editDistance(wordInput.casefold(), target.casefold(), maxTypos)
+		if maxTypos>0 and distance<=maxTypos:
+			return True, "Watch the spelling: {0}".format(target)
+
+	if wordDict is None or len(folded)==0:
+		return False, "Not quite."
+	similar = [(dist, form, idx) for dist, form, idx in findSimilarWords(wordDict, wordInput, SUGGEST_LIMIT+1) if form not in targets]
+	if len(similar)>0 and similar[0][0]==0:
+		other = wordDict[similar[0][2]]
+		return False, "Not quite: {0} is {1}.".format(similar[0][1], "; ".join(other.meaning_list).strip())
+	if len(similar)>0:
+		return False, "Not quite. Did you mean: {0}?".format(", ".join([form for dist, form, idx in similar[:SUGGEST_LIMIT]]))
+	return False, "Not quite."
+
+
+# builders of indexes over database rows, by name (see MotsDict.getIndex)
+# each builder takes a list of WordRow and returns the index
+INDEX_BUILDERS = {}
+
+
+# database rows (WordRow), plus indexes over them
+# an index is built the first time it's asked for and kept for as long as the
+# MotsDict lives, i.e. once per dictionary load
+# behaves like a list of rows: len(), [] and iteration work as before
+# shards: (name, start, end) of the csv shard each range of rows comes from, in order (see
+#   loadShards); None for a subset, whose rows may come in any order
+# stamp: stamp of the csv rows are from (see readDictCache), if they're all of it, unchanged;
+#   indexes in CACHED_INDEXES are then read from (or written to) their cache files
+#   (see getCachedIndex); None otherwise (e.g. a subset, or rows updated in place)
+class MotsDict:
+
+	def __init__(self, rows, csvname=None, shards=None, stamp=None):
+		self.rows = rows
+		self.csvname = csvname
+		self.shards = shards
+		self.stamp = stamp
+		self.indexes = {}
+
+	def __len__(self):
+		return len(self.rows)
+
+	def __getitem__(self, idx):
+		return self.rows[idx]
+
+	def __iter__(self):
+		return iter(self.rows)
+
+	# get index by name, building it if needed
+	# name is a key of INDEX_BUILDERS, optionally followed by ":" and a parameter passed
+	# to the builder (e.g. "alias:zipf")
+	def getIndex(self, name):
+		if name not in self.indexes:
+			kind, sep, param = name.partition(":")
+			if name in CACHED_INDEXES and self.stamp is not None:
+				self.indexes[name] = getCachedIndex(self, name)
+			elif sep:
+				self.indexes[name] = INDEX_BUILDERS[kind](self.rows, param)
+			else:
+				self.indexes[name] = INDEX_BUILDERS[kind](self.rows)
+		return self.indexes[name]
+
+	# returns a new MotsDict containing rows at idxList (in that order)
+	# indexes are not shared, as row indices differ
+	def subset(self, idxList):
+		return MotsDict([self.rows[i] for i in idxList], self.csvname)
+
+
+# build word index over rows
+# returns 2 dicts:
+#   exactIdx: word -> list of row indices (more than 1 if a word has several rows)
+#   foldIdx:  folded word (see foldWord) -> list of distinct words with that folded form
+def buildWordIndex(rows):
+
+	exactIdx = {}
+	foldIdx = {}
+	for idx, row in enumerate(rows):
+		word = row[CSV_COL_N_WORD]
+		if word in exactIdx:
+			exactIdx[word].append(idx)
+		else:
+			exactIdx[word] = [idx]
+			foldIdx.setdefault(foldWord(word), []).append(word)
+
+	return exactIdx, foldIdx
+
+INDEX_BUILDERS["word"] = buildWordIndex
+
+
+# build noun index over rows
+# returns a list of row indices of words that are or can be nouns
+# (decided at load time from POS; see is_noun in WordRow)
+def buildNounIndex(rows):
+
+	return [idx for idx, row in enumerate(rows) if row.is_noun]
+
+INDEX_BUILDERS["noun"] = buildNounIndex
+
+
+# build typo index over rows: trigrams of folded headwords and variations (terms)
+# (see findSimilarWords)
+# returns a dict:
+#   terms:    sorted list of distinct terms
+#   termRows: for each term, list of row indices of words having it as headword or variation
+#   nTrigrams: for each term, its number of distinct trigrams (see getTrigrams)
+#   postings:  term length -> trigram -> list of indices (into terms) of terms of that length
+#              having that trigram
+# not cached with the csv: it's only needed by the meaning to word quiz, and is about as
+# quick to build as to load
+def buildTypoIndex(rows):
+
+	termRows = {}
+	for idx, row in enumerate(rows):
+		termRows.setdefault(foldWord(row.word), []).append(idx)
+		if len(row.variation)>0:
+			termRows.setdefault(foldWord(row.variation), []).append(idx)
+	terms = sorted(termRows)
+
+	nTrigrams = []
+	postings = {}
+	for termIdx, term in enumerate(terms):
+		lenPostings = postings.setdefault(len(term), {})
+		termTrigrams = getTrigrams(term)
+		nTrigrams.append(len(termTrigrams))
+		for trigram in termTrigrams:
+			if trigram in lenPostings:
+				lenPostings[trigram].append(termIdx)
+			else:
+				lenPostings[trigram] = [termIdx]
+
+	return {"terms": terms, "termRows": [termRows[term] for term in terms], "nTrigrams": nTrigrams,
+		"postings": postings}
+
+INDEX_BUILDERS["typo"] = buildTypoIndex
+
+
+# find words within a few typos of word, ignoring case and accents (see foldWord)
+# an edit changes at most 3 trigrams (see getTrigrams), so a term within k edits of word
+# shares at least max(t(word), t(term)) - 3k distinct trigrams with it, t being the number
+# of distinct trigrams (n+2 for n letters, fewer if some repeat, as in "bonbon");
+# only terms of length within k of word's are looked at, shared trigrams are counted from
+# postings, and edit distance is only computed for terms sharing enough of them
+# maxTypos: default getMaxTypos of word's length
+# returns up to limit (distance, form, row index), closest first, then most frequent first;
+#   form is the headword or variation (as in csv) matched
+def findSimilarWords(wordDict, word, limit=SUGGEST_LIMIT, maxTypos=None):
+
+	index = wordDict.getIndex("typo")
+	folded = foldWord(word.strip())
+	if maxTypos is None:
+		maxTypos = getMaxTypos(len(folded))
+	trigrams = getTrigrams(folded)
+
+	matches = []
+	for termLen in range(max(1, len(folded)-maxTypos), len(folded)+maxTypos+1):
+		lenPostings = index["postings"].get(termLen)
+		if lenPostings is None:
+			continue
+		shared = Counter()
+		for trigram in trigrams:
+			if trigram in lenPostings:
+				shared.update(lenPostings[trigram])
+		for termIdx, nShared in shared.items():
+			if nShared >= max(len(trigrams), index["nTrigrams"][termIdx]) - 3*maxTypos:
+				dist = editDistance(folded, index["terms"][termIdx], maxTypos)
+				if dist <= maxTypos:
+					for idx in index["termRows"][termIdx]:
+						row = wordDict[idx]
+						form = row.word if foldWord(row.word)==index["terms"][termIdx] else row.variation
+						matches.append((dist, row.frequency_rank is None, row.frequency_rank or 0, form, idx))
+
+	matches.sort()
+	return [(dist, form, idx) for dist, unranked, rank, form, idx in matches[:limit]]
+
+
+# weight of each row for sampling, given a weighting (a string) and the frequency ranks of rows
+# weightings:
+#   "uniform":          all rows weigh the same
+#   "zipf" / "zipf:s":  weight = 1/rank^s (s defaults to ZIPF_EXPONENT); unranked rows weigh
+#                       as much as the rarest ranked word
+#   "top:N":            rows ranked <= N weigh the same; all other rows are never drawn
+# ranks: frequency rank of each row (None if unranked)
+# returns a list of weights (floats >= 0)
+def getSampleWeights(ranks, weighting):
+
+	curve, sep, param = weighting.partition(":")
+
+	# s and N must be numbers (e.g. "zipf:1.2", "top:1000")
+	try:
+		if curve=="uniform" and not sep:
+			return [1.0]*len(ranks)
+		if curve=="zipf":
+			exponent = float(param) if sep else ZIPF_EXPONENT
+			maxRank = max([rank for rank in ranks if rank is not None] or [1])
+			return [(rank if rank is not None and rank>0 else maxRank) ** -exponent for rank in ranks]
+		if curve=="top":
+			topN = int(param)
+			return [1.0 if rank is not None and rank<=topN else 0.0 for rank in ranks]
+	except ValueError:
+		pass
+
+	sys.exit("Unknown weighting '{0}' (use uniform, zipf, zipf:s or top:N). Exited.".format(weighting))
+
+
+# build alias table (Vose's method) for drawing row indices with probability proportional
+# to weights, in O(1) per draw; O(n) to build
+# returns (prob, alias, weights, nDrawable): draw i uniformly, keep it with probability prob[i],
+# else take alias[i] (see drawWeighted); nDrawable is the number of rows with weight > 0
+def buildAliasTable(weights):
+
+	n = len(weights)
+	total = sum(weights)
+	nDrawable = sum([1 for w in weights if w>0])
+	prob = [1.0]*n
+	alias = list(range(n))
+	if total<=0:
+		return prob, alias, weights, nDrawable
+
+	scaled = [w*n/total for w in weights]
+	small = [i for i in range(n) if scaled[i]<1.0]
+	large = [i for i in range(n) if scaled[i]>=1.0]
+	while len(small)>0 and len(large)>0:
+		s = small.pop()
+		l = large.pop()
+		prob[s] = scaled[s]
+		alias[s] = l
+		scaled[l] = scaled[l] + scaled[s] - 1.0
+		if scaled[l]<1.0:
+			small.append(l)
+		else:
+			large.append(l)
+	# what's left is 1 up to rounding error
+
+	return prob, alias, weights, nDrawable
+
+
+# index builder: alias table of rows for a weighting (see getSampleWeights)
+def buildAliasIndex(rows, weighting):
+
+	return buildAliasTable(getSampleWeights([row.frequency_rank for row in rows], weighting))
+
+INDEX_BUILDERS["alias"] = buildAliasIndex
+
+
+# draw size row indices from an alias table (see buildAliasTable)
+# replace: if False, no index is drawn twice; duplicates are redrawn, which is cheap as long as
+#   size is small next to the number of rows that can be drawn; otherwise falls back to
+#   weighted sampling by random keys (Efraimidis-Spirakis), O(n log size)
+# rng: random.Random to draw from (default: the random module's)
+# returns a list of row indices; exits if there aren't enough rows with weight > 0
+def drawWeighted(aliasTable, size, replace=False, rng=None):
+
+	randomFn = rng.random if rng is not None else random
+	randrangeFn = rng.randrange if rng is not None else randrange
+	prob, alias, weights, nDrawable = aliasTable
+	n = len(prob)
+	if size<0 or nDrawable==0 or (not replace and size>nDrawable):
+		sys.exit("size must be >0 & <= {0}".format(nDrawable) + ". Exited")
+
+	drawn = []
+	seen = set()
+	attempts = 0
+	maxAttempts = 4*size + 100
+	while len(drawn)<size and (replace or size*2<=nDrawable) and attempts<maxAttempts:
+		attempts += 1
+		i = randrangeFn(n)
+		if randomFn()>=prob[i]:
+			i = alias[i]
+		if replace or i not in seen:
+			drawn.append(i)
+			seen.add(i)
+
+	if len(drawn)<size:
+		# too many duplicates: key each row by u^(1/w) and keep the largest
+		keys = [(randomFn() ** (1.0/w), i) for i, w in enumerate(weights) if w>0 and i not in seen]
+		drawn.extend([i for key, i in heapq.nlargest(size-len(drawn), keys)])
+
+	return drawn
+
+
+# set of row indices as a bitset (an int; bit i set if row i is in set), built in O(n)
+# (setting bits one at a time on an int would copy it every time)
+def idxToBits(idxList, nRows):
+
+	bitmap = bytearray((nRows+7)//8)
+	for i in idxList:
+		bitmap[i>>3] |= 1 << (i & 7)
+
+	return int.from_bytes(bitmap, "little")
+
+
+# positions of set bits in each possible byte value
+BYTE_BITS = [tuple([bit for bit in range(8) if byte >> bit & 1]) for byte in range(256)]
+
+# row indices in a bitset (see idxToBits), in ascending order
+def bitsToIdx(bits):
+
+	idxList = []
+	bitmap = bits.to_bytes((bits.bit_length()+7)//8, "little")
+	for byteIdx, byte in enumerate(bitmap):
+		if byte:
+			base = byteIdx << 3
+			idxList.extend([base + bit for bit in BYTE_BITS[byte]])
+
+	return idxList
+
+
+# build filter index over rows, for filterIdx
+# returns a dict:
+#   freqRanks, freqIdx: frequency ranks in ascending order, and the row index of each
+#   pos, gender, register: dicts of value -> bitset of rows having that value
+#   phrases, variation, noun: bitsets of rows having phrases / a variation / a noun POS
+#   all: bitset of all rows
+def buildFilterIndex(rows):
+
+	nRows = len(rows)
+	ranked = sorted([(row.frequency_rank, idx) for idx, row in enumerate(rows) if row.frequency_rank is not None])
+
+	posIdx = {}
+	genderIdx = {}
+	registerIdx = {}
+	for idx, row in enumerate(rows):
+		for pos in set(row.pos_list):
+			posIdx.setdefault(pos, []).append(idx)
+		for gender in set(row.gender_truth):
+			genderIdx.setdefault(gender, []).append(idx)
+		for register in set(parsePos(row.register)) if len(row.register)>0 else ():
+			registerIdx.setdefault(register, []).append(idx)
+
+	return {
+		"freqRanks": [rank for rank, idx in ranked],
+		"freqIdx": [idx for rank, idx in ranked],
+		"pos": {pos: idxToBits(idxList, nRows) for pos, idxList in posIdx.items()},
+		"gender": {gender: idxToBits(idxList, nRows) for gender, idxList in genderIdx.items()},
+		"register": {register: idxToBits(idxList, nRows) for register, idxList in registerIdx.items()},
+		"phrases": idxToBits([idx for idx, row in enumerate(rows) if len(row.phrases)>0], nRows),
+		"variation": idxToBits([idx for idx, row in enumerate(rows) if len(row.variation)>0], nRows),
+		"noun": idxToBits([idx for idx, row in enumerate(rows) if row.is_noun], nRows),
+		"all": (1 << nRows) - 1,
+	}
+
+INDEX_BUILDERS["filter"] = buildFilterIndex
+
+
+# row indices of wordDict (a MotsDict) matching all given filters (None: no filter)
+# pos, gender, register: a value or a list of values (a row matches if it has any of them)
+#   e.g. pos="nf(pl)", gender=["m", "mf"], register="formal"
+# freqMin, freqMax: range of frequency rank (inclusive); unranked rows never match
+# hasPhrases, hasVariation, isNoun: True/False to keep rows with/without phrases etc.
+# meaning: English words (e.g. "colour"); rows with a meaning containing all of them
+#   (see lookupMeaning), e.g. for a quiz around a theme
+# shard: a shard name or a list of them (see getShardName); rows from any of these csv shards
+#   (only for a whole dictionary, not a subset; see loadShards)
+# each filter is a bitset from the filter index; combining them is a bitwise AND
+# (a store.SQLiteDict runs filters as one indexed query instead)
+# returns a list of row indices, in ascending order
+def filterIdx(wordDict, pos=None, gender=None, register=None, freqMin=None, freqMax=None, hasPhrases=None, hasVariation=None, isNoun=None, meaning=None, shard=None):
+
+	if not isinstance(wordDict, MotsDict):
+		return wordDict.filterIdx(pos, gender, register, freqMin, freqMax, hasPhrases, hasVariation, isNoun, meaning, shard)
+
+	index = wordDict.getIndex("filter")
+	bits = index["all"]
+
+	for name, values in (("pos", pos), ("gender", gender), ("register", register)):
+		if values is None:
+			continue
+		if isinstance(values, str):
+			values = [values]
+		valueBits = 0
+		for value in values:
+			valueBits |= index[name].get(value, 0)
+		bits &= valueBits
+
+	if freqMin is not None or freqMax is not None:
+		lo = 0 if freqMin is None else bisect_left(index["freqRanks"], freqMin)
+		hi = len(index["freqRanks"]) if freqMax is None else bisect_right(index["freqRanks"], freqMax)
+		bits &= idxToBits(index["freqIdx"][lo:hi], len(wordDict))
+
+	for name, wanted in (("phrases", hasPhrases), ("variation", hasVariation), ("noun", isNoun)):
+		if wanted is True:
+			bits &= index[name]
+		elif wanted is False:
+			bits &= ~index[name]
+
+	if meaning is not None:
+		bits &= idxToBits([idx for idx, where in lookupMeaning(wordDict, meaning)], len(wordDict))
+
+	if shard is not None:
+		if wordDict.shards is None:
+			sys.exit("Shard filter only applies to a whole dictionary. Exited.")
+		names = [shard] if isinstance(shard, str) else shard
+		shardBits = 0
+		for name, start, end in wordDict.shards:
+			if name in names:
+				shardBits |= ((1 << end) - 1) ^ ((1 << start) - 1)
+		bits &= shardBits
+
+	return bitsToIdx(bits)
+
+
+# build meaning index over rows: an inverted index of tokens (see RE_TOKEN) of meanings,
+# phrases and related words
+# each posting is an int: row index << MEANING_GROUP_BITS | group, where group is the POS
+# number of the meaning (its position in meaning_list, i.e. its {...} group, and in pos_list),
+# or MEANING_GROUP_PHRASES / MEANING_GROUP_RELATED (meanings past these share the last POS number)
+# returns a dict:
+#   vocab:    sorted list of tokens (for exact and prefix lookups by bisect)
+#   postings: for each token, ascending list of postings
+def buildMeaningIndex(rows):
+
+	postings = {}
+	for idx, row in enumerate(rows):
+		base = idx << MEANING_GROUP_BITS
+		texts = [(meaning, min(posNum, MEANING_GROUP_PHRASES-1)) for posNum, meaning in enumerate(row.meaning_list)]
+		texts.append((row.phrases, MEANING_GROUP_PHRASES))
+		texts.append((row.related, MEANING_GROUP_RELATED))
+		for text, group in texts:
+			for token in set(RE_TOKEN.findall(text.casefold())):
+				if token in postings:
+					postings[token].append(base | group)
+				else:
+					postings[token] = [base | group]
+
+	vocab = sorted(postings)
+	return {"vocab": vocab, "postings": [postings[token] for token in vocab]}
+
+INDEX_BUILDERS["meaning"] = buildMeaningIndex
+
+
+# find meanings (and optionally phrases, related words) containing all words of query
+# e.g. "bright", "thank you"; case is ignored
+# words must all be in the same meaning (same {...} group), phrases or related words
+# prefix: if True, last word of query may be the start of a word ("bri": "bright", "brilliant")
+# fields: where to look; any of "meaning", "phrases", "related"
+# each word is found by bisect in the sorted vocabulary; postings of words are intersected
+# starting from the shortest, by bisect too
+# returns a list of (row index, where), ascending; where is the POS number of the matching
+#   meaning (its position in pos_list/meaning_list), or "phrases" or "related"
+def lookupMeaning(wordDict, query, prefix=False, fields=("meaning",)):
+
+	index = wordDict.getIndex("meaning")
+	vocab = index["vocab"]
+	tokens = RE_TOKEN.findall(query.casefold())
+	if len(tokens)==0:
+		return []
+
+	postingLists = []
+	for i, token in enumerate(tokens):
+		lo = bisect_left(vocab, token)
+		if prefix and i==len(tokens)-1:
+			hi = bisect_left(vocab, token + "\U0010ffff")
+			postingList = sorted(set().union(*index["postings"][lo:hi]))
+		elif lo < len(vocab) and vocab[lo]==token:
+			postingList = index["postings"][lo]
+		else:
+			postingList = []
+		if len(postingList)==0:
+			return []
+		postingLists.append(postingList)
+
+	# a few matches are looked up in a long list by bisect; otherwise, by a set of the list
+	postingLists.sort(key=len)
+	matches = postingLists[0]
+	for postingList in postingLists[1:]:
+		if len(matches)*INTERSECT_BISECT_RATIO < len(postingList):
+			matches = [posting for posting in matches if isInSorted(postingList, posting)]
+		else:
+			postingSet = set(postingList)
+			matches = [posting for posting in matches if posting in postingSet]
+
+	groupMask = (1 << MEANING_GROUP_BITS) - 1
+	results = []
+	for posting in matches:
+		group = posting & groupMask
+		if group==MEANING_GROUP_PHRASES:
+			if "phrases" in fields:
+				results.append((posting >> MEANING_GROUP_BITS, "phrases"))
+		elif group==MEANING_GROUP_RELATED:
+			if "related" in fields:
+				results.append((posting >> MEANING_GROUP_BITS, "related"))
+		elif "meaning" in fields:
+			results.append((posting >> MEANING_GROUP_BITS, group))
+
+	return results
+
+
+# True if value is in sortedList (ascending)
+def isInSorted(sortedList, value):
+	i = bisect_left(sortedList, value)
+	return i < len(sortedList) and sortedList[i]==value
+
+
+# names of indexes cached next to the csv, each in its own file, when first used
+# (see MotsDict.getIndex); such indexes must be marshal-able
+CACHED_INDEXES = ("noun", "filter", "meaning", "prefix")
+
+
+# index name of wordDict (a MotsDict with a stamp), from its cache file if it's up to date,
+# otherwise built and cached
+def getCachedIndex(wordDict, name):
+
+	with instrument.stage("load: index cache read"):
+		index = readIndexCache(wordDict.csvname, name, wordDict.stamp)
+	if index is None:
+		index = INDEX_BUILDERS[name](wordDict.rows)
+		with instrument.stage("load: index cache write"):
+			writeIndexCache(wordDict.csvname, name, wordDict.stamp, index)
+
+	return index
+
+
+# look up a word in the word index of wordDict (a MotsDict)
+# an exact match wins; otherwise try ignoring accents and case ("eleve" -> "élève")
+# returns a list of matching words:
+#   [] if no match; 1 word if resolved; >1 words if ambiguous (e.g. "peche" -> "pêche", "péché")
+def lookupWord(wordDict, word):
+
+	exactIdx, foldIdx = wordDict.getIndex("word")
+
+	if word in exactIdx:
+		return [word]
+	return foldIdx.get(foldWord(word), [])
+
+
+# build prefix index over rows: distinct headwords sorted by folded form (see foldWord),
+# for completion by bisect (see completeWord)
+# returns 2 lists, in the same order:
+#   keys:  folded headwords, sorted
+#   words: headwords (as in csv)
+def buildPrefixIndex(rows):
+
+	pairs = sorted(set([(foldWord(row.word), row.word) for row in rows]))
+	return [key for key, word in pairs], [word for key, word in pairs]
+
+INDEX_BUILDERS["prefix"] = buildPrefixIndex
+
+
+# complete a prefix to headwords of wordDict, ignoring accents and case ("ele" -> "élève", ...)
+# the prefix's range of keys is found by bisect, so this takes about as long for
+# a million words as for a thousand
+# returns up to limit words, in alphabetical order (of folded form); words starting with prefix
+#   as typed (accents included) come first
+def completeWord(wordDict, prefix, limit=COMPLETE_LIMIT):
+
+	keys, words = wordDict.getIndex("prefix")
+	folded = foldWord(prefix)
+	lo = bisect_left(keys, folded)
+	hi = bisect_left(keys, folded + "\U0010ffff", lo)
+
+	candidates = words[lo:min(hi, lo + limit*COMPLETE_SCAN_FACTOR)]
+	candidates.sort(key=lambda word: not word.startswith(prefix))
+
+	return candidates[:limit]
+
+
+# suggestions for a word not found by lookupWord: completions of it if it is the start of
+# some words (e.g. "chev" -> "cheval", "cheveu"), otherwise words within a few typos of it
+# (see findSimilarWords)
+# returns a list of up to limit words (could be empty)
+def suggestWords(wordDict, word, limit=SUGGEST_LIMIT):
+
+	suggestions = completeWord(wordDict, word, limit)
+	if len(suggestions)==0:
+		with instrument.stage("typo index"):
+			wordDict.getIndex("typo")
+		for dist, form, idx in findSimilarWords(wordDict, word, limit):
+			if wordDict[idx].word not in suggestions:
+				suggestions.append(wordDict[idx].word)
+
+	return suggestions
+
+
+# load database from csv
+# rows are served from the compiled cache next to the csv if it is up to date; otherwise
+# the csv is parsed and the cache (re)built; indexes in CACHED_INDEXES are cached when first used
+# useCache: if False, always parse the csv and leave the cache untouched
+# csvname may also be a SQLite database imported from a csv (see store.importCSV);
+# rows are then read from it as needed rather than loaded
+# csvname may also be a directory of csv shards, or a list of them (see loadShards);
+# shards: names of the only shards to load (None for all)
+# returns a MotsDict (or a store.SQLiteDict)
+def loadDict(csvname, useCache=True, shards=None):
+
+	if isinstance(csvname, (list, tuple)) or os.path.isdir(csvname):
+		return loadShards(csvname, shards, useCache)
+
+	if isSQLiteFile(csvname):
+		import store
+		with instrument.stage("load"):
+			return store.SQLiteDict(csvname)
+
+	with instrument.stage("load"):
+		wordDict = loadCSV(csvname, useCache)
+	wordDict.shards = [(getShardName(csvname), 0, len(wordDict))]
+
+	return wordDict
+
+
+# load one csv (see loadDict); returns a MotsDict
+def loadCSV(csvname, useCache=True):
+
+	if not useCache:
+		with pausedGC():
+			wordDict = MotsDict(parseWordInfoCSV(csvname), csvname)
+		instrument.count("rows loaded", len(wordDict))
+		return wordDict
+
+	with instrument.stage("load: cache read"), pausedGC():
+		cached = readDictCache(csvname)
+	if cached is not None:
+		wordDict = MotsDict(cached[0], csvname, stamp=cached[1])
+		instrument.count("rows loaded", len(wordDict))
+		return wordDict
+
+	# stamp before parsing: if the csv changes while being parsed,
+	# the stale stamp makes the next run rebuild the cache
+	stamp = getCSVStamp(csvname, withHash=True)
+	with instrument.stage("load: csv parse"), pausedGC():
+		wordDict = MotsDict(parseWordInfoCSV(csvname), csvname, stamp=stamp)
+	with instrument.stage("load: cache write"):
+		writeDictCache(csvname, stamp, wordDict.rows)
+	instrument.count("rows loaded", len(wordDict))
+
+	return wordDict
+
+
+# csv shards of a dictionary, in order of precedence
+# csvname: a directory (its *.csv files, by name), a list of csv paths (in that order),
+# or a single csv
+def getShards(csvname):
+
+	if isinstance(csvname, (list, tuple)):
+		return list(csvname)
+	if os.path.isdir(csvname):
+		return sorted([os.path.join(csvname, filename) for filename in os.listdir(csvname) if filename.endswith(CSV_SUFFIX)])
+	return [csvname]
+
+
+# name of a csv shard, for shard filters: its file name without .csv (e.g. "cuisine")
+def getShardName(csvname):
+
+	name = os.path.basename(csvname)
+	return name[:-len(CSV_SUFFIX)] if name.endswith(CSV_SUFFIX) else name
+
+
+# path naming a dictionary, next to which its review database (and such) is kept:
+# the csv, the directory of shards, or the first of a list of shards
+def getDictPath(csvname):
+
+	if isinstance(csvname, (list, tuple)):
+		return csvname[0]
+	return csvname.rstrip(os.sep) or csvname
+
+
+# rows of a csv shard, from its compiled cache if it is up to date (see readDictCache)
+# indexes of shards aren't cached: they're built over the merged dictionary
+def loadShardRows(csvname, useCache=True):
+
+	if useCache:
+		with pausedGC():
+			cached = readDictCache(csvname)
+		if cached is not None:
+			return cached[0]
+
+	stamp = getCSVStamp(csvname, withHash=True)
+	with instrument.stage("load: csv parse"), pausedGC():
+		wordRows = parseWordInfoCSV(csvname)
+	if useCache:
+		with instrument.stage("load: cache write"):
+			writeDictCache(csvname, stamp, wordRows)
+
+	return wordRows
+
+
+# load a dictionary split in csv shards (e.g. a big frequency list and thematic lists)
+# csvname: a directory or a list of csvs (see getShards)
+# a headword is taken from the first shard (in order of precedence) that has it, with all of
+# its rows there; rows of it in later shards are dropped
+# shards: names of the only shards to load (None for all); shards before them are only read
+#   for their headwords (from their caches; see readCachedWords), later ones not at all
+# each shard is cached on its own, so that editing one only re-parses that one
+# returns a MotsDict, with the row range of each shard loaded (see MotsDict)
+def loadShards(csvname, shards=None, useCache=True):
+
+	paths = getShards(csvname)
+	if shards is not None:
+		if isinstance(shards, str):
+			shards = [shards]
+		selected = [path for path in paths if getShardName(path) in shards]
+		if len(selected)==0:
+			sys.exit("No shard named {0} in {1}. Exited.".format(", ".join(shards), csvname))
+	else:
+		selected = paths
+	if len(selected)==0:
+		sys.exit("No csv in {0}. Exited.".format(csvname))
+
+	wordRows = []
+	shardRanges = []
+	seen = set()
+	with instrument.stage("load"):
+		for path in paths[:paths.index(selected[-1])+1]:
+			if path in selected:
+				shardRows = [row for row in loadShardRows(path, useCache) if row.word not in seen]
+				shardRanges.append((getShardName(path), len(wordRows), len(wordRows) + len(shardRows)))
+				wordRows.extend(shardRows)
+				seen.update([row.word for row in shardRows])
+				instrument.count("shards loaded")
+			else:
+				words = readCachedWords(path) if useCache else None
+				if words is None:
+					words = [row.word for row in loadShardRows(path, useCache)]
+				seen.update(words)
+				instrument.count("shards skipped")
+		instrument.count("rows loaded", len(wordRows))
+
+	return MotsDict(wordRows, csvname, shardRanges)
 
-    #return [lstFreq, lstNA, lstWord, lstPOS, lstVar, lstMean, lstPhr, lstRel, lstReg]
-    return wordRows
 
 # initialize database
-# returns dictRows (rows of database) and nounIdx (row indices in database that contain nouns)
-def initializeDict(csvname, nounGenderQuiz):
+# returns dictRows (a MotsDict of database rows), subset to words that are or can be nouns
+# if nounGenderQuiz is True
+# filters: optional dict of filters (keyword arguments of filterIdx), e.g. {"freqMax": 2000}
+#          rows are further subset to those matching all filters
+# wordDict: csv already loaded (see loadDict), if any
+# with a shard filter, only those shards are loaded (see loadShards)
+def initializeDict(csvname, nounGenderQuiz, filters=None, wordDict=None):
 
 	# get database rows
-	dictRows = getWordInfofromCSV(csvname)
-	
-	if nounGenderQuiz:
-	    # index of words that are or can be nouns
-	    # noun if POS isn't "conj"/"intj" and POS contains "n"
-	    # need to be able to handle words like:
-	    # Londres: n
-	    # merci: intj; nm; nf
-	    # coucou: intj; nm
-	    # strategy: remove "intj" and "conj"; then look for "n"
-	    nounIdx = [idx for idx in range(len(dictRows)) if  "n" in re.sub("(intj)|(conj)", "", dictRows[idx][CSV_COL_N_POS])]
-
-	    # subset to noun rows
-	    dictRows = [dictRows[i] for i in nounIdx]
+	dictRows = wordDict if wordDict is not None else loadDict(csvname, shards=(filters or {}).get("shard"))
+
+	with instrument.stage("filter"):
+		if filters:
+			if nounGenderQuiz:
+				filters = dict(filters, isNoun=True)
+			dictRows = dictRows.subset(filterIdx(dictRows, **filters))
+			if len(dictRows)==0:
+				sys.exit("No word matches filters {0}. Exited.".format(filters))
+		elif nounGenderQuiz:
+		    # index of words that are or can be nouns, precomputed at load time
+		    # noun if any POS starts with "n" (so "conj"/"intj" don't count)
+		    # need to be able to handle words like:
+		    # Londres: n
+		    # merci: intj; nm; nf
+		    # coucou: intj; nm
+		    nounIdx = dictRows.getIndex("noun")
+
+		    # subset to noun rows
+		    dictRows = dictRows.subset(nounIdx)
 
 	return dictRows
 
 # given a list representing rows of databse, and an integer size
 # randomly sample rows of database
+# weighting: if None, uniformly; otherwise weighted by frequency rank (see getSampleWeights),
+#   using an alias table built once per MotsDict and reused for every later draw
+# replace: if True, a row may be drawn more than once (weighted sampling only)
+# rng: random.Random to sample with (default: the random module's), e.g. seeded for a replay
 # returns a list containing sampled rows
 # will trigger an exit if sampling size is bigger than total number of rows present
-def sampleDict(dictRows, size):
-
-	try:
-		randIdx = sample(list(range(len(dictRows))), k=size)
-		dictRows = [dictRows[i] for i in randIdx]
-	except:
-		sys.exit("size must be >0 & <= {0}".format(len(dictRows)) + ". Exited")
+def sampleDict(dictRows, size, weighting=None, replace=False, rng=None):
+
+	with instrument.stage("sample"):
+		if weighting is not None:
+			# a plain list of rows (e.g. a previous sample)
+			if not hasattr(dictRows, "getIndex"):
+				dictRows = MotsDict(dictRows)
+			randIdx = drawWeighted(dictRows.getIndex("alias:" + weighting), size, replace, rng)
+			return [dictRows[i] for i in randIdx]
+
+		try:
+			randIdx = (rng.sample if rng is not None else sample)(range(len(dictRows)), k=size)
+			dictRows = [dictRows[i] for i in randIdx]
+		except:
+			sys.exit("size must be >0 & <= {0}".format(len(dictRows)) + ". Exited")
 
 	return dictRows
 
 
+# watcher keeping wordDict (a MotsDict) in step with its csv (see watch.DictWatcher)
+# exits if wordDict can't be watched (e.g. it's a SQLite database)
+def getWatcher(wordDict):
+
+	import watch
+	try:
+		return watch.DictWatcher(wordDict)
+	except ValueError as e:
+		sys.exit("{0}. Exited.".format(e.args[0].capitalize()))
+
+
+# path of review database of a csv
+def getReviewDBPath(csvname):
+	return getDictPath(csvname) + REVIEW_DB_SUFFIX
+
+
+# given rows (a MotsDict) and a scheduler (srs.ReviewScheduler), pick up to size rows to review
+# words due come first; never-reviewed words are introduced by frequency rank
+# (ranked words first, most frequent first; then unranked words in csv order)
+# a database (see store.SQLiteDict) answers both by queries, rather than fetch every row
+# returns a list of rows
+def pickReviewRows(dictRows, scheduler, size):
+
+	if hasattr(dictRows, "getFirstRanked"):
+		# words reviewed are checked one query each (see store.WordIndex)
+		exactIdx = dictRows.getIndex("word")[0]
+		scheduler.loadQueue(exactIdx)
+		nCandidates = size + len(scheduler.heap)
+		newWords = [word for idx, word in dictRows.getFirstRanked(nCandidates)]
+		words = scheduler.pickWords(size, newWords)
+		return [dictRows[exactIdx[word][0]] for word in words]
+
+	# first row of each word: a plain dict, as the word index (see buildWordIndex) would
+	# also fold every word, which review doesn't need
+	words = [row.word for row in dictRows]
+	ranks = [row.frequency_rank for row in dictRows]
+	positions = {}
+	for idx, word in enumerate(words):
+		positions.setdefault(word, idx)
+	scheduler.loadQueue(set(positions))
+
+	# only as many candidates as could be introduced are ranked: O(n log k)
+	nCandidates = size + len(scheduler.heap)
+	rankedIdx = heapq.nsmallest(nCandidates, range(len(ranks)), key=lambda i: (ranks[i] is None, ranks[i] or 0, i))
+	newWords = [words[i] for i in rankedIdx]
+
+	words = scheduler.pickWords(size, newWords)
+	return [dictRows[positions[word]] for word in words]
+
+
 # main wrapper function
 # given a csv file, run noun gender quiz through its words
 # if size is specified as an integer (must be <= # words), do random sampling
 # dontQuiz: if True, run parsing etc in background but don't solicit user input.
 #           this allows running through all the words to see if there's any problem
-def genderQuizMain(csvname, size=None, dontQuiz=False):
-
-	dictRows = initializeDict(csvname, nounGenderQuiz=True)
-
+# review: if True, pick words by spaced repetition instead (see srs; size defaults to QUIZ_SIZE),
+#         and record results in the review database next to csv
+# weighting: if given, random sampling is weighted by frequency rank (see sampleDict)
+# filters: if given, only words matching filters are quizzed (see initializeDict)
+# watch: if True, edits to csv are picked up during the quiz (see watch.DictWatcher)
+def genderQuizMain(csvname, size=None, dontQuiz=False, review=False, weighting=None, filters=None, watch=False):
+
+	watcher = None
+	if watch:
+		wordDict = loadDict(csvname)
+		watcher = getWatcher(wordDict)
+		dictRows = initializeDict(csvname, nounGenderQuiz=True, filters=filters, wordDict=wordDict)
+	else:
+		dictRows = initializeDict(csvname, nounGenderQuiz=True, filters=filters)
+
+	scheduler = None
+	if review:
+		import srs
+		scheduler = srs.ReviewScheduler(getReviewDBPath(csvname))
+		dictRows = pickReviewRows(dictRows, scheduler, size or QUIZ_SIZE)
+		if len(dictRows)==0:
+			print("\nNothing to review for now.\n")
+			scheduler.close()
+			return
 	# random sampling
 	# only nouns are sampled
-	if size is not None:
-		dictRows = sampleDict(dictRows, size)
+	elif size is not None:
+		dictRows = sampleDict(dictRows, size, weighting)
 	
 	# run quiz through list
 	printInputInfo()
-	genderQuizWordList(dictRows, dontQuiz)
+	genderQuizWordList(dictRows, dontQuiz, scheduler, watcher)
+	if scheduler is not None:
+		scheduler.close()
 
 	print("\n~ La Fin ~\n")
 	printOrNot("All words passed testing.\n", dontPrint=(not dontQuiz))
 
 
+# scripted (non-interactive) noun gender quiz, e.g. to replay answers or for load testing
+# nSessions sessions are run one after another, each over size words sampled as in
+# genderQuizMain (all nouns, in csv order, if size is None)
+# readAnswer: answer source shared by all sessions (see keyboardAnswer), e.g.
+#   fileAnswers(sys.stdin), or SimulatedLearner(errorRate=0.2, seed=1)
+# seed: if given, seeds sampling of words (with a Random of its own, leaving the random
+#       module alone), so that a run can be replayed
+# out: stream for quiz output (cards, prompts, feedback); default: discarded
+# resultsname: if given, per-word results are written there as JSON lines
+# stops early (no error) when readAnswer runs out of answers
+# returns a list of per-word results (see genderQuizSingleWord), each with its session
+# number (from 0) added
+def genderQuizScripted(csvname, readAnswer, nSessions=1, size=None, weighting=None, filters=None, seed=None, out=None, resultsname=None):
+
+	import json
+	dictRows = initializeDict(csvname, nounGenderQuiz=True, filters=filters)
+	rng = Random(seed) if seed is not None else None
+
+	devnull = None
+	if out is None:
+		out = devnull = open(os.devnull, "w")
+	resultsFile = open(resultsname, "w", encoding="utf-8") if resultsname else None
+
+	results = []
+	try:
+		for session in range(nSessions):
+			wordRows = sampleDict(dictRows, size, weighting, rng=rng) if size is not None else dictRows
+			for wordInfo in wordRows:
+				result = genderQuizSingleWord(wordInfo, False, readAnswer, out)
+				result["session"] = session
+				results.append(result)
+				if resultsFile is not None:
+					resultsFile.write(json.dumps(result, ensure_ascii=False) + "\n")
+	except EOFError:
+		pass
+	finally:
+		if devnull is not None:
+			devnull.close()
+		if resultsFile is not None:
+			resultsFile.close()
+	instrument.count("words quizzed", len(results))
+
+	nCorrect = sum([result["correct"] for result in results])
+	nFirst = sum([result["correct"] and result["trials"]==1 for result in results])
+	print("{0} word(s) in {1} session(s): {2} correct ({3} on 1st trial), {4} wrong; {5} malformed input(s).".format(
+		len(results), results[-1]["session"]+1 if results else 0, nCorrect, nFirst, len(results)-nCorrect, sum([result["invalid"] for result in results])))
+
+	return results
+
+
 # given a input string of word(s), separated by "; "
-# check if each one is in dictList, a list of words in the database
-# returns: 2 lists containing strings (could be empty), inputLstIn and inputLstOut
-def checkInputWordStr(inputStr, dictList):
+# check if each one is in wordDict (a MotsDict), ignoring accents and case if needed
+# returns 3 lists (could be empty):
+#   inputIdxIn: row indices of matched words, in input order
+#   inputLstOut: (input word, list of suggested words) for input not in database
+#                (see suggestWords)
+#   inputLstAmbig: (input word, list of candidate words) for input matching >1 word
+def checkInputWordStr(inputStr, wordDict):
+
+	inputLst = [item.strip() for item in inputStr.split(";")]
+	inputLst = [item for item in inputLst if len(item)>0]
+
+	exactIdx = wordDict.getIndex("word")[0]
+
+	inputIdxIn = []
+	inputLstOut = []
+	inputLstAmbig = []
+	for item in inputLst:
+		matches = lookupWord(wordDict, item)
+		if len(matches)==1:
+			inputIdxIn.extend(exactIdx[matches[0]])
+		elif len(matches)==0:
+			inputLstOut.append((item, suggestWords(wordDict, item)))
+		else:
+			inputLstAmbig.append((item, matches))
+
+	return inputIdxIn, inputLstOut, inputLstAmbig
+
+
+# given a string of word(s), separated by "; ", get their rows from wordDict
+# notify user about words not in database and ambiguous words, which are skipped
+# returns a list of rows (could be empty)
+def selectWordRows(wordDict, inputStr):
+
+	inputIdxIn, inputLstOut, inputLstAmbig = checkInputWordStr(inputStr, wordDict)
+
+	# notify user
+	if len(inputLstOut)>0:
+		print("\nWord(s) not in database and hence skipped:\n")
+		for word, suggestions in inputLstOut:
+			if len(suggestions)>0:
+				print("{0} (did you mean: {1}?)".format(word, "; ".join(suggestions)))
+			else:
+				print(word)
+
+	if len(inputLstAmbig)>0:
+		print("\nWord(s) matching more than one word in database and hence skipped:\n")
+		for word, candidates in inputLstAmbig:
+			print("{0}: {1}".format(word, "; ".join(candidates)))
+
+	return [wordDict[idx] for idx in inputIdxIn]
+
+
+# readline completer of words in wordDict (see completeWord)
+# text is what follows the last ";" of the line, so it may start with spaces, which are kept
+def makeWordCompleter(wordDict):
+
+	completions = []
+
+	def complete(text, state):
+		if state==0:
+			word = text.lstrip()
+			completions[:] = [text[:len(text)-len(word)] + completion for completion in completeWord(wordDict, word)] if word else []
+		return completions[state] if state < len(completions) else None
+
+	return complete
 
-	inputLst = inputStr.split("; ")
 
-	# input that's in and that's not in database (dictLst)
-	boolLst = [item in dictLst for item in inputLst]
-	inputLstIn = [inputLst[idx] for idx in range(len(boolLst)) if boolLst[idx]]
-	inputLstOut = [inputLst[idx] for idx in range(len(boolLst)) if not boolLst[idx]]
+# ask for words to quiz, one or more per line (separated by "; "), until a blank line
+# each word is looked up as it's entered: unknown words get suggestions (see suggestWords),
+# ambiguous ones their candidates; neither is kept
+# Tab completes words if readline is available; otherwise (or anyway), a word ending with
+# "*" lists words starting with it (e.g. "chev*")
+# returns a string of the words kept, separated by "; " (see selectWordRows)
+def promptWords(wordDict):
 
-	return inputLstIn, inputLstOut
+	try:
+		import readline
+	except ImportError:
+		readline = None
+	if readline is not None:
+		oldCompleter, oldDelims = readline.get_completer(), readline.get_completer_delims()
+		readline.set_completer(makeWordCompleter(wordDict))
+		readline.set_completer_delims(";")
+		# macOS python may come with libedit instead of GNU readline
+		readline.parse_and_bind("bind ^I rl_complete" if "libedit" in (readline.__doc__ or "") else "tab: complete")
+
+	print("\nType word(s) to quiz, separated by \"; \", then a blank line to start.")
+	print("Accents and case may be omitted. {0}a word ending with * lists words starting with it.\n".format(
+		"Tab completes words; " if readline is not None else ""))
+
+	words = []
+	try:
+		while True:
+			try:
+				line = input("> ")
+			except EOFError:
+				break
+			if len(line.strip())==0:
+				break
+			for item in [item.strip() for item in line.split(";")]:
+				if len(item)==0:
+					continue
+				if item.endswith("*"):
+					completions = completeWord(wordDict, item[:-1])
+					print("; ".join(completions) if completions else "No word starts with {0}.".format(item[:-1]))
+					continue
+				matches = lookupWord(wordDict, item)
+				if len(matches)==1:
+					words.append(matches[0])
+				elif len(matches)>1:
+					print("{0} matches more than one word: {1}".format(item, "; ".join(matches)))
+				else:
+					suggestions = suggestWords(wordDict, item)
+					print("{0} not in database{1}".format(item, " (did you mean: {0}?)".format("; ".join(suggestions)) if suggestions else "."))
+	finally:
+		if readline is not None:
+			readline.set_completer(oldCompleter)
+			readline.set_completer_delims(oldDelims)
+
+	return "; ".join(words)
 
 
 # inputStr: a string of word(s), separated by "; "
 # e.g. "solution; rôti; viande"
-def genderQuizSelect(csvname, inputStr):
+# accents and case may be omitted (e.g. "roti") as long as the match is unambiguous
+# if inputStr is None, words are asked for at a prompt (see promptWords)
+def genderQuizSelect(csvname, inputStr=None):
 
 	dictRows = initializeDict(csvname, nounGenderQuiz=True)
-	dictLst = [row[CSV_COL_N_WORD] for row in dictRows]
+	if inputStr is None:
+		inputStr = promptWords(dictRows)
 
-	inputLstIn, inputLstOut = checkInputWordStr(inputStr, dictLst)
+	# get rows from database corresponding to words that are in database
+	inputWordRows = selectWordRows(dictRows, inputStr)
 
-	# notify user
-	if len(inputLstOut)>0:
-		print("\nWord(s) not in database and hence skipped:\n")
-		for word in inputLstOut:
-			print(word)
-
-	# for words that are in database
-	if len(inputLstIn)>0:
-		# get rows from database corresponding to these words
-		inputWordRows = [dictRows[dictLst.index(word)] for word in inputLstIn]
-		
+	if len(inputWordRows)>0:
 		# run quiz through list
 		printInputInfo()
 		genderQuizWordList(inputWordRows, dontQuiz=False)
 
 		print("\n~ La Fin ~\n")
 
+# print info about meaning to word quiz
+# ignoreAccents: as in gradeWordInput
+def printM2WInfo(ignoreAccents=False):
+
+	print("\n* * * * * * * * * * * * * * * * * *\n")
+
+	print("Meaning to Word Quiz!\n")
+
+	print("Type the French word for the meaning(s) shown.")
+	if ignoreAccents:
+		print("Missing accents and small typos are forgiven, but pointed out.\n")
+	else:
+		print("Small typos are forgiven, but pointed out; accents count.\n")
+
+
+# given a word (a WordRow), show its meanings and solicit the word itself
+# wordDict: MotsDict of all words, for hints about wrong answers (see gradeWordInput)
+# readAnswer: answer source (see keyboardAnswer); default: keyboard
+# out: stream to write card, prompts and feedback to (default: stdout)
+# returns a dict as genderQuizSingleWord
+# ignoreAccents: as in gradeWordInput
+# raises EOFError if readAnswer runs out of answers
+def m2wQuizSingleWord(wordInfo, wordDict=None, readAnswer=keyboardAnswer, out=None, ignoreAccents=False):
+
+	with instrument.stage("render"):
+		(out or sys.stdout).write(CARD_SEPARATOR + renderCard(wordInfo, *M2W_CARD_OPTIONS) + " \n")
+	instrument.count("cards rendered")
+
+	result = {"word": wordInfo.word, "correct": False, "trials": 0, "answers": [], "hints": [], "invalid": 0,
+		"truth": wordInfo.word}
+	remainingTrials = QUIZ_TRIALS
+	while remainingTrials > 0:
+		# solicit input; a blank one is asked again
+		print("Your input:", file=out)
+		currentInput = readAnswer(wordInfo).strip()
+		if len(currentInput)==0:
+			result["invalid"] += 1
+			continue
+		remainingTrials -= 1
+		result["trials"] += 1
+		result["answers"].append(currentInput)
+
+		# assess input
+		with instrument.stage("grade"):
+			currentAssess, hint = gradeWordInput(currentInput, wordInfo, wordDict, ignoreAccents)
+		if hint is not None:
+			print(hint, file=out)
+			result["hints"].append(hint)
+		if currentAssess:
+			print("Très bien!", file=out)
+			result["correct"] = True
+			return result
+		if remainingTrials>0:
+			print("{0} trials left.".format(remainingTrials), file=out)
+		else:
+			print("Correct answer: {0}".format(wordInfo.word), file=out)
+
+	return result
+
+
+# run meaning to word quiz through wordRows (a list of WordRow)
+# wordDict: MotsDict of all words (see m2wQuizSingleWord)
+# watcher: if given, edits to csv are picked up before each word (see watch.DictWatcher)
+# ignoreAccents: as in gradeWordInput
+# returns a list of results (see m2wQuizSingleWord)
+def m2wQuizWordList(wordRows, wordDict=None, watcher=None, ignoreAccents=False):
+
+	results = []
+	i = 0
+	while i < len(wordRows):
+		if watcher is not None and watcher.poll():
+			wordRows = wordRows[:i] + watcher.refreshRows(wordRows[i:])
+			if i >= len(wordRows):
+				break
+		results.append(m2wQuizSingleWord(wordRows[i], wordDict, ignoreAccents=ignoreAccents))
+		i += 1
+
+	return results
+
+
 # given a csv file, run meaning to word quiz through its words
 # if size is specified as an integer (must be <= # words), do random sampling
-def m2wQuizMain(csvname, size=None):
+# weighting: if given, random sampling is weighted by frequency rank (see sampleDict)
+# filters: if given, only words matching filters are quizzed (see initializeDict)
+# watch: if True, edits to csv are picked up during the quiz (see watch.DictWatcher)
+# ignoreAccents: if True, missing accents are forgiven (see gradeWordInput)
+def m2wQuizMain(csvname, size=None, weighting=None, filters=None, watch=False, ignoreAccents=False):
 
-	dictRows = initializeDict(csvname, nounGenderQuiz=False)
+	wordDict = loadDict(csvname)
+	watcher = getWatcher(wordDict) if watch else None
+	dictRows = initializeDict(csvname, nounGenderQuiz=False, filters=filters, wordDict=wordDict)
 
 	# random sampling
-	# only nouns are sampled
 	if size is not None:
-		dictRows = sampleDict(dictRows, size)
-	
+		dictRows = sampleDict(dictRows, size, weighting)
+
+	# typo index is built up front, rather than on the first wrong answer
+	with instrument.stage("typo index"):
+		wordDict.getIndex("typo")
+
 	# run quiz through list
-	#printInputInfo() #* TODO: new function
-	#genderQuizWordList(dictRows, dontQuiz) #* TODO: new function
+	printM2WInfo(ignoreAccents)
+	m2wQuizWordList(dictRows, wordDict, watcher, ignoreAccents)
 
 	print("\n~ La Fin ~\n")
 
 
 # inputStr: a string of word(s), separated by "; "
 # e.g. "solution; rôti; viande"
-def m2wQuizSelect(csvname, inputStr):
+# if inputStr is None, words are asked for at a prompt (see promptWords)
+# ignoreAccents: as in m2wQuizMain
+def m2wQuizSelect(csvname, inputStr=None, ignoreAccents=False):
 
 	dictRows = initializeDict(csvname, nounGenderQuiz=False)
-	dictLst = [row[CSV_COL_N_WORD] for row in dictRows]
+	if inputStr is None:
+		inputStr = promptWords(dictRows)
 
-	inputLstIn, inputLstOut = checkInputWordStr(inputStr, dictLst)
+	# get rows from database corresponding to words that are in database
+	inputWordRows = selectWordRows(dictRows, inputStr)
 
-	# notify user
-	if len(inputLstOut)>0:
-		print("\nWord(s) not in database and hence skipped:\n")
-		for word in inputLstOut:
-			print(word)
-
-	# for words that are in database
-	if len(inputLstIn)>0:
-		# get rows from database corresponding to these words
-		inputWordRows = [dictRows[dictLst.index(word)] for word in inputLstIn]
-		
+	if len(inputWordRows)>0:
 		# run quiz through list
-		#printInputInfo() #* TODO: new function
-		#genderQuizWordList(inputWordRows, dontQuiz=False) #* TODO: new function
+		printM2WInfo(ignoreAccents)
+		m2wQuizWordList(inputWordRows, dictRows, ignoreAccents=ignoreAccents)
 
 		print("\n~ La Fin ~\n")
 
-# run
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "blah; fromage; euro")
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "religieux; décès; Londres; bônbon")
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "Londres") # n
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "décès") # nm(pl)
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "rouge") 
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "merci") 
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "merci; coucou; Londres") 
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "primaire") 
-#genderQuizSelect(CSV_PATH+CSV_FILENAME, "noir") 
-#genderQuizMain(csvname=CSV_PATH+CSV_FILENAME, size=QUIZ_SIZE, dontQuiz=False)
-#genderQuizMain(csvname=CSV_PATH+CSV_FILENAME, size=QUIZ_SIZE, dontQuiz=True)
-genderQuizMain(csvname=CSV_PATH+CSV_FILENAME, size=None, dontQuiz=True) # thru-train test on all words
-#genderQuizMain(CSV_PATH+CSV_FILENAME)
-#genderQuizMain(CSV_PATH+CSV_FILENAME)
-#genderQuizMain(CSV_FILENAME, QUIZ_SIZE)
+
+# reverse (English to French) lookup: print words with a meaning containing all words of query
+# e.g. "bright"; most frequent words first, with the POS and meaning that matched
+# prefix, fields: see lookupMeaning
+# limit: max number of words printed (None for all)
+# returns list of (row index, where) found (see lookupMeaning)
+def reverseLookup(csvname, query, prefix=False, fields=("meaning",), limit=None):
+
+	wordDict = loadDict(csvname)
+	with instrument.stage("lookup"):
+		matches = lookupMeaning(wordDict, query, prefix, fields)
+
+	if len(matches)==0:
+		print("No word found for '{0}'.".format(query))
+		return matches
+
+	# rows without a frequency rank come last
+	shown = sorted(matches, key=lambda match: (wordDict[match[0]].frequency_rank is None, wordDict[match[0]].frequency_rank or 0))
+	if limit is not None:
+		shown = shown[:limit]
+	for idx, where in shown:
+		wordInfo = wordDict[idx]
+		freq = " #" + str(wordInfo.frequency_rank) if wordInfo.frequency_rank is not None else ""
+		if where=="phrases":
+			print("{0}{1}: {2}".format(wordInfo.word, freq, wordInfo.phrases))
+		elif where=="related":
+			print("{0}{1}: related: {2}".format(wordInfo.word, freq, wordInfo.related))
+		else:
+			print("{0}{1}: {2} :{3}".format(wordInfo.word, freq, wordInfo.pos_list[where], wordInfo.meaning_list[where]))
+	if len(shown)<len(matches):
+		print("... {0} more.".format(len(matches) - len(shown)))
+
+	return matches
+
+# check a row from csv (raw strings, in the order of CSV_COLS) for all known problems
+# unlike parseNounGender/formatPOSnMean, never exits
+# returns a list of (error kind, detail); empty if row is fine
+# error kinds:
+#   illegal_pos:           POS not in LEGAL_POS
+#   bad_frequency:         frequency_rank is not an integer
+#   unbalanced_braces:     {} in meaning don't pair up
+#   pos_meaning_mismatch:  numbers of POS and meanings differ
+#   empty_gender:          POS looks like a noun but no noun POS with gender is found
+def validateRow(fields):
+
+	errors = []
+	freq, posStr, mean = fields[CSV_COL_N_FREQ], fields[CSV_COL_N_POS], fields[CSV_COL_N_MEAN]
+
+	posList = parsePos(posStr)
+	illegal = [pos for pos in posList if pos not in LEGAL_POS_SET]
+	if len(illegal)>0:
+		errors.append(("illegal_pos", "; ".join(["'{0}'".format(pos) for pos in illegal])))
+
+	if freq:
+		try:
+			int(freq)
+		except ValueError:
+			errors.append(("bad_frequency", freq))
+
+	# braces must alternate {}{}, never nest or dangle
+	depth = 0
+	for c in mean:
+		if c=="{":
+			depth += 1
+		elif c=="}":
+			depth -= 1
+		if depth<0 or depth>1:
+			break
+	if depth!=0:
+		errors.append(("unbalanced_braces", mean))
+	else:
+		nMean = len(parseMeaning(mean))
+		if nMean!=len(posList):
+			errors.append(("pos_meaning_mismatch", "{0} POS, {1} meaning(s)".format(len(posList), nMean)))
+
+	# same test as the legacy noun filter: "n" in POS once "intj"/"conj" are removed
+	if "n" in posStr.lower().replace("intj", "").replace("conj", "") and len(getNounGenders(posList))==0:
+		errors.append(("empty_gender", posStr))
+
+	return errors
+
+
+# validate a chunk of rows; top-level so that it can run in a worker process
+# chunk: a list of (row number, line number, fields)
+# returns a list of error dicts (see validateDict)
+def validateChunk(chunk):
+
+	errors = []
+	for rowNum, lineNum, fields in chunk:
+		for kind, detail in validateRow(fields):
+			errors.append({"row": rowNum, "line": lineNum, "word": fields[CSV_COL_N_WORD], "kind": kind, "detail": detail})
+
+	return errors
+
+
+# hash of a row's content; 8 bytes is plenty to tell rows apart
+def getRowHash(fields):
+	return hashlib.blake2b("\x1f".join(fields).encode(), digest_size=8).digest()
+
+
+# hash of the validation rules; state from other rules is discarded
+def getValidationRulesHash():
+	return hashlib.sha1(repr((VALIDATION_VERSION, LEGAL_POS)).encode()).hexdigest()
+
+
+# read hashes of rows that passed validation previously
+# returns a set (empty if there is no usable state)
+def readValidationState(csvname):
+
+	try:
+		with open(csvname + VALIDATION_STATE_SUFFIX, "rb") as f:
+			state = marshal.load(f)
+		if state.get("rules")==getValidationRulesHash():
+			return state["hashes"]
+	except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+		pass
+
+	return set()
+
+
+# write hashes of rows that passed validation (a set) next to csv
+def writeValidationState(csvname, hashes):
+
+	statename = csvname + VALIDATION_STATE_SUFFIX
+	tmpname = statename + ".tmp{0}".format(os.getpid())
+	try:
+		with open(tmpname, "wb") as f:
+			marshal.dump({"rules": getValidationRulesHash(), "hashes": hashes}, f)
+		os.replace(tmpname, statename)
+	except OSError as e:
+		print("Warning: could not write validation state {0} ({1}).".format(statename, e))
+
+
+# validate all words in a csv, collecting every error instead of exiting at the first one
+# rows are checked in chunks, in parallel across CPU cores
+# incremental: if True, only rows whose content changed since they last passed are checked
+#              (checks are per row, so a row that passed keeps passing until it's edited)
+# nProc: number of worker processes (default: all cores; 1 to run in this process)
+# reportname: path of JSON report (default: csv name + VALIDATION_REPORT_SUFFIX)
+# returns a list of errors; each error is a dict with row (1 = first row after header),
+#   line (line number in csv), word, kind (see validateRow) and detail
+# a SQLite database made by import is not a csv: the csv it was imported from is to be validated
+def validateDict(csvname, incremental=True, nProc=None, reportname=None):
+
+	if isSQLiteFile(csvname):
+		sys.exit("{0} is a database made by import; validate the csv it was imported from. Exited.".format(csvname))
+
+	passedHashes = readValidationState(csvname) if incremental else set()
+
+	# only rows not known to pass are checked
+	nRows = 0
+	toCheck = []
+	rowHashes = {}
+	allHashes = set()
+	with instrument.stage("validate: hash"):
+		for lineNum, fields in iterCSVFields(csvname):
+			nRows += 1
+			rowHash = getRowHash(fields)
+			allHashes.add(rowHash)
+			if rowHash not in passedHashes:
+				toCheck.append((nRows, lineNum, fields))
+				rowHashes[nRows] = rowHash
+
+	chunks = [toCheck[i:i+VALIDATION_CHUNK_SIZE] for i in range(0, len(toCheck), VALIDATION_CHUNK_SIZE)]
+	with instrument.stage("validate: check"):
+		if nProc==1 or len(chunks)<=1:
+			chunkErrors = [validateChunk(chunk) for chunk in chunks]
+		else:
+			from concurrent.futures import ProcessPoolExecutor
+			with ProcessPoolExecutor(max_workers=nProc) as executor:
+				chunkErrors = list(executor.map(validateChunk, chunks))
+	errors = [error for errs in chunkErrors for error in errs]
+	instrument.count("rows hashed", nRows)
+	instrument.count("rows validated", len(toCheck))
+
+	# remember rows that passed, including those that weren't rechecked
+	# (rows that are gone from csv are forgotten)
+	failedRows = set([error["row"] for error in errors])
+	passedHashes = passedHashes.intersection(allHashes)
+	passedHashes.update([rowHash for rowNum, rowHash in rowHashes.items() if rowNum not in failedRows])
+	writeValidationState(csvname, passedHashes)
+
+	# report
+	if reportname is None:
+		reportname = csvname + VALIDATION_REPORT_SUFFIX
+	report = {"csv": os.path.abspath(csvname), "rows": nRows, "checked": len(toCheck),
+		"clean": len(errors)==0, "errors": errors}
+	import json
+	with open(reportname, "w", encoding="utf-8") as f:
+		json.dump(report, f, ensure_ascii=False, indent=1)
+
+	for error in errors:
+		print("row {0} (line {1}) {2}: {3}: {4}".format(error["row"], error["line"], error["word"], error["kind"], error["detail"]))
+	print("\n{0} row(s), {1} checked, {2} error(s). Report: {3}\n".format(nRows, len(toCheck), len(errors), reportname))
+
+	return errors
+
+
+# run: see mots.py for the command line, e.g.
+# python mots.py gender --csv mots.csv --size 5
+# python mots.py select --csv mots.csv "religieux; décès; Londres"
+# python mots.py validate --csv mots.csv
+# running this file directly runs the same command line
+# guarded, as validateDict's worker processes may import this module
+if __name__ == "__main__":
+	import mots
+	sys.exit(mots.main())
 
 # for testing
 
@@ -611,7 +2392,7 @@ genderQuizMain(csvname=CSV_PATH+CSV_FILENAME, size=None, dontQuiz=True) # thru-t
 #getGenderFromKeyboard()
 #assessGenderInput(["a","c"], ["a","c", "b"])
 #genderQuizSingleWord("tour", ["m","f"])
-#parseNounGender("nm/nf; nmpl; nf; nm; nm/nf pl; nfpl")
+#parseNounGender("nm/nf; nmpl; nf; nm; nmi; nfpl")
 #parseNounGender("n; adj")
 #wL = ["tour", "garçon", "police", "gens", "courageux", "Londres"]
 #pL = ["nm; nf", "nm", "nf", "nmpl", "adj", "n"]
@@ -624,6 +2405,10 @@ genderQuizMain(csvname=CSV_PATH+CSV_FILENAME, size=None, dontQuiz=True) # thru-t
 
 #print(formatAnswer(["m","f", "mf", "mpl", "fpl", "mfpl"]))
 
-#formatPOSnMean("adj", "bright; blue", True)
-#formatPOSnMean("adj; nm", "{bright; blue}; {brightness; blue}", True)
-#formatPOSnMean("adj; nm", "{bright; blue}; {brightness; blue}", False)
\ No newline at end of file
+#formatPOSnMean(makeWordRow(None, "", "bleu", "adj", "", "bright; blue", "", "", ""), True, False)
+#formatPOSnMean(makeWordRow(None, "", "bleu", "adj; nm", "", "{bright; blue}; {brightness; blue}", "", "", ""), True, False)
+#formatPOSnMean(makeWordRow(None, "", "bleu", "adj; nm", "", "{bright; blue}; {brightness; blue}", "", "", ""), False, False)
+
+#wD = MotsDict([makeWordRow(None, "", w, "nm", "", "", "", "", "") for w in ["bonbon", "bonbona", "abonbon", "coucou", "coucous"]])
+#print(findSimilarWords(wD, "bonbon")) # repeated trigrams: bonbon, then abonbon and bonbona at 1 typo
+#print(findSimilarWords(wD, "coucou")) # coucou, then coucous at 1 typo
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# opt-in instrumentation of quiz and scraper stages
+# off by default; enabled by environment variable MOTS_PROFILE (any value but "" or "0"),
+# or by calling enable() before the stages to be measured run
+# records, per stage: number of calls and wall time (summed over calls, and over threads
+# in the scraper; nested stages are counted in their parent too), and named counters
+# (rows processed, bytes downloaded, ...)
+# at exit, a summary table is printed (to stderr); with MOTS_PROFILE_JSON=FILE, it's also
+# written to FILE as JSON; with MOTS_PROFILE_STAGE=NAME, stage NAME is run under cProfile
+# and its top functions are printed too
+# when disabled, stage() returns a shared no-op context manager and count() returns at once
+
+import atexit
+import contextlib
+import os
+import sys
+import threading
+import time
+
+ENV_ENABLE = "MOTS_PROFILE"
+ENV_JSON = "MOTS_PROFILE_JSON"
+ENV_STAGE = "MOTS_PROFILE_STAGE"
+
+# number of functions listed for the profiled stage
+PROFILE_TOP = 25
+
+ENABLED = False
+JSON_PATH = None
+PROFILE_STAGE = None
+
+# stage name -> [calls, seconds]; counter name -> value
+STAGES = {}
+COUNTS = {}
+LOCK = threading.Lock()
+
+NULL_STAGE = contextlib.nullcontext()
+
+# cProfile.Profile of PROFILE_STAGE, and whether it's running
+# only one thread at a time can be profiled; calls of the stage overlapping it aren't profiled
+PROFILER = None
+PROFILER_BUSY = False
+
+
+# turn instrumentation on; summary is reported at exit
+# jsonPath: optional file to write summary to as JSON
+# profileStage: optional name of a stage to run under cProfile
+def enable(jsonPath=None, profileStage=None):
+
+	global ENABLED, JSON_PATH, PROFILE_STAGE
+	if not ENABLED:
+		atexit.register(report)
+	ENABLED = True
+	JSON_PATH = jsonPath or JSON_PATH
+	PROFILE_STAGE = profileStage or PROFILE_STAGE
+
+
+# a stage being timed; use via stage(name)
+class Stage:
+
+	def __init__(self, name):
+		self.name = name
+		self.profiling = False
+
+	def __enter__(self):
+		global PROFILER, PROFILER_BUSY
+		if self.name==PROFILE_STAGE:
+			with LOCK:
+				if not PROFILER_BUSY:
+					if PROFILER is None:
+						import cProfile
+						PROFILER = cProfile.Profile()
+					PROFILER_BUSY = self.profiling = True
+			if self.profiling:
+				PROFILER.enable()
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *excInfo):
+		global PROFILER_BUSY
+		elapsed = time.perf_counter() - self.start
+		if self.profiling:
+			PROFILER.disable()
+		with LOCK:
+			if self.profiling:
+				PROFILER_BUSY = False
+			record = STAGES.setdefault(self.name, [0, 0.0])
+			record[0] += 1
+			record[1] += elapsed
+		return False
+
+
+# context manager timing the enclosed block as one call of stage name
+# e.g. with instrument.stage("load"): ...
+def stage(name):
+	if not ENABLED:
+		return NULL_STAGE
+	return Stage(name)
+
+
+# add n to counter name (e.g. "rows", "bytes downloaded")
+def count(name, n=1):
+	if not ENABLED:
+		return
+	with LOCK:
+		COUNTS[name] = COUNTS.get(name, 0) + n
+
+
+# summary as a dict: stages (name -> {"calls", "seconds"}) and counts (name -> value)
+def getSummary():
+	with LOCK:
+		return {"stages": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in STAGES.items()},
+			"counts": dict(COUNTS)}
+
+
+# forget everything recorded so far
+def reset():
+	global PROFILER
+	with LOCK:
+		STAGES.clear()
+		COUNTS.clear()
+		PROFILER = None
+
+
+# print summary table (and profile of PROFILE_STAGE, if any) to out (default: stderr)
+# and write it to JSON_PATH, if set
+# registered to run at exit by enable()
+def report(out=None):
+
+	if out is None:
+		out = sys.stderr
+	summary = getSummary()
+
+	print("\n{0:<30} {1:>8} {2:>10} {3:>10}".format("stage", "calls", "seconds", "ms/call"), file=out)
+	for name, record in sorted(summary["stages"].items(), key=lambda item: -item[1]["seconds"]):
+		print("{0:<30} {1:>8} {2:>10.4f} {3:>10.3f}".format(name, record["calls"], record["seconds"], 1000*record["seconds"]/record["calls"]), file=out)
+	if len(summary["counts"])>0:
+		print("\n{0:<30} {1:>8}".format("counter", "value"), file=out)
+		for name, value in sorted(summary["counts"].items()):
+			print("{0:<30} {1:>8}".format(name, value), file=out)
+
+	if PROFILER is not None:
+		import pstats
+		print("\nProfile of stage {0}:".format(PROFILE_STAGE), file=out)
+		pstats.Stats(PROFILER, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+
+	if JSON_PATH:
+		import json
+		with open(JSON_PATH, "w") as f:
+			json.dump(summary, f, indent=1)
+		print("Profile summary: {0}".format(JSON_PATH), file=out)
+
+
+if os.environ.get(ENV_ENABLE, "") not in ("", "0"):
+	enable(os.environ.get(ENV_JSON), os.environ.get(ENV_STAGE))
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+# command line entry point
+# usage: python mots.py [--profile] COMMAND [options]; python mots.py COMMAND --help for options
+# commands:
+#   gender:   noun gender quiz over random (or review) words (see french.genderQuizMain)
+#   select:   noun gender quiz over given words, or words picked at a prompt (see french.genderQuizSelect)
+#   m2w:      meaning to word quiz (see french.m2wQuizMain, french.m2wQuizSelect)
+#   script:   non-interactive noun gender quiz (see french.genderQuizScripted)
+#   serve:    quiz server over one loaded dictionary (see server.runServer)
+#   client:   play a quiz on a server, or load test it (see server.runClient, server.loadTest)
+#   lookup:   find French words by English meaning (see french.reverseLookup)
+#   export:   write all cards to a file (see french.renderAllCards)
+#   validate: check csv for problems (see french.validateDict, watch.watchValidate)
+#   import:   copy csv into a SQLite database, usable in place of it (see store.importCSV)
+#   scrape:   get audio of words (see scrapeAudio.scrapeAudioMain)
+#   bench:    run benchmark suite (see bench/runBench.py)
+# csv defaults to $MOTS_CSV, or french.CSV_PATH+CSV_FILENAME; audio dir to scrapeAudio.DIR_AUDIO
+# csv may also be a SQLite database made by import, a directory of csv shards, or given
+# more than once for a list of shards (see french.loadDict)
+# modules are only imported by the commands that need them, so that e.g. a quiz never
+# imports requests; cold start of a command can be measured with python -X importtime,
+# or with bench (see runBench.benchColdStart)
+
+import argparse
+import os
+import sys
+
+ENV_CSV = "MOTS_CSV"
+
+
+# csv path from options (or default); a list of paths if --csv is given more than once
+def getCSVName(args):
+
+	if args.csv is not None:
+		return args.csv[0] if len(args.csv)==1 else args.csv
+	if os.environ.get(ENV_CSV):
+		return os.environ[ENV_CSV]
+	import french
+	return french.CSV_PATH + french.CSV_FILENAME
+
+
+# filters (see french.filterIdx) from options; None if no filter is given
+def getFilters(args):
+
+	filters = {"pos": args.pos, "gender": args.gender, "register": args.register,
+		"freqMin": args.freq_min, "freqMax": args.freq_max, "hasPhrases": args.has_phrases, "hasVariation": args.has_variation,
+		"meaning": args.meaning, "shard": args.shard}
+	filters = {name: value for name, value in filters.items() if value is not None}
+
+	return filters or None
+
+
+def runGender(args):
+	import french
+	french.genderQuizMain(getCSVName(args), size=args.size, dontQuiz=args.dont_quiz, review=args.review,
+		weighting=args.weighting, filters=getFilters(args), watch=args.watch)
+
+
+def runSelect(args):
+	import french
+	french.genderQuizSelect(getCSVName(args), args.words)
+
+
+def runM2W(args):
+	import french
+	if args.words is not None or args.select:
+		french.m2wQuizSelect(getCSVName(args), args.words, ignoreAccents=args.ignore_accents)
+	else:
+		french.m2wQuizMain(getCSVName(args), size=args.size, weighting=args.weighting, filters=getFilters(args), watch=args.watch,
+			ignoreAccents=args.ignore_accents)
+
+
+# answers from a file ("-" for stdin), or from a simulated learner
+def runScript(args):
+
+	import french
+	if args.answers=="-":
+		runScriptSessions(args, french.fileAnswers(sys.stdin))
+	elif args.answers is not None:
+		with open(args.answers, encoding="utf-8") as f:
+			runScriptSessions(args, french.fileAnswers(f))
+	else:
+		runScriptSessions(args, french.SimulatedLearner(args.error_rate, args.invalid_rate, args.seed))
+
+
+# scripted sessions (see french.genderQuizScripted), answered by readAnswer
+def runScriptSessions(args, readAnswer):
+	import french
+	french.genderQuizScripted(getCSVName(args), readAnswer, nSessions=args.sessions, size=args.size,
+		weighting=args.weighting, filters=getFilters(args), seed=args.seed,
+		out=sys.stdout if args.show else None, resultsname=args.results)
+
+
+def runServe(args):
+	import server
+	server.runServer(getCSVName(args), args.host, args.port, args.watch)
+
+
+def runQuizClient(args):
+	import server
+	if args.load_test is not None:
+		server.loadTest(args.host, args.port, args.load_test, args.size or 5, args.quiz)
+	else:
+		server.runClient(args.host, args.port, args.quiz, args.size or 5, args.weighting, getFilters(args), args.ignore_accents)
+
+
+def runLookup(args):
+	import french
+	fields = ["meaning"] + (["phrases"] if args.phrases else []) + (["related"] if args.related else [])
+	matches = french.reverseLookup(getCSVName(args), " ".join(args.query), prefix=args.prefix, fields=fields, limit=args.limit)
+	return 0 if len(matches)>0 else 1
+
+
+def runExport(args):
+	import french
+	nCards = french.renderAllCards(getCSVName(args), args.out, maskGender=args.mask_gender, filters=getFilters(args))
+	print("{0} card(s) written to {1}.".format(nCards, args.out))
+
+
+# each shard is validated (and reported on) on its own
+# with --watch, shards are validated again whenever they change, until interrupted
+def runValidate(args):
+
+	import french
+	shards = french.getShards(getCSVName(args))
+	if args.report and len(shards)>1:
+		sys.exit("--report needs a single csv. Exited.")
+	if args.watch:
+		import watch
+		watch.watchValidate(getCSVName(args), nProc=args.jobs, reportname=args.report)
+		return 0
+	errors = []
+	for shard in shards:
+		errors.extend(french.validateDict(shard, incremental=not args.full, nProc=args.jobs, reportname=args.report))
+
+	return 1 if len(errors)>0 else 0
+
+
+def runImport(args):
+	import store
+	dbname = args.out or store.getDBPath(getCSVName(args))
+	nRows = store.importCSV(getCSVName(args), dbname)
+	print("{0} word(s) imported to {1}.".format(nRows, dbname))
+
+
+# words to scrape: given ones (separated by "; "), or all words in csv
+def runScrape(args):
+
+	import scrapeAudio
+	if args.words is not None:
+		wordList = [word.strip() for word in args.words.split(";")]
+	else:
+		import french
+		wordList = [row.word for row in french.loadDict(getCSVName(args))]
+
+	scrapeAudio.scrapeAudioMain(wordList, fileDest=args.audio_dir or scrapeAudio.DIR_AUDIO,
+		pageWorkers=args.page_workers or scrapeAudio.PAGE_WORKERS, downloadWorkers=args.download_workers or scrapeAudio.DOWNLOAD_WORKERS,
+		ratePerHost=args.rate or scrapeAudio.RATE_LIMIT_PER_HOST,
+		useManifest=not args.no_manifest, usePageCache=args.page_cache, replay=args.replay)
+
+
+def runBench(args):
+	sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench"))
+	import runBench
+	runBench.main(args.bench_args)
+
+
+# options shared by quizzes that sample and filter words
+def addSampleOptions(parser):
+
+	parser.add_argument("--size", type=int, help="number of words (random sample); default: all words")
+	parser.add_argument("--weighting", help="sample by frequency rank: uniform, zipf[:s] or top:N")
+	parser.add_argument("--pos", nargs="+", help="only words with any of these POS")
+	parser.add_argument("--gender", nargs="+", help="only nouns of any of these genders")
+	parser.add_argument("--register", nargs="+", help="only words of any of these registers")
+	parser.add_argument("--freq-min", type=int, help="only words of frequency rank >= this")
+	parser.add_argument("--freq-max", type=int, help="only words of frequency rank <= this")
+	parser.add_argument("--has-phrases", action=argparse.BooleanOptionalAction, help="only words with (or, with --no-has-phrases, without) phrases")
+	parser.add_argument("--has-variation", action=argparse.BooleanOptionalAction, help="only words with (or, with --no-has-variation, without) a variation")
+	parser.add_argument("--shard", nargs="+", help="only words from these csv shards (file names without .csv)")
+	parser.add_argument("--meaning", help='only words with a meaning containing these English words, e.g. "colour"')
+
+
+def makeParser():
+
+	parser = argparse.ArgumentParser(prog="mots", description="Les Mots Français!")
+	parser.add_argument("--profile", action="store_true", help="time stages and print a summary at exit (see instrument)")
+	parser.add_argument("--profile-json", help="also write profile summary to this JSON file")
+	parser.add_argument("--profile-stage", help="run this stage under cProfile")
+	commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+	commands.required = True
+
+	# csv is an option of each command, so that it can follow the command name
+	csvParser = argparse.ArgumentParser(add_help=False)
+	csvParser.add_argument("--csv", action="append", help="path of mots.csv, of a directory of csv shards, or of a database made by import; "
+		"repeat for a list of shards, first ones first (default: ${0}, or french.CSV_PATH)".format(ENV_CSV))
+
+	gender = commands.add_parser("gender", parents=[csvParser], help="noun gender quiz")
+	addSampleOptions(gender)
+	gender.add_argument("--review", action="store_true", help="pick words by spaced repetition")
+	gender.add_argument("--dont-quiz", action="store_true", help="run through words without quizzing (for testing)")
+	gender.add_argument("--watch", action="store_true", help="pick up edits to csv during the quiz")
+	gender.set_defaults(run=runGender)
+
+	select = commands.add_parser("select", parents=[csvParser], help="noun gender quiz over given words")
+	select.add_argument("words", nargs="?", help='words separated by "; ", e.g. "religieux; décès"; default: pick words at a prompt')
+	select.set_defaults(run=runSelect)
+
+	m2w = commands.add_parser("m2w", parents=[csvParser], help="meaning to word quiz")
+	addSampleOptions(m2w)
+	m2w.add_argument("--words", help='quiz these words (separated by "; ") instead of a sample')
+	m2w.add_argument("--select", action="store_true", help="pick words to quiz at a prompt instead of a sample")
+	m2w.add_argument("--ignore-accents", action="store_true", help="forgive missing or wrong accents in answers")
+	m2w.add_argument("--watch", action="store_true", help="pick up edits to csv during the quiz (not with --words, --select)")
+	m2w.set_defaults(run=runM2W)
+
+	script = commands.add_parser("script", parents=[csvParser], help="non-interactive noun gender quiz")
+	addSampleOptions(script)
+	script.add_argument("--answers", help='file of answers, one per line ("-" for stdin); default: a simulated learner')
+	script.add_argument("--error-rate", type=float, default=0.2, help="simulated learner: probability of a wrong answer")
+	script.add_argument("--invalid-rate", type=float, default=0.05, help="simulated learner: probability of a malformed answer")
+	script.add_argument("--seed", type=int, help="seed of sampling and of simulated learner")
+	script.add_argument("--sessions", type=int, default=1, help="number of sessions")
+	script.add_argument("--results", help="file to write per-word results to, as JSON lines")
+	script.add_argument("--show", action="store_true", help="print quiz output (cards, prompts, feedback)")
+	script.set_defaults(run=runScript)
+
+	# host and port of server
+	serverParser = argparse.ArgumentParser(add_help=False)
+	serverParser.add_argument("--host", default="127.0.0.1", help="host of server (default: 127.0.0.1)")
+	serverParser.add_argument("--port", type=int, default=5317, help="port of server (default: 5317)")
+
+	serve = commands.add_parser("serve", parents=[csvParser, serverParser], help="serve quiz sessions over one loaded dictionary")
+	serve.add_argument("--watch", action="store_true", help="pick up edits to csv for new sessions")
+	serve.set_defaults(run=runServe)
+
+	client = commands.add_parser("client", parents=[serverParser], help="play a quiz on a server")
+	addSampleOptions(client)
+	client.add_argument("--quiz", choices=("gender", "m2w"), default="gender", help="quiz to play")
+	client.add_argument("--ignore-accents", action="store_true", help="m2w: forgive missing or wrong accents in answers")
+	client.add_argument("--load-test", type=int, metavar="N", help="play N sessions with random answers and report latency")
+	client.set_defaults(run=runQuizClient)
+
+	lookup = commands.add_parser("lookup", parents=[csvParser], help="find French words by English meaning")
+	lookup.add_argument("query", nargs="+", help="English word(s), all in the same meaning")
+	lookup.add_argument("--prefix", action="store_true", help="last word may be the start of a word")
+	lookup.add_argument("--phrases", action="store_true", help="also look in phrases")
+	lookup.add_argument("--related", action="store_true", help="also look in related words")
+	lookup.add_argument("--limit", type=int, default=20, help="max number of words shown (default: 20)")
+	lookup.set_defaults(run=runLookup)
+
+	export = commands.add_parser("export", parents=[csvParser], help="write all cards to a file")
+	addSampleOptions(export)
+	export.add_argument("--out", required=True, help="file to write cards to")
+	export.add_argument("--mask-gender", action="store_true", help="mask gender of nouns")
+	export.set_defaults(run=runExport)
+
+	validate = commands.add_parser("validate", parents=[csvParser], help="check csv for problems")
+	validate.add_argument("--full", action="store_true", help="recheck all rows, not only changed ones")
+	validate.add_argument("--jobs", type=int, help="number of worker processes (default: all cores)")
+	validate.add_argument("--report", help="path of JSON report (default: next to csv)")
+	validate.add_argument("--watch", action="store_true", help="validate again whenever csv changes, until interrupted")
+	validate.set_defaults(run=runValidate)
+
+	importParser = commands.add_parser("import", parents=[csvParser], help="copy csv into a SQLite database")
+	importParser.add_argument("--out", help="path of database (default: csv path + .sqlite)")
+	importParser.set_defaults(run=runImport)
+
+	scrape = commands.add_parser("scrape", parents=[csvParser], help="get audio of words")
+	scrape.add_argument("--words", help='words separated by "; " (default: all words in csv)')
+	scrape.add_argument("--audio-dir", help="directory to download audio to (default: scrapeAudio.DIR_AUDIO)")
+	scrape.add_argument("--page-workers", type=int, help="threads fetching pages (default: scrapeAudio.PAGE_WORKERS)")
+	scrape.add_argument("--download-workers", type=int, help="threads downloading audio (default: scrapeAudio.DOWNLOAD_WORKERS)")
+	scrape.add_argument("--rate", type=float, help="max requests per second per host (default: scrapeAudio.RATE_LIMIT_PER_HOST)")
+	scrape.add_argument("--no-manifest", action="store_true", help="neither skip nor record scraped words")
+	scrape.add_argument("--page-cache", action="store_true", help="cache fetched pages")
+	scrape.add_argument("--replay", action="store_true", help="only parse cached pages; no network")
+	scrape.set_defaults(run=runScrape)
+
+	# options of bench are passed on as they are (see main)
+	bench = commands.add_parser("bench", help="run benchmark suite (options as in bench/runBench.py)")
+	bench.set_defaults(run=runBench)
+
+	return parser
+
+
+# returns exit status
+def main(argv=None):
+
+	parser = makeParser()
+	args, extra = parser.parse_known_args(argv)
+	if args.command=="bench":
+		args.bench_args = extra
+	elif len(extra)>0:
+		parser.error("unrecognized arguments: {0}".format(" ".join(extra)))
+	if args.profile or args.profile_json or args.profile_stage:
+		import instrument
+		instrument.enable(args.profile_json, args.profile_stage)
+
+	return args.run(args) or 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,14 +1,68 @@
 #!/usr/bin/env python3
 
+import codecs
+import hashlib
 import re
 import sys
-import requests
 import os
+import threading
+import time
+import zlib
+import instrument
+from urllib.parse import urlsplit
+# imported where needed, so that parsing pages (e.g. isFrMP3, findMP3sInLines) needs
+# none of them: requests (fetching, downloading), json, sqlite3 (ScrapeManifest),
+# tempfile (downloadFile), concurrent.futures (scrapeAudioMain)
 
 HTTP_HEADER = {'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36'}
 DIR_AUDIO="/Users/jkewz/Desktop/fr/sons_de_mots/"
 URL_ROOT="https://www.collinsdictionary.com/us/dictionary/french-english/"
 
+# stages (fetch, parse, download) and bytes downloaded are recorded by instrument
+# if enabled, e.g. by running with MOTS_PROFILE=1; stage times are summed over threads
+
+# concurrency and politeness (see scrapeAudioMain)
+# page fetches and mp3 downloads run in separate thread pools, sharing one session
+# requests to the same host are spaced out to at most RATE_LIMIT_PER_HOST per second
+PAGE_WORKERS = 4
+DOWNLOAD_WORKERS = 4
+RATE_LIMIT_PER_HOST = 2.0
+HTTP_TIMEOUT = 30
+# retry on these status codes (and on connection errors) with exponential backoff:
+# RETRY_BACKOFF, 2*RETRY_BACKOFF, 4*RETRY_BACKOFF, ... seconds, unless server sends Retry-After
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_TOTAL = 4
+RETRY_BACKOFF = 1.0
+
+# word pages are streamed in chunks of HTML_CHUNK_SIZE bytes and scanned line by line
+# headword audio sits near the top, so reading stops HTML_SCAN_AFTER_MATCH characters
+# after the first audio line (enough to catch a 2nd entry, e.g. portugais),
+# or at the end of the entries (HTML_END_OF_ENTRIES), whichever comes first
+HTML_CHUNK_SIZE = 16384
+HTML_SCAN_AFTER_MATCH = 65536
+
+# manifest of scraped words (see ScrapeManifest), kept in the audio directory
+# words resolved (MANIFEST_RESOLVED) are skipped on later runs; once an entry is older than
+# MANIFEST_MAX_AGE seconds, its page is re-checked with a conditional request
+MANIFEST_FILENAME = "scrape_manifest.sqlite"
+MANIFEST_RESOLVED = ("scraped", "no sound", "no entry")
+MANIFEST_MAX_AGE = 30*24*3600
+
+# cache of fetched word pages (see PageCache), kept in the audio directory
+# entries older than PAGE_CACHE_TTL seconds are refetched (except in replay mode);
+# least recently used entries are evicted once the cache exceeds PAGE_CACHE_MAX_BYTES
+PAGE_CACHE_DIRNAME = ".page_cache"
+PAGE_CACHE_TTL = 7*24*3600
+PAGE_CACHE_MAX_BYTES = 200*1024*1024
+
+# audio files are streamed to disk in chunks of DOWNLOAD_CHUNK_SIZE bytes
+# a response whose Content-Type doesn't start with one of AUDIO_CONTENT_TYPES is rejected
+DOWNLOAD_CHUNK_SIZE = 65536
+AUDIO_CONTENT_TYPES = ("audio/", "application/octet-stream")
+# permissions of downloaded files, as open() would create them (temp files are 0600)
+# found from umask by getDownloadFileMode
+DOWNLOAD_FILE_MODE = None
+
 # 2 audios for one entry
 # portugais
 
@@ -18,28 +72,240 @@ URL_ROOT="https://www.collinsdictionary.com/us/dictionary/french-english/"
 # audio available for nf too (check $variation?)
 # acteur, actrice
 
-# keep track
+# keep track (see ScrapeManifest)
 # - scraped; file url; filename
 # - no sound
 # - no word entry
 
 
+# spaces out requests per host, across threads
+# ratePerSec: max number of requests per second to any one host (0 or None: no limit)
+class HostRateLimiter:
+
+	def __init__(self, ratePerSec):
+		self.interval = 1.0/ratePerSec if ratePerSec else 0
+		self.lock = threading.Lock()
+		self.nextSlot = {}
+
+	# block until a request to the host of url may be sent
+	def wait(self, url):
+		if self.interval==0:
+			return
+		host = urlsplit(url).netloc
+		with self.lock:
+			now = time.monotonic()
+			slot = max(now, self.nextSlot.get(host, now))
+			self.nextSlot[host] = slot + self.interval
+		if slot > now:
+			time.sleep(slot - now)
+
+
+# create a session to be shared by all workers
+# connections are pooled and kept alive; poolSize should be >= number of workers
+def makeSession(poolSize=PAGE_WORKERS+DOWNLOAD_WORKERS):
+
+	import requests
+	from requests.adapters import HTTPAdapter
+	session = requests.Session()
+	session.headers.update(HTTP_HEADER)
+	adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+	session.mount("https://", adapter)
+	session.mount("http://", adapter)
+
+	return session
+
+
+# GET url via session, waiting on limiter (if any) before each attempt
+# retries on RETRY_STATUS and connection errors with exponential backoff
+# returns the response of the last attempt; raises if the last attempt failed to connect
+def httpGet(url, session=None, limiter=None, **kwargs):
+
+	import requests
+	if session is None:
+		session = requests
+		kwargs.setdefault("headers", HTTP_HEADER)
+	kwargs.setdefault("timeout", HTTP_TIMEOUT)
+
+	for attempt in range(RETRY_TOTAL+1):
+		if limiter is not None:
+			limiter.wait(url)
+
+		try:
+			with instrument.stage("fetch"):
+				result = session.get(url, **kwargs)
+		except (requests.ConnectionError, requests.Timeout):
+			if attempt==RETRY_TOTAL:
+				raise
+			instrument.count("http retries")
+			time.sleep(RETRY_BACKOFF * 2**attempt)
+			continue
+		instrument.count("http requests")
+
+		if result.status_code not in RETRY_STATUS or attempt==RETRY_TOTAL:
+			return result
+
+		# honour Retry-After (in seconds) if given
+		delay = RETRY_BACKOFF * 2**attempt
+		retryAfter = result.headers.get("Retry-After", "")
+		if retryAfter.isdigit():
+			delay = max(delay, int(retryAfter))
+		result.close()
+		instrument.count("http retries")
+		time.sleep(delay)
+
+
 # given a word, get its html source page
+# session, limiter: optional shared session and rate limiter (see scrapeAudioMain)
+# pageCache: optional PageCache; page is served from it if cached, and cached once fetched
+#            in replay mode, page is only ever served from it
 # returns a list of strings; each string is a line from html source page
-def getAllHTML(word):
+# returns None if page can't be fetched
+def getAllHTML(word, session=None, limiter=None, pageCache=None):
 	# word page url
 	url = URL_ROOT+word
+
+	if pageCache is not None:
+		cached = pageCache.get(url)
+		if cached is not None:
+			meta, body = cached
+			if meta["status"]==200:
+				return decodePage(body, meta["encoding"]).split("\n")
+			print("html.status_code not 200 for {0}.".format(word))
+			return None
+		if pageCache.replay:
+			print("{0} not in page cache.".format(word))
+			return None
+
 	try:
-		html = requests.get(url)
+		html = httpGet(url, session, limiter)
+		if pageCache is not None:
+			pageCache.putResponse(html)
 
 		if html.status_code==200:
-			htmlLst = str.split(str(html.content), "\\n")
+			# decode (rather than str(), which gives the bytes repr) before splitting
+			htmlLst = html.text.split("\n")
 			return htmlLst
 		else:
 			print("html.status_code not 200 for {0}.".format(word))
 	except:
 		print("Failed to get html source page for {0}.".format(word))
 
+
+# decode page bytes; falls back to utf-8 if encoding is unknown
+def decodePage(body, encoding):
+	return body.decode(encoding or "utf-8", errors="replace")
+
+
+# on-disk cache of fetched pages, keyed by url
+# each page is one zlib-compressed file: a JSON header line (url, final url, HTTP status,
+# encoding, validators, fetch time) followed by the page bytes
+# entries expire after ttl seconds; the least recently used are evicted beyond maxBytes
+# replay: if True, entries never expire, and callers must not go to network on a miss
+# safe to share between threads
+class PageCache:
+
+	def __init__(self, directory, ttl=PAGE_CACHE_TTL, maxBytes=PAGE_CACHE_MAX_BYTES, replay=False):
+		self.directory = directory
+		self.ttl = ttl
+		self.maxBytes = maxBytes
+		self.replay = replay
+		self.lock = threading.Lock()
+		os.makedirs(directory, exist_ok=True)
+		self.totalBytes = sum([entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".z")])
+
+	def getPath(self, url):
+		return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest() + ".z")
+
+	# returns header (a dict) and page bytes of url, or None if not cached or expired
+	# a hit marks the entry as recently used
+	def get(self, url):
+		path = self.getPath(url)
+		try:
+			with open(path, "rb") as f:
+				data = zlib.decompress(f.read())
+			header, body = data.split(b"\n", 1)
+			import json
+			meta = json.loads(header)
+		except (OSError, zlib.error, ValueError):
+			return None
+		if meta["url"]!=url or (not self.replay and time.time()-meta["fetched"] > self.ttl):
+			return None
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		return meta, body
+
+	# cache page body of url, then evict if over size
+	def put(self, url, meta, body):
+		path = self.getPath(url)
+		import json
+		meta = dict(meta, url=url, fetched=time.time())
+		data = zlib.compress(json.dumps(meta).encode() + b"\n" + body)
+		tmpname = path + ".tmp{0}".format(threading.get_ident())
+		try:
+			oldSize = os.path.getsize(path) if os.path.isfile(path) else 0
+			with open(tmpname, "wb") as f:
+				f.write(data)
+			os.replace(tmpname, path)
+		except OSError as e:
+			print("Warning: could not cache page {0} ({1}).".format(url, e))
+			return
+		with self.lock:
+			self.totalBytes += len(data) - oldSize
+			if self.totalBytes > self.maxBytes:
+				self.evict()
+
+	# cache a (fully read) response for the url it was requested with
+	# only pages worth replaying are cached: found (200) or not found (404)
+	def putResponse(self, response):
+		if response.status_code not in (200, 404):
+			return
+		url = response.history[0].url if len(response.history)>0 else response.url
+		meta = {"final_url": response.url, "status": response.status_code, "encoding": response.encoding,
+			"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+		self.put(url, meta, response.content)
+
+	# remove least recently used entries until total size is below 90% of maxBytes
+	# caller holds lock
+	def evict(self):
+		entries = sorted([(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in os.scandir(self.directory) if entry.name.endswith(".z")])
+		self.totalBytes = sum([size for mtime, size, path in entries])
+		for mtime, size, path in entries:
+			if self.totalBytes <= 0.9*self.maxBytes:
+				break
+			try:
+				os.remove(path)
+				self.totalBytes -= size
+			except OSError:
+				pass
+
+
+# given a streamed response, decode it incrementally and yield its lines
+# (without trailing newline), reading HTML_CHUNK_SIZE bytes at a time
+# stops reading as soon as the consumer stops iterating
+def iterHTMLLines(response):
+
+	decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+	pending = ""
+	for chunk in response.iter_content(chunk_size=HTML_CHUNK_SIZE):
+		lines = (pending + decoder.decode(chunk)).split("\n")
+		pending = lines.pop()
+		for line in lines:
+			yield line
+	pending += decoder.decode(b"", final=True)
+	if len(pending)>0:
+		yield pending
+
+
+# precompiled patterns for isFrMP3 and getUrlFilename
+RE_FR_MP3 = re.compile(r"fr_\w+\.mp3")
+RE_MP3_URL = re.compile(r'data-src-mp3="([\w_.:/]+)"')
+RE_MP3_FILENAME = re.compile(r"/([\w_]+\.mp3)")
+# end of dictionary entries on a word page; nothing past this is headword audio
+# a plain substring, as it's looked for on every line
+HTML_END_OF_ENTRIES = "<footer"
+
 # given a line from html file, determine if the line contains the target audio file
 # such a line would have the following hallmarks:
 # mini_h2
@@ -49,12 +315,14 @@ def getAllHTML(word):
 # fr_[...].mp3
 # return a boolean value
 def isFrMP3(htmlStr):
+    # cheapest and most selective check first; most lines have no audio at all
+    if "data-src-mp3" not in htmlStr:
+        return False
     cond1 = "mini_h2" in htmlStr
     cond2 = "span punctuation" in htmlStr
-    cond3 = "data-src-mp3" in htmlStr
     cond4 = "collinsdictionary.com/us/sounds/f/fr_" in htmlStr
-    cond5 = (len(re.findall("fr_[\w]+.mp3", htmlStr))==1)
-    return cond1 & cond2 & cond3 & cond4 & cond5
+    cond5 = (len(RE_FR_MP3.findall(htmlStr))==1)
+    return cond1 and cond2 and cond4 and cond5
 
 # given a list of strings representing lines from html source page
 # a list containing line(s) from html source page that contains target mp3
@@ -66,66 +334,415 @@ def getHTMLwithMP3(htmlList):
 # given a line from html file, extract the url and filename (incl. file extension) of audio file
 # assumes that isFrMp3(hmtlStr) is True
 # return 2 strings, the url and the filename with file extension
+# returns None (with a warning) if either can't be extracted, so that a batch carries on
 def getUrlFilename(htmlStr):
-    # bulk of the string containing url
-    url = re.findall('data-src-mp3=\"[\w_.:/]+\"', htmlStr)
-    
-    # try to extract url
-    try:
-        # remove the leading data-src-mp3=" and the tailing "
-        url = url[0][(len('data-src-mp3=\"')):(len(url)-2)]
-    except:
-        sys.exit("Exception occurred when getting url. Exited.")
-
-    # from url, try to extract filename
-    try:
-        filename = re.findall('/[\w_]+.mp3', url)[0]
-        # remove the leading /
-        filename = filename[1:]
-    except:
-        sys.exit("Exception occurred when getting filename. Exited.")
-    
-    return url, filename
+    # url is between data-src-mp3=" and the tailing "
+    url = RE_MP3_URL.search(htmlStr)
+    if url is None:
+        print("Warning: could not get url from line with audio.")
+        return None
+    url = url.group(1)
+
+    # from url, extract filename
+    filename = RE_MP3_FILENAME.search(url)
+    if filename is None:
+        print("Warning: could not get filename from {0}.".format(url))
+        return None
+
+    return url, filename.group(1)
+
+
+# given lines of a word page, find the headword audio file(s)
+# scanning stops early once the headword audio is behind us (see HTML_SCAN_AFTER_MATCH)
+# returns a list of (url, filename), without duplicates, in order of appearance
+def findMP3sInLines(lines):
+
+	mp3s = []
+	scannedAfterMatch = 0
+	for line in lines:
+		if mp3s:
+			scannedAfterMatch += len(line)
+			if scannedAfterMatch > HTML_SCAN_AFTER_MATCH:
+				break
+		# inline pre-check of isFrMP3: most lines have no audio at all
+		if "data-src-mp3" in line:
+			if isFrMP3(line):
+				urlFilename = getUrlFilename(line)
+				if urlFilename is not None and urlFilename not in mp3s:
+					mp3s.append(urlFilename)
+		elif HTML_END_OF_ENTRIES in line:
+			break
+
+	return mp3s
+
+
+# fill in status and mp3s of a page dict (see getWordMP3s)
+# from the HTTP status and final url of a word page, and its lines
+def readWordPage(page, word, statusCode, finalUrl, lines):
+
+	if statusCode==304:
+		page["status"] = "not modified"
+	elif statusCode==404 or not finalUrl.startswith(URL_ROOT):
+		page["status"] = "no entry"
+	elif statusCode!=200:
+		print("html.status_code not 200 for {0}.".format(word))
+	else:
+		page["mp3s"] = findMP3sInLines(lines)
+		page["status"] = "found" if len(page["mp3s"])>0 else "no sound"
+
+
+# given a word, stream its page and extract its headword audio file(s)
+# the response is closed as soon as scanning stops, so the rest of the page is never read
+# etag, lastModified: validators from a previous fetch; if given, request is conditional
+# pageCache: optional PageCache; page is served from it if cached; otherwise page is read in
+#            full (no early exit) and cached; in replay mode, network is never used
+# returns a dict with:
+#   status: "found"; "no sound" if page has no audio; "no entry" if there's no page for word
+#           (404, or redirected away from dictionary, e.g. to spellcheck);
+#           "not modified" if page hasn't changed since etag/lastModified;
+#           "not cached" if page isn't in cache in replay mode; "no page" otherwise
+#   mp3s: a list of (url, filename)
+#   http_status: HTTP status code (None if no response)
+#   etag, last_modified: validators of page (None if not sent by server)
+def getWordMP3s(word, session=None, limiter=None, etag=None, lastModified=None, pageCache=None):
+
+	url = URL_ROOT+word
+	page = {"status": "no page", "mp3s": [], "http_status": None, "etag": None, "last_modified": None}
+
+	if pageCache is not None:
+		cached = pageCache.get(url)
+		if cached is not None:
+			meta, body = cached
+			page["http_status"], page["etag"], page["last_modified"] = meta["status"], meta["etag"], meta["last_modified"]
+			with instrument.stage("parse"):
+				readWordPage(page, word, meta["status"], meta["final_url"], decodePage(body, meta["encoding"]).split("\n"))
+			instrument.count("pages from cache")
+			return page
+		if pageCache.replay:
+			page["status"] = "not cached"
+			return page
+
+	import requests
+	headers = dict(HTTP_HEADER)
+	if etag:
+		headers["If-None-Match"] = etag
+	if lastModified:
+		headers["If-Modified-Since"] = lastModified
+
+	try:
+		with httpGet(url, session, limiter, stream=True, headers=headers) as result:
+			page["http_status"] = result.status_code
+			page["etag"] = result.headers.get("ETag")
+			page["last_modified"] = result.headers.get("Last-Modified")
+			if pageCache is not None and result.status_code in (200, 404):
+				pageCache.putResponse(result)
+				lines = result.text.split("\n")
+			else:
+				lines = iterHTMLLines(result)
+			# streamed pages are read while being parsed, so reading counts as parsing
+			with instrument.stage("parse"):
+				readWordPage(page, word, result.status_code, result.url, lines)
+			instrument.count("pages fetched")
+	except requests.RequestException as e:
+		print("Failed to get html source page for {0} ({1}).".format(word, e))
+
+	return page
+
+
+# persistent record of scraped words, in a local SQLite file
+# one row per word: status (see MANIFEST_RESOLVED; anything else is retried), audio urls
+# and filenames, HTTP status, ETag/Last-Modified of the word page, and time of last update
+# safe to share between threads
+class ScrapeManifest:
+
+	def __init__(self, filename):
+		import sqlite3
+		self.lock = threading.Lock()
+		self.conn = sqlite3.connect(filename, check_same_thread=False)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		self.conn.execute("""CREATE TABLE IF NOT EXISTS words (
+			word TEXT PRIMARY KEY,
+			status TEXT NOT NULL,
+			urls TEXT NOT NULL,
+			filenames TEXT NOT NULL,
+			http_status INTEGER,
+			etag TEXT,
+			last_modified TEXT,
+			updated REAL NOT NULL)""")
+		self.conn.commit()
+
+	# returns entry of word as a dict (keys as columns; urls and filenames are lists), or None
+	def get(self, word):
+		with self.lock:
+			row = self.conn.execute("SELECT status, urls, filenames, http_status, etag, last_modified, updated FROM words WHERE word=?", (word,)).fetchone()
+		if row is None:
+			return None
+		import json
+		return {"word": word, "status": row[0], "urls": json.loads(row[1]), "filenames": json.loads(row[2]),
+			"http_status": row[3], "etag": row[4], "last_modified": row[5], "updated": row[6]}
+
+	# record (insert or replace) entry of word
+	# page: as returned by getWordMP3s; status: final status of word
+	def record(self, word, status, page):
+		import json
+		urls = [url for url, filename in page["mp3s"]]
+		filenames = [filename for url, filename in page["mp3s"]]
+		with self.lock:
+			self.conn.execute("INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				(word, status, json.dumps(urls), json.dumps(filenames), page["http_status"], page["etag"], page["last_modified"], time.time()))
+			self.conn.commit()
+
+	def close(self):
+		with self.lock:
+			self.conn.close()
+
+
+# permissions of downloaded files (see DOWNLOAD_FILE_MODE), found on first call
+# umask can only be read by setting it, so this isn't done at import; as umask is briefly 0,
+# first call should not overlap with other threads creating files
+def getDownloadFileMode():
+
+	global DOWNLOAD_FILE_MODE
+	if DOWNLOAD_FILE_MODE is None:
+		umask = os.umask(0)
+		os.umask(umask)
+		DOWNLOAD_FILE_MODE = 0o666 & ~umask
+
+	return DOWNLOAD_FILE_MODE
 
 
 # download an audio file named filename from url into fileDest
 # url, filename, fileDest: strings
 # fileDest should be absolute path; not relative  or using ~/
-def downloadFile(url, filename, fileDest):
+# session, limiter: optional shared session and rate limiter (see scrapeAudioMain)
+# expectedSize, expectedSha256: optional; if given, file must match (size in bytes; hex digest)
+# file is streamed into a temp file in fileDest, checked, then renamed into place, so that
+# a partial file never appears under filename; no chdir, so safe to call from threads
+# returns True if file is in fileDest afterwards
+def downloadFile(url, filename, fileDest, session=None, limiter=None, expectedSize=None, expectedSha256=None):
 
-	# cd into fileDest
-	try:
-		os.chdir(fileDest)
-	except:
-		sys.exit("Can't cd into {0}. Exited.".format(fileDest))
+	import requests
+	import tempfile
+	filepath = os.path.join(fileDest, filename)
 
 	# download only if filename does not exist
 	# do not overwrite if it exists
-	if os.path.isfile(filename):
+	if os.path.isfile(filepath):
 		print("{0} already exists. No downloading performed.".format(filename))
-	else:
-		try:
-			# refs: 
-			# https://stackoverflow.com/questions/38489386/python-requests-403-forbidden
-			# https://stackoverflow.com/questions/39128738/downloading-a-song-through-python-requests
-			
-			result = requests.get(url, headers=HTTP_HEADER)
+		return True
+
+	tmpname = None
+	try:
+		# refs: 
+		# https://stackoverflow.com/questions/38489386/python-requests-403-forbidden
+		# https://stackoverflow.com/questions/39128738/downloading-a-song-through-python-requests
+		with httpGet(url, session, limiter, stream=True) as result:
+			# an error page is not audio
+			contentType = result.headers.get("Content-Type", "")
+			if result.status_code!=200:
+				print("Error when trying to download {0} (HTTP {1}).".format(filename, result.status_code))
+				return False
+			if not contentType.startswith(AUDIO_CONTENT_TYPES):
+				print("Error when trying to download {0} (Content-Type {1}).".format(filename, contentType))
+				return False
 
 			# w: open for writing, truncating the file first
 			# b: binary mode
-			# x: create a new file and open it for writing
-			# 'x' mode implies 'w' and raises an `FileExistsError` if the file 
-			# already exists
-			with open(filename, 'xb') as f:
-				f.write(result.content)
-		except:
-			print("Error when trying to download {0}.".format(filename))
+			# temp file is in fileDest, so that rename is atomic (same filesystem)
+			hasher = hashlib.sha256()
+			size = 0
+			with instrument.stage("download"), tempfile.NamedTemporaryFile(mode="wb", dir=fileDest, prefix="."+filename+".", suffix=".part", delete=False) as f:
+				tmpname = f.name
+				for chunk in result.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+					f.write(chunk)
+					hasher.update(chunk)
+					size += len(chunk)
+				f.flush()
+				os.fsync(f.fileno())
+				os.chmod(tmpname, getDownloadFileMode())
+			instrument.count("bytes downloaded", size)
+
+			contentLength = result.headers.get("Content-Length", "")
+			if contentLength.isdigit() and "Content-Encoding" not in result.headers and int(contentLength)!=size:
+				print("Error when trying to download {0} (truncated: {1} of {2} bytes).".format(filename, size, contentLength))
+				return False
+		if expectedSize is not None and size!=expectedSize:
+			print("Error when trying to download {0} (size {1}, expected {2}).".format(filename, size, expectedSize))
+			return False
+		if expectedSha256 is not None and hasher.hexdigest()!=expectedSha256.lower():
+			print("Error when trying to download {0} (checksum mismatch).".format(filename))
+			return False
+
+		os.replace(tmpname, filepath)
+		tmpname = None
+		instrument.count("files downloaded")
+		return True
+	except (requests.RequestException, OSError) as e:
+		print("Error when trying to download {0} ({1}).".format(filename, e))
+		return False
+	finally:
+		if tmpname is not None:
+			try:
+				os.remove(tmpname)
+			except OSError:
+				pass
+
+
+# page stage: find audio file(s) of a word
+# entry: manifest entry of word, if any; if it's resolved (MANIFEST_RESOLVED), its validators
+#        make the request conditional, and if page is unchanged, its audio files are reused;
+#        a word that failed is fetched in full again
+# returns a page dict (see getWordMP3s)
+def findWordAudio(word, session=None, limiter=None, entry=None, pageCache=None):
+
+	# GET word page html; IDENTIFY relevant html lines; EXTRACT word audio url(s) and filename(s)
+	if entry is None or entry["status"] not in MANIFEST_RESOLVED:
+		return getWordMP3s(word, session, limiter, pageCache=pageCache)
+
+	page = getWordMP3s(word, session, limiter, etag=entry["etag"], lastModified=entry["last_modified"], pageCache=pageCache)
+	if page["status"]=="not modified":
+		page["mp3s"] = list(zip(entry["urls"], entry["filenames"]))
+		# status follows from the page (its audio files), not from how their downloads went
+		if entry["status"]=="no entry":
+			page["status"] = "no entry"
+		else:
+			page["status"] = "found" if len(page["mp3s"])>0 else "no sound"
+		# 304 may omit validators
+		page["etag"] = page["etag"] or entry["etag"]
+		page["last_modified"] = page["last_modified"] or entry["last_modified"]
+
+	return page
 
 
 # main function to get audio files for a list of words
 # wordList: a list containing strings; each string is a word
-def scrapeAudioMain(wordList):
-	return
+# pages are fetched by pageWorkers threads; each audio file found is handed to one of
+# downloadWorkers threads, so that downloads overlap with fetching further pages
+# all requests share a pooled session, and requests per host are rate limited
+# useManifest: if True, record every word in the manifest (MANIFEST_FILENAME in fileDest) as
+#   soon as it's done, and skip words already resolved, so that an interrupted or repeated run
+#   only does what's left; failures are retried; stale entries (MANIFEST_MAX_AGE) are
+#   re-checked with a conditional request; missing audio files are downloaded again
+# usePageCache: if True, word pages are cached (see PageCache) under PAGE_CACHE_DIRNAME in fileDest
+# replay: if True, word pages are only read from page cache and nothing touches network:
+#   no page fetch, no download, no manifest; useful to rerun the parser over cached pages
+# returns a list of dicts, one per (unique) word, in order of wordList:
+#   word; status ("scraped", "no entry", "no page", "no sound", "failed"; in replay mode,
+#   "found" or "not cached" instead of "scraped" or "no page"); files (filenames downloaded);
+#   mp3s (list of (url, filename) found, in replay mode only)
+def scrapeAudioMain(wordList, fileDest=DIR_AUDIO, pageWorkers=PAGE_WORKERS, downloadWorkers=DOWNLOAD_WORKERS, ratePerHost=RATE_LIMIT_PER_HOST, useManifest=True, usePageCache=False, replay=False):
+
+	# unique words, order kept
+	wordList = list(dict.fromkeys([word for word in wordList if len(word)>0]))
+
+	pageCache = PageCache(os.path.join(fileDest, PAGE_CACHE_DIRNAME), replay=replay) if usePageCache or replay else None
+	if replay:
+		results = []
+		for word in wordList:
+			page = getWordMP3s(word, pageCache=pageCache)
+			results.append({"word": word, "status": page["status"], "files": [], "mp3s": page["mp3s"]})
+		printStatusCounts(results)
+		return results
+
+	if not os.path.isdir(fileDest):
+		sys.exit("Can't find {0}. Exited.".format(fileDest))
+
+	from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+	# before any download thread starts (see getDownloadFileMode)
+	getDownloadFileMode()
+	manifest = ScrapeManifest(os.path.join(fileDest, MANIFEST_FILENAME)) if useManifest else None
+	session = makeSession(pageWorkers + downloadWorkers)
+	limiter = HostRateLimiter(ratePerHost)
+	results = {word: {"word": word, "status": "failed", "files": []} for word in wordList}
+
+	# per word being scraped: page dict, and number of downloads not yet done
+	pages = {}
+	remaining = {}
+
+	# word is done: settle its status, and record it (unless it was skipped as fresh)
+	def finishWord(word):
+		page = pages[word]
+		if results[word]["status"]=="found":
+			results[word]["status"] = "scraped"
+		if manifest is not None and not page.get("fresh", False):
+			manifest.record(word, results[word]["status"], page)
+
+	with ThreadPoolExecutor(downloadWorkers) as downloadPool, ThreadPoolExecutor(pageWorkers) as pagePool:
+		# stage, word and file name of each future, and futures not done yet
+		futures = {}
+		pending = set()
+
+		def submitDownloads(word, page):
+			pages[word] = page
+			results[word]["status"] = page["status"]
+			remaining[word] = len(page["mp3s"])
+			for itemUrl, itemFilename in page["mp3s"]:
+				future = downloadPool.submit(downloadFile, itemUrl, itemFilename, fileDest, session, limiter)
+				futures[future] = ("download", word, itemFilename)
+				pending.add(future)
+			if remaining[word]==0:
+				finishWord(word)
+
+		now = time.time()
+		for word in wordList:
+			entry = manifest.get(word) if manifest is not None else None
+			if entry is not None and entry["status"] in MANIFEST_RESOLVED and now-entry["updated"] < MANIFEST_MAX_AGE:
+				# resolved and fresh: no page fetch; download only audio files gone missing
+				page = {"status": "found" if entry["status"]=="scraped" else entry["status"],
+					"mp3s": [(url, filename) for url, filename in zip(entry["urls"], entry["filenames"])
+						if not os.path.isfile(os.path.join(fileDest, filename))],
+					"http_status": entry["http_status"], "etag": entry["etag"], "last_modified": entry["last_modified"], "fresh": True}
+				results[word]["files"] = [filename for filename in entry["filenames"] if os.path.isfile(os.path.join(fileDest, filename))]
+				submitDownloads(word, page)
+			else:
+				future = pagePool.submit(findWordAudio, word, session, limiter, entry, pageCache)
+				futures[future] = ("page", word, None)
+				pending.add(future)
+
+		# hand over to download stage as soon as a page is done
+		# (submitDownloads adds the downloads of a page to pending)
+		while len(pending)>0:
+			done = wait(pending, return_when=FIRST_COMPLETED).done
+			pending.difference_update(done)
+			for future in done:
+				stage, word, itemFilename = futures.pop(future)
+				if stage=="page":
+					try:
+						page = future.result()
+					except BaseException as e:
+						print("Failed to find audio for {0} ({1}).".format(word, e))
+						continue
+					submitDownloads(word, page)
+				else:
+					try:
+						ok = future.result()
+					except BaseException:
+						ok = False
+					if ok:
+						results[word]["files"].append(itemFilename)
+					else:
+						results[word]["status"] = "failed"
+					remaining[word] -= 1
+					if remaining[word]==0:
+						finishWord(word)
+
+	session.close()
+	if manifest is not None:
+		manifest.close()
+
+	results = [results[word] for word in wordList]
+	printStatusCounts(results)
+
+	return results
+
+
+# print summary of results of scrapeAudioMain: number of words per status
+def printStatusCounts(results):
+
+	counts = {}
+	for result in results:
+		counts[result["status"]] = counts.get(result["status"], 0) + 1
+	print("; ".join(["{0}: {1}".format(status, n) for status, n in sorted(counts.items())]))
 
 # TODO?
 # - each step has a try/except
@@ -135,22 +752,26 @@ def scrapeAudioMain(wordList):
 # - except tell which word failed
 
 # function to get audio file for a single word
+# returns a dict as in scrapeAudioMain
 def scrapeAudioSingleWord(word):
 
-    # GET word page html
-    wordHTML = getAllHTML(word)
-
-    # IDENTIFY relevant html lines
-    wordHTMLwithMP3 = getHTMLwithMP3(wordHTML)
+    # GET word page html; IDENTIFY relevant html lines; EXTRACT word audio url(s) and filename(s)
+    page = findWordAudio(word)
+    status, mp3s = page["status"], page["mp3s"]
 
-    # EXTRACT word audio url(s) and filename(s)
     # DOWNLOAD word audio
-    if len(wordHTMLwithMP3)>0:
-    	for item in wordHTMLwithMP3:
-    		itemUrl, itemFilename = getUrlFilename(item)
-    		downloadFile(itemUrl, itemFilename, DIR_AUDIO)
-    else:
-    	# ?
+    result = {"word": word, "status": status, "files": []}
+    for itemUrl, itemFilename in mp3s:
+        if downloadFile(itemUrl, itemFilename, DIR_AUDIO):
+            result["files"].append(itemFilename)
+        else:
+            result["status"] = "failed"
+    if result["status"]=="found":
+        result["status"] = "scraped"
 
     # RECORD word, audio url(s), audio filename(s)
     # warning if >1 entry for a word
+    if len(mp3s)>1:
+        print("Warning: {0} audio files for {1}.".format(len(mp3s), word))
+
+    return result
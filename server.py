@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+
+# local quiz server: loads a dictionary (and its indexes) once, and hosts many quiz
+# sessions over it, each with its own words, progress and score
+# protocol: JSON lines over TCP; each request is one JSON object on one line, answered
+# by one JSON object on one line; every response has "ok" (and "error" if not ok); a bad
+# request (e.g. a filter of the wrong type) gets an error, and the connection stays open
+# requests ("op" and its fields):
+#   start:  quiz ("gender" or "m2w"), optional size (default QUIZ_SIZE), weighting and filters
+#           (see french.sampleDict, french.filterIdx), and for m2w ignore_accents (see
+#           french.gradeWordInput)
+#           -> session (id), card (of 1st word), words (number of words in session)
+#   card:   session -> card (of current word), word (its number, from 0)
+#   answer: session, answer (as typed) -> valid (False if malformed; nothing else is then
+#           sent), correct, hint, trials_left, and if word is done: truth, and card of next
+#           word, or finished and score if it was the last word
+#   end:    session -> results (one per word done, as french.genderQuizSingleWord), score
+#   stats:  -> sessions (number open), rows (number of rows in dictionary)
+# once MAX_SESSIONS sessions are open, those idle for more than SESSION_TTL seconds are dropped
+# in watch mode, edits to csv are picked up (see watch.DictWatcher) for sessions started
+# after them; sessions already started keep their words
+# usage: python mots.py serve --csv mots.csv [--watch]; python mots.py client (see runClient)
+
+import asyncio
+import json
+import secrets
+import socket
+import sys
+import time
+import french
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 5317
+SESSION_TTL = 3600
+MAX_SESSIONS = 10000
+# max length of a request line, in bytes
+MAX_REQUEST_BYTES = 65536
+# number of filtered subsets of dictionary kept (see QuizServer.getRows)
+MAX_SUBSETS = 64
+
+QUIZZES = ("gender", "m2w")
+
+# types of values of each filter in a start request (see french.filterIdx)
+# pos, gender, register and shard also take a list of strings
+FILTER_TYPES = {"pos": str, "gender": str, "register": str, "shard": str, "meaning": str,
+	"freqMin": int, "freqMax": int, "hasPhrases": bool, "hasVariation": bool, "isNoun": bool}
+
+
+# check filters of a start request (a dict, or None) before they reach french.filterIdx
+# raises ValueError naming the first bad filter
+def checkFilters(filters):
+
+	if filters is None:
+		return
+	if not isinstance(filters, dict):
+		raise ValueError("filters must be an object")
+	for name, value in filters.items():
+		if name not in FILTER_TYPES:
+			raise ValueError("unknown filter {0}".format(name))
+		wanted = FILTER_TYPES[name]
+		if value is None:
+			continue
+		if wanted is str and isinstance(value, list):
+			ok = all(isinstance(item, str) for item in value)
+		elif wanted is int:
+			ok = isinstance(value, int) and not isinstance(value, bool)
+		else:
+			ok = isinstance(value, wanted)
+		if not ok:
+			raise ValueError("bad value for filter {0}".format(name))
+
+
+# state of one quiz session: words (rows) to quiz, current word, results so far
+# kept small: rows (and wordDict, of all words, for hints) are shared with the server,
+# only references are held
+class QuizSession:
+
+	__slots__ = ("quiz", "rows", "wordDict", "ignoreAccents", "pos", "trialsLeft", "result", "results", "lastSeen")
+
+	def __init__(self, quiz, rows, wordDict, ignoreAccents=False):
+		self.quiz = quiz
+		self.rows = rows
+		self.wordDict = wordDict
+		self.ignoreAccents = ignoreAccents
+		self.pos = 0
+		self.results = []
+		self.lastSeen = time.monotonic()
+		self.startWord()
+
+	def startWord(self):
+		self.trialsLeft = french.QUIZ_TRIALS
+		self.result = {"word": self.currentRow().word, "correct": False, "trials": 0, "answers": [], "hints": [],
+			"invalid": 0, "truth": self.truth()}
+
+	def currentRow(self):
+		return self.rows[self.pos]
+
+	# card of current word
+	def card(self):
+		options = french.GENDER_CARD_OPTIONS if self.quiz=="gender" else french.M2W_CARD_OPTIONS
+		return french.renderCard(self.currentRow(), *options)
+
+	# expected answer of current word, formatted
+	def truth(self):
+		wordInfo = self.currentRow()
+		return french.formatAnswer(wordInfo.gender_truth) if self.quiz=="gender" else wordInfo.word
+
+	# score: number of words right, and number of words done
+	def score(self):
+		return {"correct": sum([result["correct"] for result in self.results]), "done": len(self.results)}
+
+	# grade answer (as typed) for current word, moving on to next word if done
+	# returns response fields (see answer request)
+	def answer(self, answer):
+
+		wordInfo = self.currentRow()
+		if self.quiz=="gender":
+			genderInput = french.parseGenderInput(answer)
+			if genderInput is None:
+				self.result["invalid"] += 1
+				return {"valid": False, "hint": "Incorrect input format."}
+			correct, hint = french.gradeGenderInput(genderInput, list(wordInfo.gender_truth))
+			answer = french.formatAnswer(genderInput)
+		else:
+			correct, hint = french.gradeWordInput(answer, wordInfo, self.wordDict, self.ignoreAccents)
+
+		self.result["trials"] += 1
+		self.result["answers"].append(answer)
+		if hint is not None:
+			self.result["hints"].append(hint)
+		self.result["correct"] = correct
+		self.trialsLeft -= 1
+
+		response = {"valid": True, "correct": correct, "hint": hint, "trials_left": self.trialsLeft}
+		if correct or self.trialsLeft==0:
+			response["truth"] = self.result["truth"]
+			self.results.append(self.result)
+			self.pos += 1
+			if self.pos < len(self.rows):
+				self.startWord()
+				response["card"] = self.card()
+			else:
+				response["finished"] = True
+				response["score"] = self.score()
+
+		return response
+
+	def finished(self):
+		return self.pos >= len(self.rows)
+
+
+# server state: the dictionary, filtered subsets of it, and sessions by id
+class QuizServer:
+
+	def __init__(self, csvname, watch=False):
+		self.wordDict = french.loadDict(csvname)
+		# for hints in meaning to word quiz, built before any session starts
+		self.wordDict.getIndex("typo")
+		self.subsets = {}
+		self.sessions = {}
+		self.watcher = french.getWatcher(self.wordDict) if watch else None
+		self.lastPoll = time.monotonic()
+
+	# in watch mode, apply edits to csv, at most every WATCH_INTERVAL seconds
+	def pollWatcher(self):
+
+		import watch
+		now = time.monotonic()
+		if now - self.lastPoll < watch.WATCH_INTERVAL:
+			return
+		self.lastPoll = now
+		if self.watcher.poll():
+			self.subsets.clear()
+			self.wordDict.getIndex("typo")
+
+	# rows to sample from for quiz, with filters (a dict, or None)
+	# subsets (and so their sampling indexes) are kept, for later sessions with same filters
+	def getRows(self, quiz, filters):
+
+		filters = dict(filters or {})
+		if quiz=="gender":
+			filters["isNoun"] = True
+		key = json.dumps(filters, sort_keys=True)
+		if key not in self.subsets:
+			if len(self.subsets) >= MAX_SUBSETS:
+				self.subsets.clear()
+			self.subsets[key] = self.wordDict.subset(french.filterIdx(self.wordDict, **filters)) if filters else self.wordDict
+		return self.subsets[key]
+
+	# drop sessions idle for more than SESSION_TTL
+	def expireSessions(self):
+		now = time.monotonic()
+		for sessionId in [sessionId for sessionId, session in self.sessions.items() if now - session.lastSeen > SESSION_TTL]:
+			del self.sessions[sessionId]
+
+	def getSession(self, request):
+		session = self.sessions.get(request.get("session"))
+		if session is None:
+			raise KeyError("no such session")
+		session.lastSeen = time.monotonic()
+		return session
+
+	def opStart(self, request):
+
+		quiz = request.get("quiz", "gender")
+		if quiz not in QUIZZES:
+			raise ValueError("quiz must be one of {0}".format(", ".join(QUIZZES)))
+		checkFilters(request.get("filters"))
+		rows = self.getRows(quiz, request.get("filters"))
+		size = min(int(request.get("size", french.QUIZ_SIZE)), len(rows))
+		if size <= 0:
+			raise ValueError("no word to quiz")
+		rows = french.sampleDict(rows, size, request.get("weighting"))
+
+		if len(self.sessions) >= MAX_SESSIONS:
+			self.expireSessions()
+			if len(self.sessions) >= MAX_SESSIONS:
+				raise ValueError("too many sessions")
+		sessionId = secrets.token_hex(8)
+		session = QuizSession(quiz, rows, self.wordDict, bool(request.get("ignore_accents", False)))
+		self.sessions[sessionId] = session
+
+		return {"session": sessionId, "card": session.card(), "words": len(rows)}
+
+	def opCard(self, request):
+		session = self.getSession(request)
+		if session.finished():
+			return {"finished": True, "score": session.score()}
+		return {"card": session.card(), "word": session.pos}
+
+	def opAnswer(self, request):
+		session = self.getSession(request)
+		if session.finished():
+			raise ValueError("session is finished")
+		return session.answer(str(request["answer"]))
+
+	def opEnd(self, request):
+		session = self.getSession(request)
+		del self.sessions[request["session"]]
+		return {"results": session.results, "score": session.score()}
+
+	def opStats(self, request):
+		return {"sessions": len(self.sessions), "rows": len(self.wordDict)}
+
+	# handle a request (a dict); returns response (a dict)
+	def handle(self, request):
+
+		handler = {"start": self.opStart, "card": self.opCard, "answer": self.opAnswer,
+			"end": self.opEnd, "stats": self.opStats}.get(request.get("op"))
+		if handler is None:
+			return {"ok": False, "error": "unknown op {0}".format(request.get("op"))}
+		if self.watcher is not None:
+			self.pollWatcher()
+		# french exits on bad input (e.g. unknown weighting, sample too large);
+		# a bad request must not take the server down, nor close the connection it came on
+		try:
+			response = handler(request)
+		except (Exception, SystemExit) as e:
+			return {"ok": False, "error": str(e.args[0]) if e.args else type(e).__name__}
+		response["ok"] = True
+
+		return response
+
+	# serve one connection: one response line per request line
+	async def serveClient(self, reader, writer):
+
+		try:
+			while True:
+				line = await reader.readline()
+				if len(line)==0:
+					break
+				try:
+					request = json.loads(line)
+					if not isinstance(request, dict):
+						raise ValueError
+				except ValueError:
+					response = {"ok": False, "error": "request must be a JSON object on one line"}
+				else:
+					response = self.handle(request)
+				writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+				await writer.drain()
+		except (ValueError, ConnectionError):
+			# request line too long, or client gone
+			pass
+		finally:
+			writer.close()
+
+
+# load csv and serve quizzes on host:port until interrupted
+def runServer(csvname, host=SERVER_HOST, port=SERVER_PORT, watch=False):
+
+	quizServer = QuizServer(csvname, watch)
+
+	async def serve():
+		server = await asyncio.start_server(quizServer.serveClient, host, port, limit=MAX_REQUEST_BYTES)
+		print("Serving {0} words on {1}:{2}.".format(len(quizServer.wordDict), host, port))
+		async with server:
+			await server.serve_forever()
+
+	try:
+		asyncio.run(serve())
+	except KeyboardInterrupt:
+		pass
+
+
+# blocking client of a quiz server, one request at a time
+class QuizClient:
+
+	def __init__(self, host=SERVER_HOST, port=SERVER_PORT):
+		self.sock = socket.create_connection((host, port))
+		self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.file = self.sock.makefile("rwb")
+
+	# send a request (fields as keyword arguments); returns response (a dict)
+	def request(self, **fields):
+		self.file.write((json.dumps(fields, ensure_ascii=False) + "\n").encode("utf-8"))
+		self.file.flush()
+		line = self.file.readline()
+		if len(line)==0:
+			raise ConnectionError("server closed connection")
+		return json.loads(line)
+
+	def close(self):
+		self.file.close()
+		self.sock.close()
+
+
+# play one quiz session on a server from the keyboard
+def runClient(host=SERVER_HOST, port=SERVER_PORT, quiz="gender", size=french.QUIZ_SIZE, weighting=None, filters=None,
+	ignoreAccents=False):
+
+	client = QuizClient(host, port)
+	response = client.request(op="start", quiz=quiz, size=size, weighting=weighting, filters=filters,
+		ignore_accents=ignoreAccents)
+	if not response["ok"]:
+		client.close()
+		sys.exit("{0}. Exited.".format(response["error"]))
+	sessionId = response["session"]
+	if quiz=="gender":
+		french.printInputInfo()
+
+	print(french.CARD_SEPARATOR + response["card"])
+	while True:
+		print("Your input:")
+		response = client.request(op="answer", session=sessionId, answer=input())
+		if response.get("hint"):
+			print(response["hint"])
+		if not response["valid"]:
+			continue
+		if response["correct"]:
+			print("Très bien!")
+		elif response["trials_left"]>0:
+			print("{0} trials left.".format(response["trials_left"]))
+		else:
+			print("Correct answer: {0}".format(response["truth"]))
+		if response.get("finished"):
+			break
+		if "card" in response:
+			print(french.CARD_SEPARATOR + response["card"])
+
+	score = client.request(op="end", session=sessionId)["score"]
+	client.close()
+	print("\n~ La Fin ~ {0} out of {1} correct.\n".format(score["correct"], score["done"]))
+
+
+# load test: nSessions sessions of size words each, played one after another by a client
+# that answers at random; prints number of requests and their latency (median, 99th percentile)
+# returns list of latencies (in seconds)
+def loadTest(host=SERVER_HOST, port=SERVER_PORT, nSessions=1000, size=french.QUIZ_SIZE, quiz="gender"):
+
+	import random
+	client = QuizClient(host, port)
+	latencies = []
+
+	def timedRequest(**fields):
+		start = time.perf_counter()
+		response = client.request(**fields)
+		latencies.append(time.perf_counter() - start)
+		if not response["ok"]:
+			sys.exit("{0}. Exited.".format(response["error"]))
+		return response
+
+	for i in range(nSessions):
+		sessionId = timedRequest(op="start", quiz=quiz, size=size)["session"]
+		while True:
+			answer = random.choice(french.LEGAL_GENDER_INPUTS) if quiz=="gender" else "x"
+			if timedRequest(op="answer", session=sessionId, answer=answer).get("finished"):
+				break
+		timedRequest(op="end", session=sessionId)
+	client.close()
+
+	ordered = sorted(latencies)
+	print("{0} requests; latency median {1:.3f} ms, 99th percentile {2:.3f} ms.".format(
+		len(ordered), 1000*ordered[len(ordered)//2], 1000*ordered[int(len(ordered)*0.99)]))
+
+	return latencies
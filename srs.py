@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# spaced repetition for quizzes (SM-2)
+# review state and history of each word are kept in a local SQLite file
+# words due for review are picked from a heap keyed by due time
+
+import heapq
+import sqlite3
+import time
+
+# SM-2 parameters
+# a word starts with ease factor EF_START; ease never drops below EF_MIN
+# intervals (in days) after 1st and 2nd successful reviews; later ones grow by ease factor
+EF_START = 2.5
+EF_MIN = 1.3
+FIRST_INTERVALS = (1, 6)
+# a failed word comes back after RELEARN_DELAY seconds
+RELEARN_DELAY = 10*60
+DAY = 24*3600
+
+# max number of never-reviewed words introduced per session
+NEW_PER_SESSION = 10
+
+
+# grade a quiz result on the SM-2 scale 0-5
+# result: a dict with "correct" (boolean) and "trials" (number of trials used)
+# right on 1st trial: 5; 2nd: 4; 3rd or later: 3; never: 1
+def getQuality(result):
+
+	if not result["correct"]:
+		return 1
+	return max(3, 6 - result["trials"])
+
+
+# update SM-2 state (ef, interval in days, reps) after a review of given quality
+# returns new (ef, interval, reps), and delay (in seconds) until next review
+def updateSM2(ef, interval, reps, quality):
+
+	ef = max(EF_MIN, ef + 0.1 - (5-quality)*(0.08 + (5-quality)*0.02))
+
+	if quality < 3:
+		return ef, 0, 0, RELEARN_DELAY
+
+	reps += 1
+	if reps <= len(FIRST_INTERVALS):
+		interval = FIRST_INTERVALS[reps-1]
+	else:
+		interval = round(interval*ef)
+
+	return ef, interval, reps, interval*DAY
+
+
+# review state and history of words, stored in a SQLite file (dbname)
+# state: one row per word reviewed at least once (ease factor, interval, reps, lapses, due time)
+# log: one row per review (time, quality, correct, trials, answers); append only, never read
+#      when setting up a session, so it may grow for years at no cost to startup
+class ReviewScheduler:
+
+	def __init__(self, dbname):
+		self.conn = sqlite3.connect(dbname)
+		self.conn.executescript("""
+			CREATE TABLE IF NOT EXISTS state (
+				word TEXT PRIMARY KEY,
+				ef REAL NOT NULL,
+				interval INTEGER NOT NULL,
+				reps INTEGER NOT NULL,
+				lapses INTEGER NOT NULL,
+				due REAL NOT NULL,
+				last REAL NOT NULL);
+			CREATE TABLE IF NOT EXISTS log (
+				word TEXT NOT NULL,
+				time REAL NOT NULL,
+				quality INTEGER NOT NULL,
+				correct INTEGER NOT NULL,
+				trials INTEGER NOT NULL,
+				answers TEXT NOT NULL);
+			""")
+		self.conn.commit()
+		self.heap = None
+
+	# build heap of (due, word) over words already reviewed, restricted to words
+	# (a set of words in the current dictionary, or anything else "in" works on, or None for all)
+	# O(n) once per session; each pick afterwards is O(log n)
+	def loadQueue(self, words=None):
+		self.heap = [(due, word) for word, due in self.conn.execute("SELECT word, due FROM state")
+			if words is None or word in words]
+		heapq.heapify(self.heap)
+
+	# pick up to size words to review at time now (default: current time)
+	# due words come first, most overdue first; remaining slots go to never-reviewed words
+	# newWords: never-reviewed candidates, in order of preference (e.g. by frequency rank)
+	#           only those not in state are used, at most newLimit of them
+	# returns a list of words
+	def pickWords(self, size, newWords=(), newLimit=NEW_PER_SESSION, now=None):
+
+		if self.heap is None:
+			self.loadQueue()
+		if now is None:
+			now = time.time()
+
+		picked = []
+		while len(picked) < size and len(self.heap) > 0 and self.heap[0][0] <= now:
+			picked.append(heapq.heappop(self.heap)[1])
+
+		nNew = min(size - len(picked), newLimit)
+		if nNew > 0:
+			seen = set([word for due, word in self.heap])
+			seen.update(picked)
+			for word in newWords:
+				if nNew == 0:
+					break
+				if word in seen:
+					continue
+				if self.conn.execute("SELECT 1 FROM state WHERE word=?", (word,)).fetchone() is None:
+					picked.append(word)
+					seen.add(word)
+					nNew -= 1
+
+		return picked
+
+	# due time of next word in queue (None if queue is empty)
+	def nextDue(self):
+		if self.heap is None:
+			self.loadQueue()
+		return self.heap[0][0] if len(self.heap) > 0 else None
+
+	# record result of a review of word (see getQuality for result), and reschedule it
+	# returns due time of next review
+	def record(self, word, result, now=None):
+
+		if now is None:
+			now = time.time()
+		quality = getQuality(result)
+
+		row = self.conn.execute("SELECT ef, interval, reps, lapses FROM state WHERE word=?", (word,)).fetchone()
+		ef, interval, reps, lapses = row if row is not None else (EF_START, 0, 0, 0)
+		ef, interval, reps, delay = updateSM2(ef, interval, reps, quality)
+		if quality < 3:
+			lapses += 1
+		due = now + delay
+
+		self.conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?, ?, ?)", (word, ef, interval, reps, lapses, due, now))
+		self.conn.execute("INSERT INTO log VALUES (?, ?, ?, ?, ?, ?)",
+			(word, now, quality, int(result["correct"]), result["trials"], ";".join(result.get("answers", []))))
+		self.conn.commit()
+
+		if self.heap is not None:
+			heapq.heappush(self.heap, (due, word))
+
+		return due
+
+	def close(self):
+		self.conn.close()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+# SQLite storage of a dictionary, in place of loading the whole csv
+# importCSV copies a csv (e.g. mots.csv) into a SQLite database (e.g. mots.csv.sqlite), with
+# indexes on word, folded word (see french.foldWord), noun flag and frequency rank, and tables
+# of POS/genders/registers (tags) and of meaning tokens (see french.buildMeaningIndex) for filters
+# SQLiteDict reads it: rows are fetched as needed, and word lookups, filters and sampling run
+# as indexed queries, so that starting a quiz takes about as long for a million words as
+# for a thousand
+# french.loadDict opens a SQLite database given in place of a csv, so every quiz can use one
+# usage: python mots.py import --csv mots.csv; python mots.py gender --csv mots.csv.sqlite
+# the database isn't updated when the csv changes; import it again
+
+import os
+import sqlite3
+import sys
+import french
+import instrument
+
+DB_SUFFIX = ".sqlite"
+# bump DB_VERSION whenever the schema changes; older databases must be imported again
+DB_VERSION = 1
+# max number of ids per "IN (...)" query (older SQLite allow 999 variables per query)
+QUERY_CHUNK = 500
+
+SCHEMA = """
+	CREATE TABLE meta (
+		key TEXT PRIMARY KEY,
+		value TEXT NOT NULL);
+	CREATE TABLE words (
+		id INTEGER PRIMARY KEY,
+		frequency_rank INTEGER,
+		noun_article TEXT NOT NULL,
+		word TEXT NOT NULL,
+		part_of_speech TEXT NOT NULL,
+		variation TEXT NOT NULL,
+		meaning TEXT NOT NULL,
+		phrases TEXT NOT NULL,
+		related TEXT NOT NULL,
+		register TEXT NOT NULL,
+		folded TEXT NOT NULL,
+		is_noun INTEGER NOT NULL);
+	CREATE TABLE tags (
+		kind TEXT NOT NULL,
+		value TEXT NOT NULL,
+		id INTEGER NOT NULL);
+	CREATE TABLE tokens (
+		token TEXT NOT NULL,
+		grp INTEGER NOT NULL,
+		id INTEGER NOT NULL);
+	"""
+
+# created once rows are in (quicker than updating them row by row)
+INDEXES = """
+	CREATE INDEX words_word ON words (word);
+	CREATE INDEX words_folded ON words (folded);
+	CREATE INDEX words_noun ON words (is_noun, frequency_rank);
+	CREATE INDEX words_freq ON words (frequency_rank);
+	CREATE INDEX tags_value ON tags (kind, value, id);
+	CREATE INDEX tokens_token ON tokens (token, grp, id);
+	"""
+
+# csv columns of words, in the order of WordRow (id of a row is its position in csv, from 0)
+ROW_COLS = ", ".join(french.CSV_COLS)
+
+
+# "?, ?, ..." for n values
+def getPlaceholders(n):
+	return ", ".join(["?"]*n)
+
+
+# path of the database of a csv (default of importCSV)
+def getDBPath(csvname):
+	return french.getDictPath(csvname) + DB_SUFFIX
+
+
+# copy csv (or csv shards, merged; see french.loadShards) into a new SQLite database dbname
+# (default: next to csv, see getDBPath), replacing it if it exists; csv is checked as by
+# french.parseWordInfoCSV (exits on illegal POS)
+# written to a temp file first and renamed, so that a failed import leaves the old database
+# returns number of rows imported
+def importCSV(csvname, dbname=None):
+
+	if dbname is None:
+		dbname = getDBPath(csvname)
+	tmpname = dbname + ".tmp{0}".format(os.getpid())
+	if os.path.exists(tmpname):
+		os.remove(tmpname)
+
+	with instrument.stage("import"):
+		rows = french.loadDict(csvname, useCache=False).rows
+		conn = sqlite3.connect(tmpname)
+		try:
+			conn.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + SCHEMA)
+			conn.executemany("INSERT INTO words VALUES ({0})".format(getPlaceholders(len(french.CSV_COLS)+3)),
+				[(idx,) + tuple(row[:len(french.CSV_COLS)]) + (french.foldWord(row.word), int(row.is_noun)) for idx, row in enumerate(rows)])
+
+			tags = []
+			for idx, row in enumerate(rows):
+				tags.extend([("pos", pos, idx) for pos in set(row.pos_list)])
+				tags.extend([("gender", gender, idx) for gender in set(row.gender_truth)])
+				if len(row.register)>0:
+					tags.extend([("register", register, idx) for register in set(french.parsePos(row.register))])
+			conn.executemany("INSERT INTO tags VALUES (?, ?, ?)", tags)
+
+			meaningIndex = french.buildMeaningIndex(rows)
+			groupMask = (1 << french.MEANING_GROUP_BITS) - 1
+			conn.executemany("INSERT INTO tokens VALUES (?, ?, ?)", [(token, posting & groupMask, posting >> french.MEANING_GROUP_BITS)
+				for token, postings in zip(meaningIndex["vocab"], meaningIndex["postings"]) for posting in postings])
+
+			conn.executescript(INDEXES)
+			conn.executemany("INSERT INTO meta VALUES (?, ?)", [("version", str(DB_VERSION)), ("rows", str(len(rows))),
+				("csv", os.path.abspath(csvname))])
+			conn.commit()
+		finally:
+			conn.close()
+		os.replace(tmpname, dbname)
+
+	return len(rows)
+
+
+# connect to a database made by importCSV; exits if its schema is out of date
+def openDB(dbname):
+
+	conn = sqlite3.connect(dbname)
+	try:
+		version = conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+	except sqlite3.DatabaseError:
+		version = None
+	if version is None or int(version[0])!=DB_VERSION:
+		conn.close()
+		sys.exit("{0} is not a dictionary database of this version; import csv again (python mots.py import). Exited.".format(dbname))
+
+	return conn
+
+
+# a dictionary in a SQLite database (see importCSV), or a subset of its rows
+# behaves like french.MotsDict: len(), [] and iteration give WordRow, and getIndex() and
+# subset() work; filters (see french.filterIdx) run as one query
+# rows are fetched as needed; indexes word, noun, prefix and alias are served by queries,
+# others (e.g. typo, meaning) are built by french.INDEX_BUILDERS over all rows, which are
+# then loaded once
+class SQLiteDict:
+
+	def __init__(self, dbname, ids=None, conn=None):
+		self.dbname = dbname
+		self.csvname = dbname
+		self.conn = conn if conn is not None else openDB(dbname)
+		# ids of rows, by position; None for all rows of database (whose ids are their positions)
+		self.ids = ids
+		self.nRows = len(ids) if ids is not None else int(self.conn.execute("SELECT value FROM meta WHERE key='rows'").fetchone()[0])
+		# id -> position, for subsets (see getPositions)
+		self.positions = None
+		self.allRows = None
+		self.indexes = {}
+
+	def __len__(self):
+		return self.nRows
+
+	def __getitem__(self, idx):
+		if self.allRows is not None:
+			return self.allRows[idx]
+		if idx<0:
+			idx += self.nRows
+		if idx<0 or idx>=self.nRows:
+			raise IndexError("row index out of range")
+		return self.fetchRows([self.getId(idx)])[0]
+
+	def __iter__(self):
+		if self.allRows is not None:
+			return iter(self.allRows)
+		return self.iterRows()
+
+	# all rows, loaded on first use (e.g. by index builders); a list like MotsDict.rows
+	@property
+	def rows(self):
+		if self.allRows is None:
+			with instrument.stage("load: db rows"):
+				self.allRows = list(self.iterRows())
+		return self.allRows
+
+	def iterRows(self):
+		if self.ids is None:
+			for record in self.conn.execute("SELECT {0} FROM words ORDER BY id".format(ROW_COLS)):
+				yield french.makeWordRow(*record)
+			instrument.count("rows fetched", self.nRows)
+		else:
+			for start in range(0, len(self.ids), QUERY_CHUNK):
+				yield from self.fetchRows(self.ids[start:start+QUERY_CHUNK])
+
+	# rows of given ids, in that order
+	def fetchRows(self, ids):
+
+		rowsById = {}
+		for start in range(0, len(ids), QUERY_CHUNK):
+			chunk = ids[start:start+QUERY_CHUNK]
+			for record in self.conn.execute("SELECT id, {0} FROM words WHERE id IN ({1})".format(ROW_COLS, getPlaceholders(len(chunk))), chunk):
+				rowsById[record[0]] = french.makeWordRow(*record[1:])
+		instrument.count("rows fetched", len(ids))
+
+		return [rowsById[i] for i in ids]
+
+	# id of row at position idx
+	def getId(self, idx):
+		return idx if self.ids is None else self.ids[idx]
+
+	def getPositions(self):
+		if self.positions is None:
+			self.positions = {i: idx for idx, i in enumerate(self.ids)}
+		return self.positions
+
+	# positions (row indices) of rows of given ids that are in this dictionary, ascending
+	def toPositions(self, ids):
+		if self.ids is None:
+			return sorted(ids)
+		positions = self.getPositions()
+		return sorted([positions[i] for i in ids if i in positions])
+
+	# ids of rows (in the whole database) matching where (SQL over columns of words)
+	def queryIds(self, where, params=()):
+		return [i for (i,) in self.conn.execute("SELECT id FROM words WHERE {0}".format(where), params)]
+
+	# frequency rank of each row, in order of rows
+	def getRanks(self):
+		if self.ids is None:
+			return [rank for (rank,) in self.conn.execute("SELECT frequency_rank FROM words ORDER BY id")]
+		ranks = {}
+		for start in range(0, len(self.ids), QUERY_CHUNK):
+			chunk = self.ids[start:start+QUERY_CHUNK]
+			ranks.update(self.conn.execute("SELECT id, frequency_rank FROM words WHERE id IN ({0})".format(getPlaceholders(len(chunk))), chunk))
+		return [ranks[i] for i in self.ids]
+
+	# first k rows by frequency rank (ranked rows first, most frequent first, then unranked
+	# rows; ties in csv order, i.e. in order of rows of a filtered subset), without reading
+	# all rows: rows are read in rank order from the frequency index, and only until k rows
+	# of this dictionary are found
+	# returns list of (row index, word)
+	def getFirstRanked(self, k):
+
+		positions = self.getPositions() if self.ids is not None else None
+		found = []
+		for query in ("SELECT id, word FROM words WHERE frequency_rank IS NOT NULL ORDER BY frequency_rank, id",
+			"SELECT id, word FROM words WHERE frequency_rank IS NULL ORDER BY id"):
+			for i, word in self.conn.execute(query):
+				if len(found)>=k:
+					return found
+				if positions is None:
+					found.append((i, word))
+				elif i in positions:
+					found.append((positions[i], word))
+
+		return found
+
+	# prefix index (see french.buildPrefixIndex) from folded words stored at import
+	def getPrefixIndex(self):
+		if self.ids is None:
+			pairs = self.conn.execute("SELECT DISTINCT folded, word FROM words ORDER BY folded, word").fetchall()
+		else:
+			positions = self.getPositions()
+			pairs = sorted(set([(folded, word) for i, folded, word in self.conn.execute("SELECT id, folded, word FROM words") if i in positions]))
+		return [folded for folded, word in pairs], [word for folded, word in pairs]
+
+	# get index by name, as MotsDict.getIndex
+	def getIndex(self, name):
+		if name not in self.indexes:
+			kind, sep, param = name.partition(":")
+			if kind=="word":
+				index = (WordIndex(self), FoldIndex(self))
+			elif kind=="noun":
+				index = self.toPositions(self.queryIds("is_noun=1"))
+			elif kind=="prefix":
+				index = self.getPrefixIndex()
+			elif kind=="alias":
+				index = french.buildAliasTable(french.getSampleWeights(self.getRanks(), param))
+			elif sep:
+				index = french.INDEX_BUILDERS[kind](self.rows, param)
+			else:
+				index = french.INDEX_BUILDERS[kind](self.rows)
+			self.indexes[name] = index
+		return self.indexes[name]
+
+	# returns a new SQLiteDict of rows at idxList (in that order), sharing the connection
+	def subset(self, idxList):
+		return SQLiteDict(self.dbname, [self.getId(idx) for idx in idxList], self.conn)
+
+	# row indices matching all given filters, ascending; arguments as french.filterIdx
+	# a database has no shards (it's imported from a merged dictionary)
+	def filterIdx(self, pos=None, gender=None, register=None, freqMin=None, freqMax=None, hasPhrases=None, hasVariation=None, isNoun=None, meaning=None, shard=None):
+
+		if shard is not None:
+			sys.exit("Shard filter doesn't apply to a database; import the shards needed. Exited.")
+
+		conds = []
+		params = []
+		for kind, values in (("pos", pos), ("gender", gender), ("register", register)):
+			if values is None:
+				continue
+			if isinstance(values, str):
+				values = [values]
+			conds.append("id IN (SELECT id FROM tags WHERE kind=? AND value IN ({0}))".format(getPlaceholders(len(values))))
+			params.extend([kind] + list(values))
+
+		# unranked rows (NULL) never match
+		if freqMin is not None:
+			conds.append("frequency_rank >= ?")
+			params.append(freqMin)
+		if freqMax is not None:
+			conds.append("frequency_rank <= ?")
+			params.append(freqMax)
+
+		for column, wanted in (("phrases", hasPhrases), ("variation", hasVariation)):
+			if wanted is not None:
+				conds.append("{0} {1} ''".format(column, "!=" if wanted else "="))
+		if isNoun is not None:
+			conds.append("is_noun = ?")
+			params.append(int(isNoun))
+
+		# all tokens in the same meaning (see french.lookupMeaning)
+		if meaning is not None:
+			tokens = french.RE_TOKEN.findall(meaning.casefold())
+			if len(tokens)==0:
+				return []
+			conds.append("id IN (SELECT id FROM ({0}))".format(" INTERSECT ".join(["SELECT id, grp FROM tokens WHERE token=? AND grp<?"]*len(tokens))))
+			for token in tokens:
+				params.extend([token, french.MEANING_GROUP_PHRASES])
+
+		with instrument.stage("filter: query"):
+			return self.toPositions(self.queryIds(" AND ".join(conds) or "1", params))
+
+	def close(self):
+		self.conn.close()
+
+
+# word index of a SQLiteDict: word -> row indices, queried as needed
+# stands in for the first dict of french.buildWordIndex
+class WordIndex:
+
+	def __init__(self, wordDict):
+		self.wordDict = wordDict
+
+	def get(self, word, default=None):
+		idxList = self.wordDict.toPositions(self.wordDict.queryIds("word=?", (word,)))
+		return idxList if len(idxList)>0 else default
+
+	def __contains__(self, word):
+		return self.get(word) is not None
+
+	def __getitem__(self, word):
+		idxList = self.get(word)
+		if idxList is None:
+			raise KeyError(word)
+		return idxList
+
+	# distinct words (in no particular order)
+	def __iter__(self):
+		wordDict = self.wordDict
+		if wordDict.ids is None:
+			return iter([word for (word,) in wordDict.conn.execute("SELECT DISTINCT word FROM words")])
+		positions = wordDict.getPositions()
+		return iter(set([word for i, word in wordDict.conn.execute("SELECT id, word FROM words") if i in positions]))
+
+
+# folded word index of a SQLiteDict: folded word -> distinct words, queried as needed
+# stands in for the second dict of french.buildWordIndex
+class FoldIndex:
+
+	def __init__(self, wordDict):
+		self.wordDict = wordDict
+
+	def get(self, folded, default=None):
+		wordDict = self.wordDict
+		records = wordDict.conn.execute("SELECT id, word FROM words WHERE folded=?", (folded,)).fetchall()
+		if wordDict.ids is None:
+			records = sorted(records)
+		else:
+			positions = wordDict.getPositions()
+			records = sorted([(positions[i], word) for i, word in records if i in positions])
+		words = []
+		for idx, word in records:
+			if word not in words:
+				words.append(word)
+		return words if len(words)>0 else default
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# watch mode: pick up edits to the csv while a quiz, the server or a validation loop runs
+# DictWatcher polls the csv's size and mtime (see poll); when they change, its records are
+# diffed with the loaded ones by content, and only added or changed rows are parsed
+# and validated (see french.validateRow); rows that would break a quiz (SKIP_ERRORS) are left
+# out, with a warning, rather than ending the session
+# the loaded MotsDict is updated in place: its list of rows, its word index (incrementally,
+# for rows edited in place or appended), and any other index is dropped, to be rebuilt
+# when next used
+# a dictionary of csv shards is reloaded as a whole instead (only changed shards are parsed
+# again; see french.loadShards); shards added to (or removed from) its directory count as
+# a change, and are loaded too, unless only some shards were loaded (--shard)
+# the csv is still read in full on each change, but after the first one, unchanged records
+# are matched by their text alone: parsing, validating and indexing are what's proportional
+# to the change
+# usage: python mots.py gender --csv mots.csv --watch; python mots.py validate --csv mots.csv --watch
+
+import csv
+import os
+import time
+from collections import Counter
+import french
+import instrument
+
+# seconds between polls of the validation loop and of the server (see watchValidate, server)
+WATCH_INTERVAL = 1.0
+# word index is rebuilt rather than updated if more than this share of rows moved
+# (e.g. rows inserted near the top of csv shift all rows after them)
+WORD_INDEX_REBUILD_RATIO = 0.1
+# kinds of validation errors (see french.validateRow) for which a changed row is left out;
+# rows with other errors are kept, as they are when loading csv
+SKIP_ERRORS = ("illegal_pos", "bad_frequency", "unbalanced_braces", "pos_meaning_mismatch")
+
+
+# size and mtime of a file; None if it can't be read (e.g. being replaced by an editor)
+def getStamp(filename):
+
+	try:
+		st = os.stat(filename)
+	except OSError:
+		return None
+	return st.st_size, st.st_mtime_ns
+
+
+# key of csv fields (in the order of CSV_COLS), to find rows already loaded; frequency rank
+# is as an int would print, so that rows loaded (whose frequency rank is an int) and fields
+# read compare equal
+# a tuple of the fields rather than a digest of them (see french.getRowHash): a dict hashes
+# it faster
+def getFieldsKey(fields):
+
+	freq = fields[french.CSV_COL_N_FREQ]
+	try:
+		freq = str(int(freq))
+	except ValueError:
+		pass
+	return (freq,) + tuple(fields[1:])
+
+
+# key of a loaded row (see getFieldsKey)
+def getWordRowKey(wordRow):
+
+	freq = wordRow.frequency_rank
+	return ("" if freq is None else str(freq),) + tuple(wordRow[1:len(french.CSV_COLS)])
+
+
+# keeps a loaded dictionary (a MotsDict, from a csv or csv shards) in step with its csv
+# call poll() between quiz items, requests, etc.
+class DictWatcher:
+
+	def __init__(self, wordDict):
+
+		if not isinstance(wordDict, french.MotsDict) or wordDict.shards is None:
+			raise ValueError("watch mode needs a dictionary loaded from csv (not a subset or a database)")
+		self.wordDict = wordDict
+		self.paths = french.getShards(wordDict.csvname)
+		self.sharded = len(wordDict.shards)>1 or self.paths!=[wordDict.csvname]
+		self.stamps = [getStamp(path) for path in self.paths]
+		# names of the only shards loaded (see french.loadShards); None if all were
+		self.shardNames = [name for name, start, end in wordDict.shards]
+		if set(self.shardNames)==set(map(french.getShardName, self.paths)):
+			self.shardNames = None
+		# csv record (its text) -> row, as of last change (see update)
+		self.rowsByLine = None
+		# csv records left out (see SKIP_ERRORS), as of last change; not parsed nor reported again
+		self.skippedLines = set()
+
+	# check csv (or shards, and which shards there are) for changes, and apply them if any
+	# (see update)
+	# returns True if rows changed
+	def poll(self):
+
+		paths = french.getShards(self.wordDict.csvname) if self.sharded else self.paths
+		stamps = [getStamp(path) for path in paths]
+		if (paths==self.paths and stamps==self.stamps) or None in stamps:
+			return False
+		self.paths = paths
+		self.stamps = stamps
+
+		with instrument.stage("watch: update"):
+			if self.sharded:
+				self.reloadShards()
+			else:
+				self.update()
+		instrument.count("watch updates")
+
+		return True
+
+	# reload all shards loaded (see french.loadShards), in place
+	def reloadShards(self):
+
+		wordDict = self.wordDict
+		shardNames = self.shardNames
+		if shardNames is not None:
+			present = set(map(french.getShardName, self.paths))
+			shardNames = [name for name in shardNames if name in present]
+			if len(shardNames)==0:
+				print("\n{0} changed: none of the shards loaded is left, words kept.".format(wordDict.csvname))
+				return
+		fresh = french.loadShards(wordDict.csvname, shardNames)
+		wordDict.rows[:] = fresh.rows
+		wordDict.shards = fresh.shards
+		wordDict.stamp = None
+		wordDict.indexes.clear()
+		print("\n{0} changed: {1} word(s) reloaded.".format(wordDict.csvname, len(wordDict)))
+
+	# diff rows of csv with the loaded ones, and update the loaded dictionary in place
+	# a record (a line, or lines if a quoted field spans them) seen at the last change is
+	# matched by its text, without parsing it; on first change, rows loaded are matched by
+	# their fields (see getFieldsKey); only other records are parsed and validated
+	# rows are counted by word: a new row of a word gone from the same change counts as changed
+	# returns number of rows added, changed, removed, and newly skipped (see SKIP_ERRORS)
+	def update(self):
+
+		wordDict = self.wordDict
+		rowsByKey = {}
+		if self.rowsByLine is None:
+			rowsByKey = {getWordRowKey(row): row for row in wordDict.rows}
+			self.rowsByLine = {}
+
+		with open(wordDict.csvname, newline='') as csvfile:
+			lines = csvfile.readlines()
+		colIdx = french.getCSVColIdx(next(csv.reader(lines[:1]), []))
+		records, lineNums = splitRecords(lines)
+
+		oldRows = list(wordDict.rows)
+		found = list(map(self.rowsByLine.get, records))
+		parsedRows = []
+		skipped = []
+		skippedLines = set()
+		for n in [n for n, wordRow in enumerate(found) if wordRow is None]:
+			if records[n] in self.skippedLines:
+				skippedLines.add(records[n])
+				continue
+			row = next(csv.reader(records[n].splitlines(True)), [])
+			fields = [row[i] if i<len(row) else "" for i in colIdx]
+			found[n] = rowsByKey.get(getFieldsKey(fields))
+			if found[n] is not None:
+				continue
+			errors = french.validateRow(fields)
+			if any([kind in SKIP_ERRORS for kind, detail in errors]):
+				skipped.append((lineNums[n], fields[french.CSV_COL_N_WORD], errors))
+				skippedLines.add(records[n])
+				continue
+			freq = fields[french.CSV_COL_N_FREQ]
+			found[n] = french.makeWordRow(int(freq) if freq else None, *fields[1:])
+			parsedRows.append(found[n])
+		self.rowsByLine = dict(zip(records, found))
+		self.skippedLines = skippedLines
+		newRows = found
+		if len(skippedLines)>0:
+			self.rowsByLine = {record: wordRow for record, wordRow in self.rowsByLine.items() if wordRow is not None}
+			newRows = [wordRow for wordRow in found if wordRow is not None]
+		instrument.count("records compared", len(records))
+		instrument.count("rows validated", len(parsedRows) + len(skipped))
+
+		# rows gone, matched by word with rows parsed
+		newIds = set(map(id, newRows))
+		goneWords = Counter([row.word for row in oldRows if id(row) not in newIds])
+		nChanged = sum((goneWords & Counter([row.word for row in parsedRows])).values())
+		nAdded = len(parsedRows) - nChanged
+		nRemoved = sum(goneWords.values()) - nChanged
+
+		# positions whose row is new, gone, or another one than before
+		moved = [i for i, (oldRow, newRow) in enumerate(zip(oldRows, newRows)) if oldRow is not newRow]
+		moved.extend(range(min(len(oldRows), len(newRows)), max(len(oldRows), len(newRows))))
+
+		wordDict.rows[:] = newRows
+		# rows no longer match the cache of csv, nor its cached indexes (see french.MotsDict)
+		wordDict.stamp = None
+		wordDict.shards = [(french.getShardName(wordDict.csvname), 0, len(newRows))]
+		wordIndex = wordDict.indexes.get("word")
+		wordDict.indexes.clear()
+		if wordIndex is not None and len(moved) <= WORD_INDEX_REBUILD_RATIO*len(newRows):
+			updateWordIndex(wordIndex, oldRows, newRows, moved)
+			wordDict.indexes["word"] = wordIndex
+
+		print("\n{0} changed: {1} row(s) added, {2} changed, {3} removed.".format(wordDict.csvname, nAdded, nChanged, nRemoved))
+		for lineNum, word, errors in skipped:
+			print("Skipped line {0} ({1}): {2}".format(lineNum, word, "; ".join(["{0}: {1}".format(kind, detail) for kind, detail in errors])))
+
+		return nAdded, nChanged, nRemoved, len(skipped)
+
+	# current rows of words in rows (a list of WordRow, e.g. the rest of a quiz deck)
+	# a word edited gets its new row; a word removed (or, if nounsOnly, no longer a noun) is dropped
+	def refreshRows(self, rows, nounsOnly=False):
+
+		wordDict = self.wordDict
+		exactIdx = wordDict.getIndex("word")[0]
+		fresh = []
+		for wordRow in rows:
+			candidates = [wordDict[idx] for idx in exactIdx.get(wordRow.word, [])]
+			if len(candidates)==0:
+				continue
+			wordRow = wordRow if wordRow in candidates else candidates[0]
+			if nounsOnly and not wordRow.is_noun:
+				continue
+			fresh.append(wordRow)
+
+		return fresh
+
+
+# records of csv lines (after header): a record is one line, or more if a quoted field
+# spans lines (its lines then hold an odd number of quotes)
+# returns list of records (their text), and line number of each (from 1, header included)
+def splitRecords(lines):
+
+	lines = lines[1:]
+	if not any([line.count('"')%2 for line in lines]):
+		return lines, range(2, len(lines) + 2)
+
+	records = []
+	lineNums = []
+	end = 0
+	while end < len(lines):
+		start = end
+		nQuotes = lines[start].count('"')
+		end += 1
+		while nQuotes%2==1 and end < len(lines):
+			nQuotes += lines[end].count('"')
+			end += 1
+		records.append("".join(lines[start:end]))
+		lineNums.append(start + 2)
+
+	return records, lineNums
+
+
+# update a word index (see french.buildWordIndex) for rows that moved (positions in moved)
+# from oldRows to newRows; each costs O(rows of that word)
+def updateWordIndex(wordIndex, oldRows, newRows, moved):
+
+	exactIdx, foldIdx = wordIndex
+	for idx in moved:
+		if idx>=len(oldRows):
+			continue
+		word = oldRows[idx].word
+		exactIdx[word].remove(idx)
+		if len(exactIdx[word])==0:
+			del exactIdx[word]
+			folded = french.foldWord(word)
+			foldIdx[folded].remove(word)
+			if len(foldIdx[folded])==0:
+				del foldIdx[folded]
+
+	for idx in moved:
+		if idx>=len(newRows):
+			continue
+		word = newRows[idx].word
+		if word in exactIdx:
+			exactIdx[word].append(idx)
+			exactIdx[word].sort()
+		else:
+			exactIdx[word] = [idx]
+			foldIdx.setdefault(french.foldWord(word), []).append(word)
+
+
+# validate csv (or each csv shard) now, then again whenever it changes, until interrupted
+# each run only checks rows changed since they last passed (see french.validateDict)
+def watchValidate(csvname, interval=WATCH_INTERVAL, nProc=None, reportname=None):
+
+	stamps = {}
+	print("Watching {0}; Ctrl-C to stop.".format(csvname))
+	try:
+		while True:
+			for path in french.getShards(csvname):
+				stamp = getStamp(path)
+				if stamp is not None and stamp!=stamps.get(path):
+					stamps[path] = stamp
+					french.validateDict(path, incremental=True, nProc=nProc, reportname=reportname)
+			time.sleep(interval)
+	except KeyboardInterrupt:
+		pass